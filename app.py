@@ -1,12 +1,14 @@
-from flask import Flask
-from extensions import db, login_manager
-import logging  # Add this import
 from dotenv import load_dotenv  # Add this
-import os  # Add this
 
-# Load environment variables
+# Load environment variables before modules that read their settings at import
 load_dotenv()  # Add this
 
+from flask import Flask
+from extensions import db, login_manager, write_behind, metrics, static_assets
+from utils.database import configure_database, configure_engine
+import logging  # Add this import
+import os  # Add this
+
 # Configure logger
 logging.basicConfig(
     level=logging.INFO,
@@ -14,22 +16,73 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-# Configure your app here
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///mental_well.db'
-app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY')
-app.config['GOOGLE_GEMINI_API_KEY'] = os.getenv('GOOGLE_GEMINI_API_KEY')  # Add this line
-# Initialize extensions
-db.init_app(app)
-login_manager.init_app(app)
-login_manager.login_view = 'login'
-
-# Create tables within app context
-with app.app_context():
-    from models import User, Assessment, ChatMessage, EmotionRecord
-    db.create_all()
-
-# Import routes
-from routes import *
-
-logger.info("Application initialized successfully")
+
+def create_app(config=None):
+    """
+    Build the Flask application
+
+    Does not touch the database; run prepare_app (or `flask upgrade-db`)
+    to create missing tables.
+
+    Args:
+        config (dict): Settings applied over those read from the environment
+
+    Returns:
+        Flask: The application
+    """
+    app = Flask(__name__)
+    # Configure your app here
+    configure_database(app)  # SQLALCHEMY_DATABASE_URI / DATABASE_URL, pool and SQLite settings
+    app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY')
+    app.config['GOOGLE_GEMINI_API_KEY'] = os.getenv('GOOGLE_GEMINI_API_KEY')  # Add this line
+    if config:
+        app.config.update(config)
+
+    # Initialize extensions
+    db.init_app(app)
+    configure_engine(app, db)  # SQLite pragmas for the app's engine
+    login_manager.init_app(app)
+    write_behind.init_app(app, db)
+    metrics.init_app(app)  # /metrics; METRICS=0 turns it off
+    static_assets.init_app(app)  # hashed, precompressed files from `flask build-static`
+
+    from utils.admission import admission
+    admission.init_app(app)  # chat rate limits and LLM concurrency; ADMISSION=0 turns it off
+
+    # Register routes and CLI commands
+    from routes import bp
+    from commands import register_commands
+    app.register_blueprint(bp)
+    register_commands(app)
+
+    logger.info("Application initialized successfully")
+    return app
+
+
+def prepare_app(app):
+    """
+    Create missing tables and indexes and build the shared read-only state
+
+    The gunicorn config runs this once in the master before forking, so
+    workers start warm and share the loaded data copy-on-write.
+
+    Args:
+        app (Flask): The application
+    """
+    from migrations import upgrade_schema
+    from utils.prompts import warm_prompt_cache
+    from utils.rag import get_document_index
+
+    with app.app_context():
+        created = upgrade_schema(db)
+        if created:
+            logger.info("Created %s", ", ".join(created))
+        # Forked workers must open their own connections
+        db.engine.dispose()
+
+    # Therapy documents and retrieval index, and the system prompt for every emotion and crisis level
+    get_document_index()
+    warm_prompt_cache()
+
+
+app = create_app()
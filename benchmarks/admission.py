@@ -0,0 +1,182 @@
+"""
+Admission control under a flood: one user hammering /api/send_message from
+many threads, a few users chatting at a human pace, and one user sending
+crisis messages, all against a stub LLM that takes LLM_LATENCY per call.
+
+Setups:
+    off        ADMISSION=0
+    memory     limits kept per process
+    sqlite x2  two processes (as two gunicorn workers) sharing one SQLite
+               store, each running the same workload
+
+Reports the chatting users' latency, how many flood and crisis messages
+were answered or turned away, and the most LLM calls in flight at once
+across all processes.
+
+Run from the repository root:
+    python -m benchmarks.admission
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+DURATION = 10  # seconds
+LLM_LATENCY = 0.2  # seconds
+FLOOD_THREADS = 12
+CHAT_USERS = 6
+CHAT_THINK_TIME = 2.0  # seconds between a chatting user's messages
+CRISIS_THINK_TIME = 1.0
+
+LIMITS = {
+    "ADMISSION_MAX_IN_FLIGHT": "4",
+    "ADMISSION_CRISIS_SLOTS": "2",
+    "ADMISSION_QUEUE": "8",
+    "ADMISSION_QUEUE_TIMEOUT": "2",
+    "ADMISSION_USER_RATE": "1",
+    "ADMISSION_USER_BURST": "5",
+}
+SETUPS = [
+    ("off", {"ADMISSION": "0"}, 1),
+    ("memory", {"ADMISSION_STORE": "memory"}, 1),
+    ("sqlite x2", {"ADMISSION_STORE": "sqlite"}, 2),
+]
+
+FLOOD_USER = 1
+CRISIS_USER = 2
+CHAT_USER_IDS = range(3, 3 + CHAT_USERS)
+
+
+def percentile(latencies, q):
+    latencies = sorted(latencies)
+    return latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000 if latencies else 0.0
+
+
+def seed():
+    from app import app, db, prepare_app
+    from models import User
+    prepare_app(app)
+    with app.app_context():
+        db.session.execute(User.__table__.insert(), [
+            {"id": user_id, "username": f"bench{user_id}", "email": f"bench{user_id}@example.com", "password_hash": "x"}
+            for user_id in range(1, 3 + CHAT_USERS)
+        ])
+        db.session.commit()
+
+
+def run_setup():
+    """Child process: run the workload and report outcomes and LLM call intervals"""
+    from app import app
+    from utils.llm_router import LLMRouter, Provider, set_router
+
+    calls = []
+    lock = threading.Lock()
+
+    def slow_llm(*args):
+        start = time.time()
+        time.sleep(LLM_LATENCY)
+        with lock:
+            calls.append((start, time.time()))
+        return "That sounds hard. Tell me more."
+
+    set_router(LLMRouter([Provider("stub", slow_llm)]))
+
+    stop = threading.Event()
+    outcomes = {"flood": {}, "chat": {}, "crisis": {}}
+    chat_latencies = []
+
+    def client_for(user_id):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        return client
+
+    def send(kind, client, message, think_time):
+        while not stop.is_set():
+            start = time.perf_counter()
+            status = client.post('/api/send_message', json={'message': message}).status_code
+            elapsed = time.perf_counter() - start
+            with lock:
+                outcomes[kind][status] = outcomes[kind].get(status, 0) + 1
+                if kind == "chat" and status == 200:
+                    chat_latencies.append(elapsed)
+            stop.wait(think_time)
+
+    threads = [threading.Thread(target=send, args=("flood", client_for(FLOOD_USER), "I feel anxious today", 0))
+               for _ in range(FLOOD_THREADS)]
+    threads += [threading.Thread(target=send, args=("chat", client_for(user_id), "Work has been stressful",
+                                                    CHAT_THINK_TIME))
+                for user_id in CHAT_USER_IDS]
+    threads.append(threading.Thread(target=send, args=("crisis", client_for(CRISIS_USER), "I can't go on, I want to die",
+                                                       CRISIS_THINK_TIME)))
+    for thread in threads:
+        thread.start()
+    time.sleep(DURATION)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    print(json.dumps({"outcomes": outcomes, "chat_latencies": chat_latencies, "calls": calls}))
+
+
+def max_in_flight(calls):
+    events = sorted([(start, 1) for start, _ in calls] + [(end, -1) for _, end in calls])
+    peak = current = 0
+    for _, change in events:
+        current += change
+        peak = max(peak, current)
+    return peak
+
+
+def main():
+    base_env = dict(os.environ, WRITE_BEHIND="0", LLM_PROVIDERS="", FLASK_SECRET_KEY="benchmark",
+                    RESPONSE_CACHE="", CONTEXT_TOKEN_BUDGET="0", **LIMITS)
+    base_env.pop("SQLALCHEMY_DATABASE_URI", None)
+
+    print(f"{FLOOD_THREADS} flood threads, {CHAT_USERS} chatting users, 1 crisis user, {DURATION}s, "
+          f"LLM {LLM_LATENCY * 1000:.0f} ms; limits {', '.join(f'{k[10:].lower()}={v}' for k, v in LIMITS.items())}")
+    print(f"{'setup':<11}{'chat p50':>9}{'chat p99':>9}{'chat shed':>10}{'flood ok':>9}{'429':>6}{'503':>6}"
+          f"{'crisis ok':>10}{'shed':>6}{'LLM calls':>10}{'max in flight':>15}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, env, processes in SETUPS:
+            env = dict(base_env, **env,
+                       DATABASE_URL=f"sqlite:///{os.path.join(tmp, name.replace(' ', '') + '.db')}",
+                       ADMISSION_STORE_PATH=os.path.join(tmp, name.replace(' ', '') + '-admission.db'))
+            subprocess.run([sys.executable, "-m", "benchmarks.admission", "--seed"], env=env, check=True,
+                           capture_output=True)
+
+            children = [subprocess.Popen([sys.executable, "-m", "benchmarks.admission", "--child"], env=env,
+                                         stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+                        for _ in range(processes)]
+            results = []
+            for child in children:
+                stdout, stderr = child.communicate(timeout=600)
+                if child.returncode != 0:
+                    raise RuntimeError(stderr[-2000:])
+                results.append(json.loads(stdout.strip().splitlines()[-1]))
+
+            def total(kind, status):
+                return sum(result["outcomes"][kind].get(str(status), 0) for result in results)
+
+            latencies = [latency for result in results for latency in result["chat_latencies"]]
+            calls = [tuple(call) for result in results for call in result["calls"]]
+            def rejected(kind):
+                return sum(count for result in results for status, count in result["outcomes"][kind].items()
+                           if status != "200")
+
+            print(f"{name:<11}{percentile(latencies, 0.5):>9.0f}{percentile(latencies, 0.99):>9.0f}{rejected('chat'):>10}"
+                  f"{total('flood', 200):>9}{total('flood', 429):>6}{total('flood', 503):>6}"
+                  f"{total('crisis', 200):>10}{rejected('crisis'):>6}{len(calls):>10}{max_in_flight(calls):>15}")
+
+
+if __name__ == '__main__':
+    if "--seed" in sys.argv:
+        seed()
+    elif "--child" in sys.argv:
+        run_setup()
+    else:
+        main()
@@ -0,0 +1,134 @@
+"""
+Dashboard chart data: aggregating EmotionRecord rows in Python (the
+previous per-day loop, applied to a real 30-day window), a GROUP BY over
+the raw records, and reading the DailyEmotionRollup table through
+utils.analytics. Also the assessment average computed from every loaded
+Assessment versus AVG() in SQL.
+
+Run from the repository root:
+    python -m benchmarks.analytics
+"""
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+from extensions import db
+from models import User, Assessment, EmotionRecord, DailyEmotionRollup
+from utils.analytics import daily_emotion_totals, emotion_chart_data, assessment_summary, window_start
+
+RECORDS_PER_DAY = [1, 10, 100]
+DAYS_OF_HISTORY = 90
+ASSESSMENTS = [10, 1000, 10000]
+REPEAT = 5
+
+EMOTIONS = ["happy", "sad", "anxious", "angry", "neutral"]
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    db.init_app(app)
+    return app
+
+
+def python_emotion_data(user_id, days=30):
+    """The previous dashboard loop over ORM rows, restricted to the same window"""
+    emotion_records = EmotionRecord.query.filter(
+        EmotionRecord.user_id == user_id,
+        EmotionRecord.created_at >= window_start(days)
+    ).order_by(EmotionRecord.created_at.desc()).all()
+
+    emotion_data = {}
+    for record in emotion_records:
+        date = record.created_at.strftime('%Y-%m-%d')
+        if date not in emotion_data:
+            emotion_data[date] = {}
+        if record.emotion not in emotion_data[date]:
+            emotion_data[date][record.emotion] = 0
+        emotion_data[date][record.emotion] += record.intensity
+    return emotion_data
+
+
+def sql_emotion_data(user_id, days=30):
+    """GROUP BY date(created_at), emotion over the raw records"""
+    day = db.func.date(EmotionRecord.created_at)
+    rows = db.session.query(day, EmotionRecord.emotion, db.func.sum(EmotionRecord.intensity)).filter(
+        EmotionRecord.user_id == user_id,
+        EmotionRecord.created_at >= window_start(days)
+    ).group_by(day, EmotionRecord.emotion).all()
+
+    emotion_data = {}
+    for date, emotion, total in rows:
+        emotion_data.setdefault(date, {})[emotion] = total
+    return emotion_data
+
+
+def python_average(user_id):
+    """The previous dashboard average over every loaded Assessment"""
+    assessments = Assessment.query.filter_by(user_id=user_id).order_by(Assessment.created_at.desc()).all()
+    return sum([a.score for a in assessments]) / len(assessments) if assessments else 0
+
+
+def timed(function, *args):
+    samples = []
+    for _ in range(REPEAT):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        result = function(*args)
+        samples.append(time.perf_counter() - start)
+    return result, sorted(samples)[len(samples) // 2] * 1000
+
+
+def main():
+    rng = random.Random(7)
+    now = datetime.utcnow()
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, "bench.db"))
+        with app.app_context():
+            db.create_all()
+            users = list(enumerate(RECORDS_PER_DAY, start=1))
+            db.session.execute(User.__table__.insert(), [
+                {"id": user_id, "username": f"user{user_id}", "email": f"user{user_id}@example.com", "password_hash": "x"}
+                for user_id in range(1, len(RECORDS_PER_DAY) + 1)
+            ])
+            for user_id, per_day in users:
+                db.session.execute(EmotionRecord.__table__.insert(), [
+                    {"user_id": user_id, "emotion": rng.choice(EMOTIONS), "intensity": rng.random(),
+                     "created_at": now - timedelta(days=day, seconds=rng.randint(0, 80000))}
+                    for day in range(DAYS_OF_HISTORY) for _ in range(per_day)
+                ])
+                db.session.execute(Assessment.__table__.insert(), [
+                    {"user_id": user_id, "score": rng.uniform(0, 100), "answers": "{}",
+                     "created_at": now - timedelta(minutes=i)}
+                    for i in range(ASSESSMENTS[user_id - 1])
+                ])
+            db.session.commit()
+            with db.engine.begin() as connection:
+                DailyEmotionRollup.rebuild(connection)
+
+            print("Emotion chart, 30-day window")
+            print(f"{'records/day':>12}{'python (ms)':>13}{'group by (ms)':>15}{'rollup (ms)':>13}")
+            for user_id, per_day in users:
+                expected, python_ms = timed(python_emotion_data, user_id)
+                grouped, sql_ms = timed(sql_emotion_data, user_id)
+                actual, rollup_ms = timed(lambda: emotion_chart_data(daily_emotion_totals(user_id)))
+                for result in (grouped, actual):
+                    assert expected.keys() == result.keys()
+                    assert all(abs(expected[d][e] - result[d][e]) < 1e-9 for d in expected for e in expected[d])
+                print(f"{per_day:>12}{python_ms:>13.2f}{sql_ms:>15.2f}{rollup_ms:>13.2f}")
+
+            print("\nAverage assessment score")
+            print(f"{'assessments':>12}{'python (ms)':>13}{'sql (ms)':>10}{'speedup':>9}")
+            for user_id, _ in users:
+                expected, python_ms = timed(python_average, user_id)
+                actual, sql_ms = timed(assessment_summary, user_id)
+                assert abs(expected - actual["average"]) < 1e-9
+                print(f"{ASSESSMENTS[user_id - 1]:>12}{python_ms:>13.2f}{sql_ms:>10.2f}{python_ms / sql_ms:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Time and memory to load the /chat page's messages as a user's history
+grows: the previous load-everything query versus the latest keyset page.
+
+Run from the repository root:
+    python -m benchmarks.chat_history
+"""
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+from extensions import db
+from models import User, ChatMessage
+from utils.chat_history import get_chat_page, decode_cursor
+
+HISTORY_LENGTHS = [100, 1000, 10000, 50000]
+REPEAT = 5
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    db.init_app(app)
+    return app
+
+
+def seed(user_id, count):
+    start = datetime(2024, 1, 1)
+    db.session.execute(User.__table__.insert(), [
+        {"id": user_id, "username": f"user{user_id}", "email": f"user{user_id}@example.com", "password_hash": "x"}
+    ])
+    db.session.execute(ChatMessage.__table__.insert(), [
+        {"user_id": user_id, "content": "I have been feeling a bit anxious about work lately. " * 4,
+         "is_user": i % 2 == 0, "emotion": "anxious", "created_at": start + timedelta(seconds=i)}
+        for i in range(count)
+    ])
+    db.session.commit()
+
+
+def load_all(user_id):
+    """The previous /chat query"""
+    return ChatMessage.query.filter_by(user_id=user_id).order_by(ChatMessage.created_at).all()
+
+
+def load_page(user_id):
+    return get_chat_page(user_id)[0]
+
+
+def measure(load, user_id):
+    times = []
+    for _ in range(REPEAT):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        load(user_id)
+        times.append(time.perf_counter() - start)
+
+    db.session.expunge_all()
+    tracemalloc.start()
+    messages = load(user_id)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return len(messages), sorted(times)[len(times) // 2] * 1000, peak / 1024
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, "bench.db"))
+        with app.app_context():
+            db.create_all()
+            for user_id, count in enumerate(HISTORY_LENGTHS, start=1):
+                seed(user_id, count)
+
+            print(f"{'history':>8}  {'mode':<10}{'rows':>7}{'time (ms)':>11}{'peak (KiB)':>12}")
+            for user_id, count in enumerate(HISTORY_LENGTHS, start=1):
+                for label, load in (("all", load_all), ("keyset", load_page)):
+                    rows, elapsed, peak = measure(load, user_id)
+                    print(f"{count:>8}  {label:<10}{rows:>7}{elapsed:>11.2f}{peak:>12.0f}")
+
+            # Walking back through the whole history costs the same per page
+            user_id = len(HISTORY_LENGTHS)
+            messages, cursor = get_chat_page(user_id)
+            pages, start = 1, time.perf_counter()
+            while cursor:
+                messages, cursor = get_chat_page(user_id, decode_cursor(cursor))
+                pages += 1
+                db.session.expunge_all()
+            elapsed = time.perf_counter() - start
+            print(f"\nPaged through {HISTORY_LENGTHS[-1]} messages in {pages} pages, "
+                  f"{elapsed / pages * 1000:.2f} ms per page")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Conversation context for LLM calls: the whole chat history in the prompt
+versus the token-budgeted context builder (rolling summary plus recent
+turns, cached per user and appended to between turns).
+
+Reports time to build the context and the estimated prompt tokens for
+users with growing histories, then the prompt size over a run of turns
+through /api/send_message with a stub LLM provider.
+
+Run from the repository root:
+    python -m benchmarks.conversation_context
+"""
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+HISTORY_SIZES = [100, 1000, 10000]
+TURNS = 40
+REPEAT = 20
+
+SENTENCES = [
+    "I have been feeling anxious about work lately and it keeps me up at night.",
+    "My sister called yesterday and we argued again about the holidays.",
+    "I tried the breathing exercise you suggested and it helped a little.",
+    "Some days I do not want to get out of bed at all.",
+]
+REPLY = "That sounds really difficult. It makes sense that you feel this way. What usually helps you unwind?"
+
+
+def make_messages(user_id, count):
+    start = datetime(2023, 1, 1)
+    return [
+        {"user_id": user_id, "content": SENTENCES[i // 2 % len(SENTENCES)] if i % 2 == 0 else REPLY,
+         "is_user": i % 2 == 0, "emotion": "anxious", "created_at": start + timedelta(minutes=i)}
+        for i in range(count)
+    ]
+
+
+def average_ms(function, repeat=REPEAT):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - start) * 1000 / repeat, result
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ.setdefault("FLASK_SECRET_KEY", "benchmark")
+        os.environ["WRITE_BEHIND"] = "0"
+        os.environ["ADMISSION"] = "0"
+        os.environ["RESPONSE_CACHE"] = ""
+        from app import app, db, prepare_app
+        from models import User, ChatMessage
+        from utils.conversation import ConversationContext, ConversationHistory, conversation_context, estimate_tokens
+        from utils.llm_router import LLMRouter, Provider, set_router
+        from utils.prompts import build_prompt
+        prepare_app(app)
+
+        user_ids = list(range(1, len(HISTORY_SIZES) + 2))
+        with app.app_context():
+            db.session.execute(User.__table__.insert(), [
+                {"id": user_id, "username": f"bench{user_id}", "email": f"bench{user_id}@example.com", "password_hash": "x"}
+                for user_id in user_ids
+            ])
+            for user_id, size in zip(user_ids, HISTORY_SIZES):
+                db.session.execute(ChatMessage.__table__.insert(), make_messages(user_id, size))
+            db.session.commit()
+
+        def full_history(user_id):
+            messages = ChatMessage.query.filter_by(user_id=user_id).order_by(ChatMessage.created_at).all()
+            return ConversationHistory("", tuple(("user" if m.is_user else "assistant", m.content) for m in messages))
+
+        def prompt_tokens(history):
+            return estimate_tokens(build_prompt("How do I stop overthinking?", "anxious", [], False, 0, history))
+
+        print(f"{'history':>8}  {'mode':<14}{'build (ms)':>11}{'prompt tokens':>15}")
+        with app.app_context():
+            for user_id, size in zip(user_ids, HISTORY_SIZES):
+                elapsed, history = average_ms(lambda: full_history(user_id))
+                print(f"{size:>8}  {'full history':<14}{elapsed:>11.2f}{prompt_tokens(history):>15}")
+
+                def cold():
+                    builder = ConversationContext()
+                    return builder.get(user_id)
+                elapsed, history = average_ms(cold)
+                print(f"{size:>8}  {'builder, cold':<14}{elapsed:>11.2f}{prompt_tokens(history):>15}")
+
+                builder = ConversationContext()
+                builder.get(user_id)
+                elapsed, history = average_ms(lambda: builder.get(user_id))
+                print(f"{size:>8}  {'builder, warm':<14}{elapsed:>11.2f}{prompt_tokens(history):>15}")
+
+        # A fresh conversation through the app: the prompt grows, then levels off at the budget
+        prompts = []
+
+        def stub(*args):
+            prompts.append(estimate_tokens(build_prompt(*args)))
+            return REPLY
+
+        set_router(LLMRouter([Provider("stub", stub)]))
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_ids[-1])
+            session['_fresh'] = True
+
+        start = time.perf_counter()
+        for i in range(TURNS):
+            response = client.post('/api/send_message', json={'message': SENTENCES[i % len(SENTENCES)]})
+            assert response.status_code == 200
+        elapsed = (time.perf_counter() - start) * 1000 / TURNS
+
+        print(f"\n{TURNS} turns through /api/send_message: {elapsed:.1f} ms/turn")
+        print("prompt tokens by turn: " + " ".join(str(tokens) for tokens in prompts[::5]) + f" ... {prompts[-1]}")
+        print(f"context cache: {conversation_context.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Latency of utils.crisis_detection.detect_crisis against the previous
+per-keyword regex implementation, for short and long messages, plus
+throughput of the batch API.
+
+Run from the repository root:
+    python -m benchmarks.crisis_detection
+"""
+import random
+import re
+import time
+
+from utils.crisis_detection import (
+    CRISIS_KEYWORDS, MEDIUM_RISK_PHRASES, TIME_INDICATORS, detect_crisis, detect_crisis_batch
+)
+
+FILLER = (
+    "i have been thinking a lot about work and my family lately and "
+    "honestly some days are harder than others but i keep going "
+).split()
+MESSAGE_LENGTHS = [20, 200, 2000]
+MESSAGES = 500
+
+
+def legacy_detect_crisis(text):
+    """The pre-automaton detector: one regex search per phrase"""
+    text = text.lower()
+
+    for keyword in CRISIS_KEYWORDS:
+        if re.search(r'\b' + re.escape(keyword) + r'\b', text):
+            severity = min(10, 8 + text.count(keyword))
+            return True, severity
+
+    medium_risk_count = 0
+    for phrase in MEDIUM_RISK_PHRASES:
+        if re.search(r'\b' + re.escape(phrase) + r'\b', text):
+            medium_risk_count += 1
+
+    if medium_risk_count >= 2:
+        severity = min(7, 5 + medium_risk_count - 2)
+        return True, severity
+    elif medium_risk_count == 1:
+        return True, 4
+
+    for indicator in TIME_INDICATORS:
+        if indicator in text and medium_risk_count > 0:
+            return True, 6
+
+    return False, 0
+
+
+def make_messages(words, count, seed=0):
+    rng = random.Random(seed)
+    phrases = CRISIS_KEYWORDS + MEDIUM_RISK_PHRASES + TIME_INDICATORS
+    messages = []
+    for _ in range(count):
+        tokens = rng.choices(FILLER, k=words)
+        for _ in range(rng.randint(0, 3)):
+            tokens.insert(rng.randrange(len(tokens) + 1), rng.choice(phrases).upper() if rng.random() < 0.2 else rng.choice(phrases))
+        messages.append(" ".join(tokens))
+    return messages
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    print(f"{'words':>6}{'legacy (us/msg)':>17}{'single (us/msg)':>17}{'batch (us/msg)':>16}")
+    for words in MESSAGE_LENGTHS:
+        messages = make_messages(words, MESSAGES)
+
+        legacy, legacy_time = timed(lambda: [legacy_detect_crisis(m) for m in messages])
+        single, single_time = timed(lambda: [detect_crisis(m) for m in messages])
+        batch, batch_time = timed(detect_crisis_batch, messages)
+        assert legacy == single == batch
+
+        print(
+            f"{words:>6}"
+            f"{legacy_time / MESSAGES * 1e6:>17.1f}"
+            f"{single_time / MESSAGES * 1e6:>17.1f}"
+            f"{batch_time / MESSAGES * 1e6:>16.1f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
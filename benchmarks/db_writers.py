@@ -0,0 +1,155 @@
+"""
+Concurrent writers against each database setup: several processes (like
+gunicorn workers), each with several threads, driving send_message,
+record_mood and mood_history through the Flask app.
+
+Setups:
+    sqlite-default  rollback journal, synchronous=FULL, no mmap (the
+                    previous SQLite defaults)
+    sqlite-wal      the configured pragmas: WAL, synchronous=NORMAL,
+                    busy_timeout, mmap
+    postgres        only when BENCH_POSTGRES_URL is set; uses the
+                    configured pool settings
+
+The LLM is replaced by a stub provider and write-behind is turned off,
+so every request commits on its own thread.
+
+Run from the repository root:
+    python -m benchmarks.db_writers
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+PROCESSES = 4
+THREADS = 8
+REQUESTS_PER_THREAD = 40
+
+SQLITE_DEFAULTS = {
+    "SQLITE_JOURNAL_MODE": "DELETE",
+    "SQLITE_SYNCHRONOUS": "FULL",
+    "SQLITE_BUSY_TIMEOUT": "5000",  # the sqlite3 module's default timeout
+    "SQLITE_MMAP_SIZE": "0",
+}
+
+
+def run_worker(worker_index):
+    """Child process: issue requests from THREADS threads and print the results as JSON"""
+    from app import app
+    from utils.llm_router import LLMRouter, Provider, set_router
+
+    set_router(LLMRouter([Provider("stub", lambda *args: "That sounds hard. Tell me more.")]))
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def client(thread_index):
+        user_id = worker_index * THREADS + thread_index + 1
+        test_client = app.test_client()
+        with test_client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+
+        for i in range(REQUESTS_PER_THREAD):
+            start = time.perf_counter()
+            try:
+                if i % 3 == 0:
+                    response = test_client.post('/api/send_message', json={'message': 'I feel anxious today'})
+                elif i % 3 == 1:
+                    response = test_client.post('/api/mood', json={'emotion': 'calm', 'intensity': 0.5})
+                else:
+                    response = test_client.get('/api/mood-history')
+                failed = response.status_code != 200
+            except Exception as e:
+                failed = repr(e)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if failed:
+                    errors.append(str(failed))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(json.dumps({"elapsed": time.perf_counter() - start, "latencies": latencies, "errors": errors[:5],
+                      "error_count": len(errors)}))
+
+
+def init_database():
+    """Child process: create the schema and one user per client thread"""
+    from app import app, db, prepare_app
+    from models import User
+    prepare_app(app)
+
+    with app.app_context():
+        db.session.execute(User.__table__.insert(), [
+            {"id": user_id, "username": f"bench{user_id}", "email": f"bench{user_id}@example.com", "password_hash": "x"}
+            for user_id in range(1, PROCESSES * THREADS + 1)
+        ])
+        db.session.commit()
+
+
+def run_setup(name, env):
+    init = subprocess.run([sys.executable, "-m", "benchmarks.db_writers", "--init"],
+                          env=env, capture_output=True, text=True, timeout=600)
+    if init.returncode != 0:
+        raise RuntimeError(init.stderr[-2000:])
+
+    workers = [
+        subprocess.Popen([sys.executable, "-m", "benchmarks.db_writers", "--worker", str(i)],
+                         env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        for i in range(PROCESSES)
+    ]
+    results = []
+    for worker in workers:
+        stdout, stderr = worker.communicate(timeout=600)
+        if worker.returncode != 0:
+            raise RuntimeError(stderr[-2000:])
+        results.append(json.loads(stdout.strip().splitlines()[-1]))
+    # Measured inside the workers, so process start-up and imports are excluded
+    elapsed = max(result["elapsed"] for result in results)
+
+    latencies = sorted(latency for result in results for latency in result["latencies"])
+    error_count = sum(result["error_count"] for result in results)
+    samples = [error for result in results for error in result["errors"]]
+    percentile = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000
+    print(f"{name:<16}{len(latencies) / elapsed:>9.0f}{percentile(0.5):>10.1f}{percentile(0.99):>10.1f}{error_count:>8}")
+    if samples:
+        print(f"{'':<16}e.g. {samples[0]}")
+
+
+def main():
+    base_env = dict(os.environ, WRITE_BEHIND="0", ADMISSION="0", LLM_PROVIDERS="", FLASK_SECRET_KEY="benchmark",
+                    RESPONSE_CACHE="")
+    base_env.pop("SQLALCHEMY_DATABASE_URI", None)
+
+    print(f"{PROCESSES} processes x {THREADS} threads x {REQUESTS_PER_THREAD} requests")
+    print(f"{'setup':<16}{'req/s':>9}{'p50 (ms)':>10}{'p99 (ms)':>10}{'errors':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        run_setup("sqlite-default", dict(base_env, **SQLITE_DEFAULTS,
+                                         DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'default.db')}"))
+        run_setup("sqlite-wal", dict(base_env, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'wal.db')}"))
+
+    postgres_url = os.environ.get("BENCH_POSTGRES_URL")
+    if postgres_url:
+        run_setup("postgres", dict(base_env, DATABASE_URL=postgres_url))
+    else:
+        print("(set BENCH_POSTGRES_URL to an empty PostgreSQL database to include it)")
+
+
+if __name__ == '__main__':
+    if "--worker" in sys.argv:
+        run_worker(int(sys.argv[sys.argv.index("--worker") + 1]))
+    elif "--init" in sys.argv:
+        init_database()
+    else:
+        main()
@@ -0,0 +1,72 @@
+"""
+Throughput (messages/sec) of utils.emotion_detection in single-message and
+batch mode, compared with the previous per-keyword substring scan.
+
+Run from the repository root:
+    python -m benchmarks.emotion_detection
+"""
+import random
+import time
+
+from utils.emotion_detection import EMOTION_KEYWORDS, analyze_emotion, detect_emotions_batch
+
+FILLER = (
+    "today i went to work and talked with my friend about the weekend and "
+    "then i came home and tried to get some rest before dinner"
+).split()
+MESSAGE_LENGTHS = [10, 50, 500]
+MESSAGES = 5000
+
+
+def legacy_detect_emotion(text):
+    """The pre-automaton detector: rebuild the tables and substring-scan every keyword"""
+    text = text.lower()
+
+    emotion_keywords = {emotion: list(keywords) for emotion, keywords in EMOTION_KEYWORDS.items()}
+    emotion_counts = {emotion: 0 for emotion in emotion_keywords}
+
+    for emotion, keywords in emotion_keywords.items():
+        for keyword in keywords:
+            if keyword in text:
+                emotion_counts[emotion] += 1
+
+    max_count = max(emotion_counts.values())
+    if max_count > 0:
+        max_emotions = [e for e, c in emotion_counts.items() if c == max_count]
+        return max_emotions[0]
+
+    return "neutral"
+
+
+def make_messages(words, count, seed=0):
+    rng = random.Random(seed)
+    keywords = [keyword for keywords in EMOTION_KEYWORDS.values() for keyword in keywords]
+    messages = []
+    for _ in range(count):
+        tokens = rng.choices(FILLER, k=words)
+        for _ in range(rng.randint(0, 3)):
+            tokens.insert(rng.randrange(len(tokens) + 1), rng.choice(keywords))
+        messages.append(" ".join(tokens))
+    return messages
+
+
+def throughput(fn):
+    start = time.perf_counter()
+    fn()
+    return MESSAGES / (time.perf_counter() - start)
+
+
+def main():
+    print(f"{'words':>6}{'legacy (msg/s)':>16}{'single (msg/s)':>16}{'batch (msg/s)':>16}")
+    for words in MESSAGE_LENGTHS:
+        messages = make_messages(words, MESSAGES)
+
+        legacy = throughput(lambda: [legacy_detect_emotion(m) for m in messages])
+        single = throughput(lambda: [analyze_emotion(m) for m in messages])
+        batch = throughput(lambda: detect_emotions_batch(messages))
+
+        print(f"{words:>6}{legacy:>16,.0f}{single:>16,.0f}{batch:>16,.0f}")
+
+
+if __name__ == '__main__':
+    main()
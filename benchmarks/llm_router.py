@@ -0,0 +1,130 @@
+"""
+Tail latency of the LLM router with and without hedged requests while the
+primary provider has a brownout, and circuit breaking when the primary
+starts returning 429s.
+
+Providers are stubs with injectable latency and failures, so nothing is
+sent to a real API. Run from the repository root:
+    python -m benchmarks.llm_router
+"""
+import random
+import threading
+import time
+
+from utils.llm_router import LLMRouter, Provider
+
+REQUESTS = 500
+# Requests sent before measuring, so the router has a latency history to hedge from
+WARMUP = 100
+CONCURRENCY = 16
+ARGS = ("I feel anxious", "anxious", [], False, 0)
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class StubProvider:
+    """Fake provider: latency drawn around a base value, with a share of slow calls and of 429s"""
+
+    def __init__(self, name, base_latency, slow_share=0.0, slow_latency=0.0, rate_limit_share=0.0, seed=0):
+        self.name = name
+        self.base_latency = base_latency
+        self.slow_share = slow_share
+        self.slow_latency = slow_latency
+        self.rate_limit_share = rate_limit_share
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate(self, *args):
+        with self._lock:
+            self.calls += 1
+            roll = self._random.random()
+            jitter = self._random.uniform(0.8, 1.2)
+        if roll < self.rate_limit_share:
+            time.sleep(0.002)
+            raise RateLimitError("429 Too Many Requests")
+        slow = roll < self.rate_limit_share + self.slow_share
+        time.sleep((self.slow_latency if slow else self.base_latency) * jitter)
+        return f"reply from {self.name}"
+
+
+def run(router, requests=REQUESTS):
+    latencies = []
+    failures = 0
+    lock = threading.Lock()
+    remaining = iter(range(requests))
+
+    def client():
+        nonlocal failures
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            start = time.perf_counter()
+            try:
+                router.generate(*ARGS)
+            except Exception:
+                with lock:
+                    failures += 1
+                continue
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    workers = [threading.Thread(target=client) for _ in range(CONCURRENCY)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    latencies.sort()
+    percentile = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000
+    return percentile(0.5), percentile(0.99), latencies[-1] * 1000, failures
+
+
+def brownout():
+    print("Brownout: 3% of primary calls take 20x longer")
+    print(f"{'mode':<12}{'p50 (ms)':>10}{'p99 (ms)':>10}{'max (ms)':>10}{'hedged':>8}{'extra calls':>13}")
+    for hedge in (False, True):
+        primary = StubProvider("primary", 0.02, slow_share=0.03, slow_latency=0.4, seed=1)
+        secondary = StubProvider("secondary", 0.03, seed=2)
+        router = LLMRouter(
+            [Provider(primary.name, primary.generate), Provider(secondary.name, secondary.generate)],
+            hedge=hedge, hedge_min_samples=20, max_workers=CONCURRENCY * 2
+        )
+        run(router, WARMUP)
+        secondary.calls = 0
+        hedged_before = router.stats()["hedged_requests"]
+        p50, p99, worst, _ = run(router)
+        stats = router.stats()
+        label = "hedged" if hedge else "failover"
+        print(f"{label:<12}{p50:>10.1f}{p99:>10.1f}{worst:>10.1f}{stats['hedged_requests'] - hedged_before:>8}"
+              f"{secondary.calls / REQUESTS:>12.0%}")
+
+
+def rate_limited():
+    print("\nPrimary returns 429 on 60% of calls")
+    print(f"{'mode':<12}{'p50 (ms)':>10}{'p99 (ms)':>10}{'primary calls':>15}{'failures':>10}{'state':>11}")
+    for threshold in (10 ** 9, 3):
+        primary = StubProvider("primary", 0.02, rate_limit_share=0.6, seed=3)
+        secondary = StubProvider("secondary", 0.03, seed=4)
+        router = LLMRouter(
+            [Provider(primary.name, primary.generate, circuit_threshold=threshold, circuit_cooldown=60),
+             Provider(secondary.name, secondary.generate)],
+            hedge=False, max_workers=CONCURRENCY
+        )
+        p50, p99, _, failures = run(router)
+        label = "no breaker" if threshold > REQUESTS else "breaker"
+        state = router.stats()["providers"]["primary"]["state"]
+        print(f"{label:<12}{p50:>10.1f}{p99:>10.1f}{primary.calls:>15}{failures:>10}{state:>11}")
+
+
+def main():
+    brownout()
+    rate_limited()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,390 @@
+"""
+End-to-end load test of the chat pipeline.
+
+Boots the real Flask app against a freshly seeded database, replaces the
+LLM providers with a local stub (configurable latency and streaming), and
+drives a weighted mix of endpoints from many concurrent simulated users,
+each on its own thread with its own logged-in client.
+
+Reports throughput, latency percentiles and SQL statements per request
+for each endpoint as JSON on stdout (and in --output), with a readable
+summary on stderr, so runs can be saved and compared.
+
+Run from the repository root:
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --users 32 --duration 30 --llm-latency 0.5 --output run.json
+    python -m benchmarks.load_test --mix send_message=1,send_message_stream=1
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+PASSWORD = "load-test-password"
+EMOTIONS = ["happy", "sad", "anxious", "angry", "calm", "tired"]
+MESSAGES = [
+    "I have been feeling anxious about work lately and it keeps me up at night.",
+    "My sister called yesterday and we argued again about the holidays.",
+    "I tried the breathing exercise and it helped a little.",
+    "Some days I do not want to get out of bed at all.",
+    "I feel calmer today, thanks for listening.",
+]
+REPLY = "That sounds really difficult. It makes sense that you feel this way. What usually helps you unwind?"
+
+DEFAULT_MIX = "send_message=40,mood=20,dashboard=15,chat=15,login=5,send_message_stream=5"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=16, help="concurrent simulated users (threads)")
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds run before measuring")
+    parser.add_argument("--think-time", type=float, default=0, help="seconds each user waits between requests")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="comma-separated endpoint=weight pairs")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="stub LLM seconds per reply")
+    parser.add_argument("--llm-jitter", type=float, default=0.5, help="stub latency varies by up to this fraction")
+    parser.add_argument("--stream-chunks", type=int, default=10, help="chunks per streamed stub reply")
+    parser.add_argument("--seed-messages", type=int, default=500, help="chat messages per seeded user")
+    parser.add_argument("--seed-moods", type=int, default=500, help="mood records per seeded user")
+    parser.add_argument("--seed-assessments", type=int, default=20, help="assessments per seeded user")
+    parser.add_argument("--database-url", help="empty database to seed (default: a temporary SQLite file)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    return parser.parse_args(argv)
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f"unknown endpoint {name!r}; choose from {', '.join(SCENARIOS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class StubLLM:
+    """Replacement for the LLM providers: sleeps like a remote model, then answers"""
+
+    def __init__(self, latency, jitter, chunks, seed):
+        self.latency = latency
+        self.jitter = jitter
+        self.chunks = chunks
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _delay(self):
+        with self._lock:
+            return self.latency * (1 + self._random.uniform(-self.jitter, self.jitter))
+
+    def generate(self, *args):
+        time.sleep(self._delay())
+        return REPLY
+
+    def stream(self, *args):
+        delay = self._delay() / self.chunks
+        words = REPLY.split(" ")
+        size = max(1, len(words) // self.chunks)
+        for i in range(0, len(words), size):
+            time.sleep(delay)
+            yield " ".join(words[i:i + size]) + " "
+
+
+def seed_database(app, db, args):
+    """Insert one user per simulated user, each with chat, mood and assessment history"""
+    from werkzeug.security import generate_password_hash
+    from models import User, ChatMessage, EmotionRecord, Assessment, DailyEmotionRollup
+    from utils.passwords import PASSWORD_HASH_METHOD
+
+    rng = random.Random(args.seed)
+    # Every user shares one password, so it is hashed once
+    password_hash = generate_password_hash(PASSWORD, PASSWORD_HASH_METHOD)
+    now = datetime.utcnow()
+    with app.app_context():
+        connection = db.session.connection()
+        connection.execute(User.__table__.insert(), [
+            {"id": user_id, "username": f"load{user_id}", "email": f"load{user_id}@example.com",
+             "password_hash": password_hash}
+            for user_id in range(1, args.users + 1)
+        ])
+        for user_id in range(1, args.users + 1):
+            if args.seed_messages:
+                connection.execute(ChatMessage.__table__.insert(), [
+                    {"user_id": user_id, "content": MESSAGES[i // 2 % len(MESSAGES)] if i % 2 == 0 else REPLY,
+                     "is_user": i % 2 == 0, "emotion": rng.choice(EMOTIONS),
+                     "created_at": now - timedelta(minutes=10 * (args.seed_messages - i))}
+                    for i in range(args.seed_messages)
+                ])
+            if args.seed_moods:
+                connection.execute(EmotionRecord.__table__.insert(), [
+                    {"user_id": user_id, "emotion": rng.choice(EMOTIONS), "intensity": round(rng.random(), 2),
+                     "created_at": now - timedelta(hours=2 * (args.seed_moods - i))}
+                    for i in range(args.seed_moods)
+                ])
+            if args.seed_assessments:
+                connection.execute(Assessment.__table__.insert(), [
+                    {"user_id": user_id, "score": rng.uniform(20, 90), "answers": "{}",
+                     "created_at": now - timedelta(days=3 * (args.seed_assessments - i))}
+                    for i in range(args.seed_assessments)
+                ])
+        DailyEmotionRollup.rebuild(connection)
+        db.session.commit()
+
+
+def log_in(client, user_id):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+
+def send_message(user):
+    return user.client.post('/api/send_message', json={'message': user.random.choice(MESSAGES)})
+
+
+def send_message_stream(user):
+    response = user.client.post('/api/send_message/stream', json={'message': user.random.choice(MESSAGES)},
+                                buffered=False)
+    # Read to the end so the whole reply, and its save, is timed
+    for _ in response.response:
+        pass
+    response.close()
+    return response
+
+
+def mood(user):
+    return user.client.post('/api/mood', json={'emotion': user.random.choice(EMOTIONS),
+                                               'intensity': round(user.random.random(), 2)})
+
+
+def dashboard(user):
+    return user.client.get('/dashboard')
+
+
+def chat(user):
+    return user.client.get('/chat')
+
+
+def login(user):
+    # A fresh client, as a new browser session would be
+    return user.app.test_client().post('/login', data={'username': f"load{user.user_id}", 'password': PASSWORD})
+
+
+SCENARIOS = {
+    "send_message": send_message,
+    "send_message_stream": send_message_stream,
+    "mood": mood,
+    "dashboard": dashboard,
+    "chat": chat,
+    "login": login,
+}
+
+# Statuses each scenario returns on success
+EXPECTED_STATUS = {"login": (302,)}
+
+
+class Recorder:
+    """Latencies, errors and SQL statement counts per endpoint, attributed by thread"""
+
+    def __init__(self):
+        self.measuring = False
+        self.latencies = {}
+        self.errors = {}
+        self.queries = {}
+        self.query_seconds = {}
+        self.background_queries = 0
+        self._current = threading.local()
+        self._lock = threading.Lock()
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("load_test_start", []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("load_test_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        current = self._current
+        if getattr(current, "queries", None) is not None:
+            current.queries += 1
+            current.query_seconds += elapsed
+        elif self.measuring:
+            # Statements from other threads, e.g. the write-behind worker
+            with self._lock:
+                self.background_queries += 1
+
+    def run(self, name, scenario, user):
+        current = self._current
+        current.queries = 0
+        current.query_seconds = 0.0
+        start = time.perf_counter()
+        try:
+            response = scenario(user)
+            error = None if response.status_code in EXPECTED_STATUS.get(name, (200,)) else f"HTTP {response.status_code}"
+        except Exception as e:
+            error = repr(e)
+        elapsed = time.perf_counter() - start
+        queries, query_seconds = current.queries, current.query_seconds
+        current.queries = None
+
+        if not self.measuring:
+            return
+        with self._lock:
+            self.latencies.setdefault(name, []).append(elapsed)
+            self.queries[name] = self.queries.get(name, 0) + queries
+            self.query_seconds[name] = self.query_seconds.get(name, 0.0) + query_seconds
+            if error:
+                self.errors.setdefault(name, []).append(error)
+
+
+class SimulatedUser:
+    def __init__(self, app, user_id, seed):
+        self.app = app
+        self.user_id = user_id
+        self.random = random.Random(seed)
+        self.client = app.test_client()
+        log_in(self.client, user_id)
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    pick = lambda q: round(latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000, 2)
+    return {
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "p50_ms": pick(0.5), "p90_ms": pick(0.9), "p99_ms": pick(0.99), "max_ms": round(latencies[-1] * 1000, 2)
+    }
+
+
+def run_load(app, args, mix, recorder):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    stop = threading.Event()
+
+    def simulate(index):
+        user = SimulatedUser(app, index + 1, args.seed * 1000 + index)
+        while not stop.is_set():
+            name = user.random.choices(names, weights)[0]
+            recorder.run(name, SCENARIOS[name], user)
+            if args.think_time:
+                time.sleep(user.random.expovariate(1 / args.think_time))
+
+    threads = [threading.Thread(target=simulate, args=(i,), daemon=True) for i in range(args.users)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.warmup)
+    recorder.measuring = True
+    start = time.perf_counter()
+    time.sleep(args.duration)
+    recorder.measuring = False
+    elapsed = time.perf_counter() - start
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return elapsed
+
+
+def build_report(args, mix, recorder, elapsed, database_url):
+    endpoints = {}
+    for name in mix:
+        latencies = recorder.latencies.get(name)
+        if not latencies:
+            continue
+        errors = recorder.errors.get(name, [])
+        endpoints[name] = dict(
+            requests=len(latencies),
+            errors=len(errors),
+            error_samples=sorted(set(errors))[:3],
+            throughput_rps=round(len(latencies) / elapsed, 2),
+            **percentiles(latencies),
+            queries_per_request=round(recorder.queries[name] / len(latencies), 2),
+            sql_ms_per_request=round(recorder.query_seconds[name] * 1000 / len(latencies), 3),
+        )
+
+    all_latencies = [latency for latencies in recorder.latencies.values() for latency in latencies]
+    return {
+        "started_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "mix": mix,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "database": database_url.split(":", 1)[0],
+            "write_behind": os.environ.get("WRITE_BEHIND", "1") != "0",
+            "admission": os.environ.get("ADMISSION", "1") != "0",
+        },
+        "elapsed_s": round(elapsed, 3),
+        "requests": len(all_latencies),
+        "errors": sum(len(errors) for errors in recorder.errors.values()),
+        "throughput_rps": round(len(all_latencies) / elapsed, 2),
+        "latency": percentiles(all_latencies) if all_latencies else None,
+        "background_queries": recorder.background_queries,
+        "endpoints": endpoints,
+    }
+
+
+def print_summary(report):
+    out = sys.stderr
+    print(f"{report['requests']} requests in {report['elapsed_s']}s: {report['throughput_rps']} req/s, "
+          f"{report['errors']} errors", file=out)
+    print(f"{'endpoint':<22}{'req/s':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}{'queries':>9}{'sql ms':>8}{'errors':>8}",
+          file=out)
+    for name, stats in report["endpoints"].items():
+        print(f"{name:<22}{stats['throughput_rps']:>8.1f}{stats['p50_ms']:>9.1f}{stats['p90_ms']:>9.1f}"
+              f"{stats['p99_ms']:>9.1f}{stats['max_ms']:>9.1f}{stats['queries_per_request']:>9.2f}"
+              f"{stats['sql_ms_per_request']:>8.2f}{stats['errors']:>8}", file=out)
+        for sample in stats["error_samples"]:
+            print(f"{'':<22}e.g. {sample}", file=out)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    mix = parse_mix(args.mix)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'load.db')}"
+        # The app reads its configuration at import
+        os.environ["DATABASE_URL"] = database_url
+        os.environ.pop("SQLALCHEMY_DATABASE_URI", None)
+        os.environ.setdefault("FLASK_SECRET_KEY", "load-test")
+        # Simulated users send far faster than people type; ADMISSION=1 measures with the limits on
+        os.environ.setdefault("ADMISSION", "0")
+
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+        from app import app, db, prepare_app
+        from extensions import write_behind
+        from utils.llm_router import LLMRouter, Provider, set_router
+        prepare_app(app)
+
+        stub = StubLLM(args.llm_latency, args.llm_jitter, args.stream_chunks, args.seed)
+        set_router(LLMRouter([Provider("stub", stub.generate, stub.stream)]))
+
+        print(f"seeding {args.users} users ...", file=sys.stderr)
+        seed_database(app, db, args)
+
+        recorder = Recorder()
+        event.listen(Engine, "before_cursor_execute", recorder.before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", recorder.after_cursor_execute)
+
+        print(f"running {args.users} users for {args.warmup}s warm-up + {args.duration}s ...", file=sys.stderr)
+        elapsed = run_load(app, args, mix, recorder)
+        write_behind.flush()
+
+        report = build_report(args, mix, recorder, elapsed, database_url)
+
+    print_summary(report)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == '__main__':
+    main()
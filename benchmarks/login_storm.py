@@ -0,0 +1,138 @@
+"""
+Logins per second and chat latency while a burst of logins runs in the
+same process, with passwords hashed on the request threads versus on the
+bounded hashing pool.
+
+Users start with legacy pbkdf2 hashes, so the first login of each also
+checks that the hash is upgraded to the configured method.
+
+Each setup runs in its own process because the pool is configured from
+the environment. The LLM is replaced by a stub provider.
+
+Run from the repository root:
+    python -m benchmarks.login_storm
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+USERS = 16
+LOGIN_THREADS = 8
+CHAT_THREADS = 2
+DURATION = 10  # seconds
+LEGACY_METHOD = "pbkdf2:sha256:600000"
+
+SETUPS = [
+    ("baseline", {"PASSWORD_HASH_WORKERS": "0"}, False),
+    ("inline", {"PASSWORD_HASH_WORKERS": "0"}, True),
+    ("pool", {}, True),
+]
+
+
+def percentile(latencies, q):
+    latencies = sorted(latencies)
+    return latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000 if latencies else 0.0
+
+
+def run_setup(storm):
+    """Child process: build the database, then chat with or without a concurrent login storm"""
+    from werkzeug.security import generate_password_hash
+    from app import app, db, prepare_app
+    from models import User
+    from utils.llm_router import LLMRouter, Provider, set_router
+    from utils.passwords import needs_rehash, PASSWORD_HASH_WORKERS
+    prepare_app(app)
+
+    set_router(LLMRouter([Provider("stub", lambda *args: "That sounds hard. Tell me more.")]))
+
+    legacy_hash = generate_password_hash("benchmark", LEGACY_METHOD)
+    with app.app_context():
+        db.session.execute(User.__table__.insert(), [
+            {"id": user_id, "username": f"bench{user_id}", "email": f"bench{user_id}@example.com",
+             "password_hash": legacy_hash}
+            for user_id in range(1, USERS + 1)
+        ])
+        db.session.commit()
+
+    stop = threading.Event()
+    logins = []
+    busy = []
+    chat_latencies = []
+    lock = threading.Lock()
+
+    def log_in(thread_index):
+        i = thread_index
+        while not stop.is_set():
+            client = app.test_client()
+            response = client.post('/login', data={'username': f"bench{i % USERS + 1}", 'password': "benchmark"})
+            with lock:
+                # Failed and refused logins both redirect back to /login
+                (logins if '/login' not in response.headers.get('Location', '') else busy).append(1)
+            i += LOGIN_THREADS
+
+    def chat(thread_index):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(thread_index + 1)
+            session['_fresh'] = True
+        while not stop.is_set():
+            start = time.perf_counter()
+            response = client.post('/api/send_message', json={'message': 'I feel anxious today'})
+            assert response.status_code == 200
+            with lock:
+                chat_latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=chat, args=(i,)) for i in range(CHAT_THREADS)]
+    if storm:
+        threads += [threading.Thread(target=log_in, args=(i,)) for i in range(LOGIN_THREADS)]
+    for thread in threads:
+        thread.start()
+    time.sleep(DURATION)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        stale = sum(needs_rehash(h) for (h,) in db.session.query(User.password_hash))
+
+    print(json.dumps({
+        "workers": PASSWORD_HASH_WORKERS,
+        "logins": len(logins),
+        "refused": len(busy),
+        "chats": len(chat_latencies),
+        "p50": percentile(chat_latencies, 0.5),
+        "p99": percentile(chat_latencies, 0.99),
+        "stale_hashes": stale if storm else None,
+    }))
+
+
+def main():
+    base_env = dict(os.environ, WRITE_BEHIND="0", ADMISSION="0", LLM_PROVIDERS="", FLASK_SECRET_KEY="benchmark",
+                    RESPONSE_CACHE="")
+    base_env.pop("SQLALCHEMY_DATABASE_URI", None)
+
+    print(f"{LOGIN_THREADS} login threads, {CHAT_THREADS} chat threads, {DURATION}s, {os.cpu_count()} CPUs")
+    print(f"{'setup':<10}{'workers':>8}{'logins/s':>10}{'refused':>9}{'chats/s':>9}{'chat p50 (ms)':>15}{'chat p99 (ms)':>15}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, env, storm in SETUPS:
+            args = [sys.executable, "-m", "benchmarks.login_storm", "--child"] + (["--storm"] if storm else [])
+            child = subprocess.run(args, capture_output=True, text=True, timeout=600, env=dict(
+                base_env, **env, DATABASE_URL=f"sqlite:///{os.path.join(tmp, name + '.db')}"))
+            if child.returncode != 0:
+                raise RuntimeError(child.stderr[-2000:])
+            result = json.loads(child.stdout.strip().splitlines()[-1])
+            print(f"{name:<10}{result['workers']:>8}{result['logins'] / DURATION:>10.1f}{result['refused']:>9}"
+                  f"{result['chats'] / DURATION:>9.0f}{result['p50']:>15.1f}{result['p99']:>15.1f}")
+            if storm:
+                assert result["stale_hashes"] == 0, "every logged-in user's hash should be upgraded"
+
+
+if __name__ == '__main__':
+    if "--child" in sys.argv:
+        run_setup("--storm" in sys.argv)
+    else:
+        main()
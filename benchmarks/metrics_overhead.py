@@ -0,0 +1,86 @@
+"""
+Cost of the instrumentation layer: /api/send_message through the Flask
+app with METRICS=0 and METRICS=1, and the time to render /metrics.
+
+Each setup runs in its own process because the switch is read when the
+app is created. The LLM is replaced by a stub provider.
+
+Run from the repository root:
+    python -m benchmarks.metrics_overhead
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REQUESTS = 2000
+
+
+def run_setup():
+    """Child process: time send_message, then a /metrics scrape if it is served"""
+    from app import app, db, prepare_app
+    from models import User
+    from utils.llm_router import LLMRouter, Provider, set_router
+    prepare_app(app)
+
+    set_router(LLMRouter([Provider("stub", lambda *args: "That sounds hard. Tell me more.")]))
+    with app.app_context():
+        db.session.execute(User.__table__.insert(), [
+            {"id": 1, "username": "bench", "email": "bench@example.com", "password_hash": "x"}
+        ])
+        db.session.commit()
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = "1"
+        session['_fresh'] = True
+
+    for _ in range(50):
+        client.post('/api/send_message', json={'message': 'I feel anxious today'})
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        assert client.post('/api/send_message', json={'message': 'I feel anxious today'}).status_code == 200
+    per_request = (time.perf_counter() - start) * 1e6 / REQUESTS
+
+    start = time.perf_counter()
+    response = client.get('/metrics')
+    scrape = (time.perf_counter() - start) * 1000
+    print(json.dumps({
+        "per_request_us": per_request,
+        "metrics_status": response.status_code,
+        "scrape_ms": scrape,
+        "scrape_bytes": len(response.data),
+        "sample": [line for line in response.get_data(as_text=True).splitlines()
+                   if line.startswith("chat_stage_duration_seconds_count")],
+    }))
+
+
+def main():
+    base_env = dict(os.environ, WRITE_BEHIND="0", ADMISSION="0", LLM_PROVIDERS="", FLASK_SECRET_KEY="benchmark",
+                    RESPONSE_CACHE="", CONTEXT_TOKEN_BUDGET="0")
+    base_env.pop("SQLALCHEMY_DATABASE_URI", None)
+
+    print(f"{REQUESTS} x /api/send_message")
+    print(f"{'METRICS':<9}{'us/request':>12}{'/metrics':>10}{'scrape (ms)':>13}{'bytes':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for setting in ("0", "1"):
+            child = subprocess.run([sys.executable, "-m", "benchmarks.metrics_overhead", "--child"],
+                                   capture_output=True, text=True, timeout=600,
+                                   env=dict(base_env, METRICS=setting,
+                                            DATABASE_URL=f"sqlite:///{os.path.join(tmp, setting + '.db')}"))
+            if child.returncode != 0:
+                raise RuntimeError(child.stderr[-2000:])
+            result = json.loads(child.stdout.strip().splitlines()[-1])
+            print(f"{setting:<9}{result['per_request_us']:>12.0f}{result['metrics_status']:>10}"
+                  f"{result['scrape_ms']:>13.2f}{result['scrape_bytes']:>8}")
+            for line in result["sample"]:
+                print(f"    {line}")
+
+
+if __name__ == '__main__':
+    if "--child" in sys.argv:
+        run_setup()
+    else:
+        main()
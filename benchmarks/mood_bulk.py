@@ -0,0 +1,126 @@
+"""
+Mood import and export through the Flask app: one POST /api/mood per record
+versus a single POST /api/mood/bulk, and building the full history in
+memory (as /api/mood-history does) versus streaming GET /api/mood/export.
+
+Run from the repository root:
+    python -m benchmarks.mood_bulk
+"""
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+IMPORT_SIZES = [100, 1000]
+EXPORT_SIZES = [10000, 100000]
+
+EMOTIONS = ["happy", "sad", "anxious", "angry", "calm", "tired"]
+
+
+def login(client, user_id):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+
+def make_records(rng, count):
+    start = datetime(2023, 1, 1)
+    return [
+        {"emotion": rng.choice(EMOTIONS), "intensity": round(rng.random(), 2),
+         "created_at": (start + timedelta(minutes=15 * i)).isoformat()}
+        for i in range(count)
+    ]
+
+
+def legacy_export(user_id):
+    """Build the whole history as one JSON document, like /api/mood-history"""
+    from flask import jsonify
+    from models import EmotionRecord
+
+    records = EmotionRecord.query.filter_by(user_id=user_id).order_by(EmotionRecord.created_at).all()
+    return jsonify([
+        {'id': r.id, 'emotion': r.emotion, 'intensity': r.intensity, 'created_at': r.created_at.isoformat()}
+        for r in records
+    ]).get_data()
+
+
+def measure(function):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = function()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed * 1000, peak / 1024 / 1024, size
+
+
+def main():
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ.setdefault("FLASK_SECRET_KEY", "benchmark")
+        from app import app, db, prepare_app
+        from models import User, DailyEmotionRollup
+        from utils.mood_io import validate_mood, insert_moods
+        prepare_app(app)
+
+        with app.app_context():
+            db.session.execute(User.__table__.insert(), [
+                {"id": user_id, "username": f"bench{user_id}", "email": f"bench{user_id}@example.com", "password_hash": "x"}
+                for user_id in range(1, 2 * len(IMPORT_SIZES) + len(EXPORT_SIZES) + 1)
+            ])
+            db.session.commit()
+
+        client = app.test_client()
+        user_id = 0
+
+        print("Import")
+        print(f"{'records':>8}{'single (ms)':>13}{'bulk (ms)':>11}{'speedup':>9}")
+        for count in IMPORT_SIZES:
+            records = make_records(rng, count)
+
+            user_id += 1
+            login(client, user_id)
+            start = time.perf_counter()
+            for record in records:
+                assert client.post('/api/mood', json=record).status_code == 200
+            single_ms = (time.perf_counter() - start) * 1000
+
+            user_id += 1
+            login(client, user_id)
+            start = time.perf_counter()
+            response = client.post('/api/mood/bulk', json={'records': records})
+            bulk_ms = (time.perf_counter() - start) * 1000
+            assert response.get_json() == {'inserted': count}
+            print(f"{count:>8}{single_ms:>13.0f}{bulk_ms:>11.0f}{single_ms / bulk_ms:>8.0f}x")
+
+        with app.app_context():
+            rollup_count = db.session.query(db.func.sum(DailyEmotionRollup.count)).filter_by(user_id=user_id).scalar()
+            assert rollup_count == IMPORT_SIZES[-1], "bulk import must keep the daily rollup in step"
+
+        print("\nExport")
+        print(f"{'records':>8}  {'mode':<10}{'time (ms)':>11}{'peak (MiB)':>12}{'bytes':>12}")
+        for count in EXPORT_SIZES:
+            user_id += 1
+            login(client, user_id)
+            with app.app_context():
+                insert_moods(user_id, [validate_mood(r, allow_timestamp=True) for r in make_records(rng, count)])
+
+            with app.test_request_context():
+                elapsed, peak, size = measure(lambda: len(legacy_export(user_id)))
+            print(f"{count:>8}  {'in memory':<10}{elapsed:>11.0f}{peak:>12.1f}{size:>12}")
+
+            for export_format in ('ndjson', 'csv'):
+                def stream():
+                    response = client.get(f'/api/mood/export?format={export_format}', buffered=False)
+                    total = sum(len(chunk) for chunk in response.response)
+                    response.close()
+                    return total
+                elapsed, peak, size = measure(stream)
+                print(f"{count:>8}  {export_format:<10}{elapsed:>11.0f}{peak:>12.1f}{size:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Per-call time and allocations of utils.prompts.build_prompt against the
+previous per-call string assembly in the LLM helpers.
+
+Run from the repository root:
+    python -m benchmarks.prompt_building
+"""
+import timeit
+import tracemalloc
+
+from utils.prompts import build_prompt, warm_prompt_cache
+
+ITERATIONS = 20000
+RESOURCES = [
+    {"title": "Deep Breathing Exercise", "summary": "Breathe in slowly for 4 counts, hold for 2, exhale for 6."},
+    {"title": "Grounding Technique", "summary": "Use the 5-4-3-2-1 technique to anchor yourself in the present."},
+    {"title": "Cognitive Behavioral Therapy", "summary": "Identify and change negative thought patterns."},
+]
+CASES = [
+    ("I can't stop worrying about tomorrow", "anxious", RESOURCES, False, 0),
+    ("I feel hopeless and trapped", "depressed", RESOURCES[:2], True, 5),
+]
+
+
+def legacy_build_prompt(user_message, emotion, relevant_resources, crisis_detected=False, crisis_level=0):
+    """The pre-template assembly from gemini_helper.get_ai_response"""
+    system_prompt = """
+    You are an AI-powered mental health assistant designed to provide supportive conversations and coping strategies.
+    You are not a replacement for a licensed therapist but can offer evidence-based techniques and empathetic responses.
+    Always prioritize user safety and well-being. Be empathetic, warm, and conversational in your tone.
+
+    When responding:
+    1. Acknowledge the user's emotions with empathy
+    2. Provide evidence-based coping strategies when appropriate
+    3. Encourage healthy behaviors and thought patterns
+    4. Never diagnose medical conditions or prescribe medications
+    5. If a user appears to be in crisis, provide crisis resources and encourage professional help
+
+    The user's detected emotion in this message is: {emotion}
+    """
+
+    if crisis_detected:
+        system_prompt += f"""
+        IMPORTANT: Crisis detected (level: {crisis_level}/10).
+        Prioritize safety and provide appropriate crisis resources.
+        Be direct yet compassionate about the importance of seeking immediate help.
+        Include the National Suicide Prevention Lifeline (988) and Crisis Text Line (text HOME to 741741).
+        """
+
+    resources_context = ""
+    if relevant_resources:
+        resources_context = "Here are some relevant therapeutic approaches that might help:\n"
+        for resource in relevant_resources:
+            resources_context += f"- {resource['title']}: {resource['summary']}\n"
+
+    return system_prompt.format(emotion=emotion) + "\n\n" + resources_context + "\n\nUser message: " + user_message
+
+
+def peak_bytes(fn, args):
+    """Average peak memory allocated while building one prompt"""
+    tracemalloc.start()
+    total = 0
+    for _ in range(ITERATIONS // 10):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        fn(*args)
+        total += tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return total / (ITERATIONS // 10)
+
+
+def main():
+    warm_prompt_cache()
+    print(f"{'case':<12}{'legacy (us)':>13}{'templated (us)':>16}{'legacy (B)':>12}{'templated (B)':>15}")
+    for name, args in zip(["plain", "crisis"], CASES):
+        assert build_prompt(*args) == legacy_build_prompt(*args)
+
+        legacy_us = timeit.timeit(lambda: legacy_build_prompt(*args), number=ITERATIONS) / ITERATIONS * 1e6
+        new_us = timeit.timeit(lambda: build_prompt(*args), number=ITERATIONS) / ITERATIONS * 1e6
+        legacy_bytes = peak_bytes(legacy_build_prompt, args)
+        new_bytes = peak_bytes(build_prompt, args)
+
+        print(f"{name:<12}{legacy_us:>13.2f}{new_us:>16.2f}{legacy_bytes:>12.0f}{new_bytes:>15.0f}")
+
+
+if __name__ == '__main__':
+    main()
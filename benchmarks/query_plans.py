@@ -0,0 +1,176 @@
+"""
+Query plans and latency of the per-user, time-ordered queries in routes.py
+before and after the (user_id, created_at) indexes.
+
+Seeds a SQLite database with the old schema (no indexes), times the hot
+queries, runs migrations.upgrade_schema and times them again. The run
+fails with an AssertionError if the migration does not create the
+indexes, or if EXPLAIN QUERY PLAN shows a query not searching its
+table's (user_id, created_at) index or sorting in a temporary B-tree
+once the indexes exist.
+
+Run from the repository root:
+    python -m benchmarks.query_plans
+"""
+import os
+import random
+import re
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import text
+
+from extensions import db
+from migrations import upgrade_schema
+from models import User, Assessment, ChatMessage, EmotionRecord
+from utils.chat_history import chat_page_query
+
+USERS = 500
+CHAT_MESSAGES_PER_USER = 400
+EMOTION_RECORDS_PER_USER = 200
+ASSESSMENTS_PER_USER = 20
+REPEAT = 20
+
+# Cursor for the older-page query, in the middle of every user's chat history
+PAGE_BEFORE = (datetime(2024, 1, 1) + timedelta(minutes=CHAT_MESSAGES_PER_USER // 2), 10 ** 9)
+
+EMOTIONS = ["happy", "sad", "anxious", "angry", "neutral"]
+
+# The composite index each hot query must search once upgrade_schema has run
+EXPECTED_INDEXES = {
+    "login: latest assessment": "ix_assessment_user_created",
+    "dashboard: assessments": "ix_assessment_user_created",
+    "dashboard: emotions": "ix_emotion_record_user_created",
+    "chat: latest page": "ix_chat_message_user_created",
+    "chat: older page": "ix_chat_message_user_created",
+    "mood_history: emotions": "ix_emotion_record_user_created",
+}
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    db.init_app(app)
+    return app
+
+
+def seed(rng):
+    """Insert users and interleaved per-user history, then drop the new indexes"""
+    db.create_all()
+    start = datetime(2024, 1, 1)
+
+    db.session.execute(User.__table__.insert(), [
+        {"id": user_id, "username": f"user{user_id}", "email": f"user{user_id}@example.com", "password_hash": "x"}
+        for user_id in range(1, USERS + 1)
+    ])
+
+    def rows(per_user, make_row):
+        # Interleave users the way a busy site writes rows
+        batch = []
+        for step in range(per_user):
+            for user_id in range(1, USERS + 1):
+                batch.append(make_row(user_id, start + timedelta(minutes=step, seconds=user_id)))
+        return batch
+
+    db.session.execute(ChatMessage.__table__.insert(), rows(CHAT_MESSAGES_PER_USER, lambda user_id, at: {
+        "user_id": user_id, "content": "How are you feeling today?", "is_user": rng.random() < 0.5,
+        "emotion": rng.choice(EMOTIONS), "created_at": at
+    }))
+    db.session.execute(EmotionRecord.__table__.insert(), rows(EMOTION_RECORDS_PER_USER, lambda user_id, at: {
+        "user_id": user_id, "emotion": rng.choice(EMOTIONS), "intensity": rng.random(), "created_at": at
+    }))
+    db.session.execute(Assessment.__table__.insert(), rows(ASSESSMENTS_PER_USER, lambda user_id, at: {
+        "user_id": user_id, "score": rng.uniform(0, 27), "answers": "{}", "created_at": at
+    }))
+
+    # Recreate the pre-index schema of an existing deployment
+    for model in (Assessment, ChatMessage, EmotionRecord):
+        for index in model.__table__.indexes:
+            db.session.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+    db.session.commit()
+    db.session.execute(text("ANALYZE"))
+
+
+def hot_queries(user_id):
+    """The per-user queries issued by login, dashboard, chat, chat_history, mood_tracker and mood_history"""
+    return {
+        "login: latest assessment": Assessment.query.filter_by(user_id=user_id)
+            .order_by(Assessment.created_at.desc()).limit(1),
+        "dashboard: assessments": Assessment.query.filter_by(user_id=user_id)
+            .order_by(Assessment.created_at.desc()),
+        "dashboard: emotions": EmotionRecord.query.filter_by(user_id=user_id)
+            .order_by(EmotionRecord.created_at.desc()).limit(30),
+        "chat: latest page": chat_page_query(user_id),
+        "chat: older page": chat_page_query(user_id, PAGE_BEFORE),
+        "mood_history: emotions": EmotionRecord.query.filter_by(user_id=user_id)
+            .order_by(EmotionRecord.created_at.desc()).limit(30),
+    }
+
+
+def query_plan(query):
+    statement = query.statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+    rows = db.session.execute(text(f"EXPLAIN QUERY PLAN {statement}")).fetchall()
+    return [row[-1] for row in rows]
+
+
+def time_queries(rng):
+    timings = {}
+    for _ in range(REPEAT):
+        user_id = rng.randint(1, USERS)
+        for name, query in hot_queries(user_id).items():
+            start = time.perf_counter()
+            query.all()
+            timings.setdefault(name, []).append(time.perf_counter() - start)
+            db.session.expunge_all()
+    return {name: sorted(samples)[len(samples) // 2] * 1000 for name, samples in timings.items()}
+
+
+def check_plans(created):
+    """Assert that the indexes were created and that every hot query searches its index without sorting"""
+    missing = set(EXPECTED_INDEXES.values()) - set(created)
+    assert not missing, f"upgrade_schema did not create {', '.join(sorted(missing))}"
+
+    queries = hot_queries(1)
+    assert set(queries) == set(EXPECTED_INDEXES), "every hot query needs an entry in EXPECTED_INDEXES"
+    for name, query in queries.items():
+        plan = query_plan(query)
+        searches = re.compile(rf"^SEARCH \w+ USING (COVERING )?INDEX {EXPECTED_INDEXES[name]} ")
+        assert any(searches.match(step) for step in plan), \
+            f"{name} does not search {EXPECTED_INDEXES[name]}: {'; '.join(plan)}"
+        assert not any("TEMP B-TREE" in step for step in plan), \
+            f"{name} sorts in a temporary B-tree: {'; '.join(plan)}"
+
+
+def main():
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, "bench.db"))
+        with app.app_context():
+            seed(rng)
+            print(f"Seeded {USERS} users, {USERS * CHAT_MESSAGES_PER_USER} chat messages, "
+                  f"{USERS * EMOTION_RECORDS_PER_USER} emotion records")
+
+            before = time_queries(random.Random(1))
+            before_plans = {name: query_plan(query) for name, query in hot_queries(1).items()}
+            created = upgrade_schema(db)
+            db.session.execute(text("ANALYZE"))
+            after = time_queries(random.Random(1))
+
+            print(f"Created indexes: {', '.join(created)}\n")
+            print(f"{'query':<26}{'before (ms)':>12}{'after (ms)':>12}{'speedup':>9}")
+            for name in before:
+                print(f"{name:<26}{before[name]:>12.2f}{after[name]:>12.3f}{before[name] / after[name]:>8.0f}x")
+
+            print("\nQuery plans:")
+            for name, query in hot_queries(1).items():
+                print(f"  {name}\n    before: {'; '.join(before_plans[name])}\n    after:  {'; '.join(query_plan(query))}")
+
+            check_plans(created)
+
+    print("\nAll hot queries use a (user_id, created_at) index without a sort step")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Per-call latency of utils.rag.fallback_resources against the previous
+implementation, which re-read and re-scanned therapy_documents.json on
+every call.
+
+Run from the repository root:
+    python -m benchmarks.rag_lookup
+"""
+import json
+import timeit
+
+from utils.emotion_detection import EMOTIONS
+from utils.rag import THERAPY_DOCS_PATH, fallback_resources
+
+ITERATIONS = 2000
+
+
+def legacy_fallback_resources(emotion):
+    """The pre-index lookup: open, parse and scan the corpus per call"""
+    with open(THERAPY_DOCS_PATH, 'r') as f:
+        all_docs = json.load(f)
+
+    emotion_docs = []
+    for doc in all_docs:
+        if emotion.lower() in doc.get("title", "").lower() or emotion.lower() in doc.get("content", "").lower():
+            emotion_docs.append({
+                "title": doc.get("title", ""),
+                "summary": doc.get("summary", "")
+            })
+            if len(emotion_docs) >= 3:
+                break
+    return emotion_docs
+
+
+def main():
+    print(f"{'emotion':<12}{'legacy (us)':>14}{'indexed (us)':>14}{'speedup':>10}")
+    for emotion in EMOTIONS:
+        indexed = fallback_resources(emotion)
+        legacy = legacy_fallback_resources(emotion)
+        if legacy:
+            assert indexed == legacy, emotion
+
+        legacy_time = timeit.timeit(lambda: legacy_fallback_resources(emotion), number=ITERATIONS)
+        indexed_time = timeit.timeit(lambda: fallback_resources(emotion), number=ITERATIONS)
+
+        legacy_us = legacy_time / ITERATIONS * 1e6
+        indexed_us = indexed_time / ITERATIONS * 1e6
+        print(f"{emotion:<12}{legacy_us:>14.1f}{indexed_us:>14.2f}{legacy_us / indexed_us:>9.0f}x")
+
+
+if __name__ == '__main__':
+    main()
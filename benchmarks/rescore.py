@@ -0,0 +1,161 @@
+"""
+`flask rescore-messages`: throughput and peak memory of re-scoring stored
+chat messages with scoring inline versus in a process pool, and a run that
+is interrupted part way and resumed from its checkpoint.
+
+Every user message starts with a stale emotion and no crisis level. The
+older half of the messages have their emotion record a little after the
+reply, as rows were saved before chat turns were written together; the
+rest share the message's timestamp. Each setup works on its own copy of the same seeded SQLite database, in its own
+process so peak RSS is per setup.
+
+Run from the repository root:
+    python -m benchmarks.rescore
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+MESSAGES = 200000  # half from users, half replies
+USERS = 50
+CHUNK_SIZE = 5000
+INTERRUPT_AFTER = 7  # chunks
+
+SENTENCES = [
+    "I have been feeling anxious about work lately and it keeps me up at night.",
+    "My sister called yesterday and we argued again, I am so angry.",
+    "I tried the breathing exercise you suggested and I feel calm and hopeful.",
+    "Some days I feel hopeless and I do not want to get out of bed at all.",
+    "I just want to end it all, I can't go on.",
+    "Nothing much happened today.",
+]
+REPLY = "That sounds really difficult. What usually helps you unwind?"
+
+
+class Interrupted(Exception):
+    pass
+
+
+def seed(path):
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    from app import app, db, prepare_app
+    from models import User, ChatMessage, EmotionRecord
+    prepare_app(app)
+
+    start = datetime(2023, 1, 1)
+    with app.app_context():
+        db.session.execute(User.__table__.insert(), [
+            {"id": user_id, "username": f"bench{user_id}", "email": f"bench{user_id}@example.com", "password_hash": "x"}
+            for user_id in range(1, USERS + 1)
+        ])
+        for offset in range(0, MESSAGES, 20000):
+            messages, records = [], []
+            for i in range(offset, offset + 20000):
+                user_id = i // 2 % USERS + 1
+                created_at = start + timedelta(seconds=i)
+                if i % 2 == 0:
+                    messages.append({"user_id": user_id, "content": SENTENCES[i // 2 % len(SENTENCES)],
+                                     "is_user": True, "emotion": "neutral", "created_at": created_at})
+                    # Older rows: the record was committed with the reply
+                    recorded_at = created_at + timedelta(seconds=1.25) if i < MESSAGES // 2 else created_at
+                    records.append({"user_id": user_id, "emotion": "neutral", "intensity": 0.5,
+                                    "created_at": recorded_at})
+                else:
+                    messages.append({"user_id": user_id, "content": REPLY, "is_user": False, "emotion": None,
+                                     "created_at": created_at})
+            db.session.execute(ChatMessage.__table__.insert(), messages)
+            db.session.execute(EmotionRecord.__table__.insert(), records)
+        db.session.commit()
+
+
+def run_setup(workers, interrupt):
+    """Child process: rescore the database, optionally stopping after a few chunks and resuming"""
+    import resource
+    from app import app, db
+    from models import ChatMessage, EmotionRecord, DailyEmotionRollup
+    from utils.rescore import rescore_messages
+
+    checkpoint = os.environ["DATABASE_URL"][len("sqlite:///"):] + ".checkpoint"
+    chunks = []
+
+    def stop_early(state):
+        chunks.append(state["last_id"])
+        if interrupt and len(chunks) == INTERRUPT_AFTER:
+            raise Interrupted()
+
+    with app.app_context():
+        resumed_from = None
+        try:
+            state = rescore_messages(db.engine, checkpoint, CHUNK_SIZE, workers, on_progress=stop_early)
+        except Interrupted:
+            with open(checkpoint) as f:
+                resumed_from = json.load(f)["last_id"]
+            state = rescore_messages(db.engine, checkpoint, CHUNK_SIZE, workers)
+
+        emotions = dict(db.session.query(ChatMessage.emotion, db.func.count())
+                        .filter(ChatMessage.is_user.is_(True)).group_by(ChatMessage.emotion).all())
+        records = dict(db.session.query(EmotionRecord.emotion, db.func.count()).group_by(EmotionRecord.emotion).all())
+        crises = db.session.query(db.func.count()).filter(ChatMessage.crisis_level > 0).scalar()
+        rollup = db.session.query(DailyEmotionRollup.emotion, db.func.sum(DailyEmotionRollup.count)) \
+            .group_by(DailyEmotionRollup.emotion).all()
+
+    print(json.dumps({
+        "seconds": state["seconds"],
+        "processed": state["processed"],
+        "changed": state["changed"],
+        "resumed_from": resumed_from,
+        "peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "emotions": emotions,
+        "records": records,
+        "crises": crises,
+        "rollup": sorted(map(list, rollup)),
+    }))
+
+
+def main():
+    base_env = dict(os.environ, WRITE_BEHIND="0", FLASK_SECRET_KEY="benchmark")
+    base_env.pop("SQLALCHEMY_DATABASE_URI", None)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        seeded = os.path.join(tmp, "seed.db")
+        subprocess.run([sys.executable, "-m", "benchmarks.rescore", "--seed", seeded],
+                       env=base_env, check=True, capture_output=True)
+
+        setups = [("inline", 0, False), ("pool", max(2, os.cpu_count() or 1), False),
+                  ("resumed", max(2, os.cpu_count() or 1), True)]
+        print(f"{MESSAGES // 2} user messages, chunks of {CHUNK_SIZE}, {os.cpu_count()} CPUs")
+        print(f"{'setup':<9}{'workers':>8}{'messages/s':>12}{'changed':>9}{'peak RSS (MiB)':>16}")
+        results = []
+        for name, workers, interrupt in setups:
+            path = os.path.join(tmp, name + ".db")
+            shutil.copy(seeded, path)
+            args = [sys.executable, "-m", "benchmarks.rescore", "--child", str(workers)] + (["--interrupt"] if interrupt else [])
+            child = subprocess.run(args, capture_output=True, text=True, timeout=1200,
+                                   env=dict(base_env, DATABASE_URL=f"sqlite:///{path}"))
+            if child.returncode != 0:
+                raise RuntimeError(child.stderr[-2000:])
+            result = json.loads(child.stdout.strip().splitlines()[-1])
+            results.append(result)
+            resumed = f"  (stopped after id {result['resumed_from']}, resumed)" if result["resumed_from"] else ""
+            print(f"{name:<9}{workers:>8}{result['processed'] / result['seconds']:>12.0f}{result['changed']:>9}"
+                  f"{result['peak_rss_mib']:>16.1f}{resumed}")
+
+        for result in results:
+            assert result["records"] == result["emotions"], "emotion records not rescored with their messages"
+        for result in results[1:]:
+            assert (result["emotions"], result["crises"], result["rollup"]) == \
+                   (results[0]["emotions"], results[0]["crises"], results[0]["rollup"]), "setups disagree"
+        print(f"\nemotions: {results[0]['emotions']}, messages with a crisis level: {results[0]['crises']}")
+
+
+if __name__ == '__main__':
+    if "--seed" in sys.argv:
+        seed(sys.argv[sys.argv.index("--seed") + 1])
+    elif "--child" in sys.argv:
+        run_setup(int(sys.argv[sys.argv.index("--child") + 1]), "--interrupt" in sys.argv)
+    else:
+        main()
@@ -0,0 +1,60 @@
+"""
+Per-query latency of the BM25 retriever behind get_therapy_resources as
+the corpus grows, using synthetic documents drawn from the real corpus
+vocabulary.
+
+Run from the repository root:
+    python -m benchmarks.retrieval
+"""
+import json
+import random
+import time
+
+from utils.rag import THERAPY_DOCS_PATH
+from utils.retrieval import BM25Index, tokenize
+
+CORPUS_SIZES = [10, 1000, 10000, 50000]
+QUERIES = [
+    "I can't sleep and keep worrying about work anxiety worry",
+    "my grandmother died and I miss her sadness grief",
+    "I feel ashamed and keep criticising myself depression",
+    "everything is too much and I am overwhelmed stress",
+]
+ITERATIONS = 500
+
+
+def synthetic_corpus(size, seed=0):
+    with open(THERAPY_DOCS_PATH, 'r') as f:
+        documents = json.load(f)
+    vocabulary = sorted({term for doc in documents for term in tokenize(doc["content"])})
+
+    rng = random.Random(seed)
+    corpus = list(documents)
+    while len(corpus) < size:
+        corpus.append({
+            "summary": " ".join(rng.choices(vocabulary, k=20)),
+            "content": " ".join(rng.choices(vocabulary, k=120)),
+            "keywords": rng.choices(vocabulary, k=5)
+        })
+    return corpus[:size]
+
+
+def main():
+    print(f"{'documents':>10}{'build (s)':>12}{'query (us)':>12}")
+    for size in CORPUS_SIZES:
+        corpus = synthetic_corpus(size)
+
+        start = time.perf_counter()
+        index = BM25Index.build(corpus)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(ITERATIONS):
+            index.search(QUERIES[i % len(QUERIES)], top_k=3)
+        query_us = (time.perf_counter() - start) / ITERATIONS * 1e6
+
+        print(f"{size:>10}{build_time:>12.2f}{query_us:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""
+Start-up cost of the app and memory shared between forked workers.
+
+Import: wall time and RSS of a fresh interpreter
+    previous   provider SDKs imported and the schema created at import,
+               as app.py did before create_app/prepare_app
+    import     `import app` alone (the factory; no SDK, no database)
+    prepared   `import app` plus prepare_app, as the gunicorn master runs it
+
+Fork: WORKERS children forked from a master, each serving the same few
+requests (a page and a chat turn with a stub LLM)
+    per-worker  the master has loaded nothing; every worker imports and
+                builds its own state (no preload)
+    preload     the master imports and prepares the app and freezes the
+                GC before forking (gunicorn.conf.py)
+reporting time from fork to the first response and each worker's
+private (unshared) memory.
+
+Linux only: memory is read from /proc.
+
+Run from the repository root:
+    python -m benchmarks.startup
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+WORKERS = 4
+REQUESTS = 5
+
+IMPORT_MODES = {
+    "previous": """
+import google.generativeai, openai
+from app import app, db
+from migrations import upgrade_schema
+with app.app_context():
+    upgrade_schema(db)
+""",
+    "import": """
+import app
+""",
+    "prepared": """
+from app import app, prepare_app
+prepare_app(app)
+""",
+}
+
+
+def memory_kib(pid="self"):
+    """Resident and private (Private_Clean + Private_Dirty) memory of a process"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            if name in ("Rss", "Private_Clean", "Private_Dirty"):
+                values[name] = int(rest.split()[0])
+    return values["Rss"], values["Private_Clean"] + values["Private_Dirty"]
+
+
+def measure_import(mode):
+    """Child process: run one start-up path and print its time and memory"""
+    start = time.perf_counter()
+    exec(IMPORT_MODES[mode], {})
+    elapsed = time.perf_counter() - start
+    rss, _ = memory_kib()
+    print(json.dumps({"seconds": elapsed, "rss_kib": rss}))
+
+
+def serve():
+    """In a forked worker: answer REQUESTS page loads and chat turns"""
+    from app import app
+    from utils.llm_router import LLMRouter, Provider, set_router
+
+    set_router(LLMRouter([Provider("stub", lambda *args: "That sounds hard. Tell me more.")]))
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = "1"
+        session['_fresh'] = True
+
+    first = None
+    for _ in range(REQUESTS):
+        assert client.get('/login').status_code in (200, 302)
+        assert client.post('/api/send_message', json={'message': 'I feel anxious about work'}).status_code == 200
+        if first is None:
+            first = time.perf_counter()
+    return first
+
+
+def measure_fork(preload):
+    """Child process: act as a gunicorn-like master and fork WORKERS workers"""
+    import gc
+
+    if preload:
+        from app import app, prepare_app
+        prepare_app(app)
+        gc.freeze()
+
+    results = []
+    for _ in range(WORKERS):
+        read_fd, write_fd = os.pipe()
+        forked_at = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            first = serve()
+            rss, private = memory_kib()
+            os.write(write_fd, json.dumps({"first_response": first - forked_at, "rss_kib": rss,
+                                           "private_kib": private}).encode())
+            os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd) as pipe:
+            results.append(json.loads(pipe.read()))
+        os.waitpid(pid, 0)
+
+    print(json.dumps(results))
+
+
+def run_child(args, env):
+    child = subprocess.run([sys.executable, "-m", "benchmarks.startup"] + args,
+                           capture_output=True, text=True, timeout=600, env=env)
+    if child.returncode != 0:
+        raise RuntimeError(child.stderr[-2000:])
+    return json.loads(child.stdout.strip().splitlines()[-1])
+
+
+def main():
+    base_env = dict(os.environ, WRITE_BEHIND="0", ADMISSION="0", LLM_PROVIDERS="", FLASK_SECRET_KEY="benchmark",
+                    RESPONSE_CACHE="", METRICS="1")
+    base_env.pop("SQLALCHEMY_DATABASE_URI", None)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'import':<10}{'time (ms)':>11}{'RSS (MiB)':>11}")
+        for mode in IMPORT_MODES:
+            env = dict(base_env, DATABASE_URL=f"sqlite:///{os.path.join(tmp, mode + '.db')}")
+            result = run_child(["--import", mode], env)
+            print(f"{mode:<10}{result['seconds'] * 1000:>11.0f}{result['rss_kib'] / 1024:>11.1f}")
+
+        # One database with a user, shared by both fork setups
+        env = dict(base_env, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'fork.db')}")
+        run_child(["--import", "prepared"], env)
+        subprocess.run([sys.executable, "-c",
+                        "from app import app, db\nfrom models import User\n"
+                        "with app.app_context():\n"
+                        "    db.session.add(User(id=1, username='bench', email='bench@example.com', password_hash='x'))\n"
+                        "    db.session.commit()"], env=env, check=True, capture_output=True)
+
+        print(f"\n{WORKERS} forked workers, {REQUESTS} page loads and chat turns each")
+        print(f"{'fork':<12}{'first response (ms)':>21}{'RSS (MiB)':>11}{'private (MiB)':>15}{'total private':>15}")
+        for name, args in (("per-worker", ["--fork"]), ("preload", ["--fork", "--preload"])):
+            workers = run_child(args, env)
+            first = sum(w["first_response"] for w in workers) / len(workers) * 1000
+            rss = sum(w["rss_kib"] for w in workers) / len(workers) / 1024
+            private = sum(w["private_kib"] for w in workers) / len(workers) / 1024
+            print(f"{name:<12}{first:>21.0f}{rss:>11.1f}{private:>15.1f}{private * WORKERS:>15.1f}")
+
+
+if __name__ == '__main__':
+    if "--import" in sys.argv:
+        measure_import(sys.argv[sys.argv.index("--import") + 1])
+    elif "--fork" in sys.argv:
+        measure_fork("--preload" in sys.argv)
+    else:
+        main()
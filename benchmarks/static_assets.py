@@ -0,0 +1,76 @@
+"""
+Static files as Flask serves them by default versus the `flask build-static`
+output: hashed names, precompressed variants and immutable caching.
+
+For every file under static/ reports the bytes sent on a first visit (the
+client accepts gzip and brotli), the requests a repeat visit makes (no-cache
+responses are revalidated, immutable ones are not) and the server time per
+request.
+
+Run from the repository root:
+    python -m benchmarks.static_assets
+"""
+import os
+import tempfile
+import time
+
+REPEAT = 500
+ACCEPT = {"Accept-Encoding": "gzip, deflate, br", "Accept": "image/avif,image/webp,*/*"}
+
+
+def fetch(client, url, headers):
+    response = client.get(url, headers=headers)
+    assert response.status_code in (200, 304), (url, response.status_code)
+    body = response.get_data()
+    response.close()
+    return response, len(body)
+
+
+def average_us(client, url, headers):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fetch(client, url, headers)
+    return (time.perf_counter() - start) * 1e6 / REPEAT
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ["STATIC_BUILD_DIR"] = os.path.join(tmp, "dist")
+        os.environ.setdefault("FLASK_SECRET_KEY", "benchmark")
+        from flask import url_for
+        from utils.static_assets import build_static
+        from app import app, static_assets
+
+        files = build_static(app.static_folder)
+        static_assets.load(app.static_folder)
+        client = app.test_client()
+
+        print(f"{'file':<20}{'setup':<8}{'sent':>8}{'encoding':>10}{'repeat visit':>14}{'us/request':>12}")
+        totals = {"plain": 0, "built": 0}
+        for name in files:
+            with app.test_request_context():
+                built_url = url_for('static', filename=name)
+            plain_url = f"{app.static_url_path}/{name}"
+            assert built_url != plain_url
+
+            for setup, url in (("plain", plain_url), ("built", built_url)):
+                response, sent = fetch(client, url, ACCEPT)
+                encoding = response.headers.get("Content-Encoding", "-")
+                cache_control = response.headers.get("Cache-Control", "")
+                if "immutable" in cache_control:
+                    repeat = "cached"
+                else:
+                    validator = {"If-None-Match": response.headers["ETag"]} if "ETag" in response.headers else {}
+                    revalidated, _ = fetch(client, url, dict(ACCEPT, **validator))
+                    repeat = f"{revalidated.status_code}"
+                totals[setup] += sent
+                print(f"{name:<20}{setup:<8}{sent:>8}{encoding:>10}{repeat:>14}"
+                      f"{average_us(client, url, ACCEPT):>12.0f}")
+
+        print(f"\nfirst visit: {totals['plain']} bytes plain, {totals['built']} bytes built "
+              f"({totals['built'] / totals['plain']:.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Time to first chunk versus full generation time for the streaming reply
+path through the LLM router, driven by a local fake Gemini model that yields chunks with delays.
+
+Run from the repository root:
+    python -m benchmarks.streaming
+"""
+import time
+
+from utils.llm_router import LLMRouter, Provider, set_router, get_ai_response, stream_ai_response
+import utils.gemini_helper as gemini_helper
+
+CHUNKS = 20
+CHUNK_DELAY = 0.05
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeStreamingModel:
+    """Stands in for genai.GenerativeModel with a fixed per-chunk delay"""
+
+    def __init__(self, chunks=CHUNKS, delay=CHUNK_DELAY):
+        self.chunks = chunks
+        self.delay = delay
+
+    def _generate(self):
+        for i in range(self.chunks):
+            time.sleep(self.delay)
+            yield FakeChunk(f"word{i} ")
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        if stream:
+            return self._generate()
+        return FakeChunk("".join(chunk.text for chunk in self._generate()))
+
+
+def main():
+    resources = [{"title": "Grounding Technique", "summary": "Use the 5-4-3-2-1 technique."}]
+    fake_model = FakeStreamingModel()
+    gemini_helper.get_model = lambda: fake_model
+    set_router(LLMRouter([Provider("gemini", gemini_helper.generate_response, gemini_helper.stream_response)]))
+
+    start = time.perf_counter()
+    get_ai_response("I feel anxious", "anxious", resources)
+    blocking = time.perf_counter() - start
+
+    start = time.perf_counter()
+    first_chunk = None
+    for _ in stream_ai_response("I feel anxious", "anxious", resources):
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - start
+    streamed = time.perf_counter() - start
+
+    print(f"blocking reply:         {blocking * 1000:8.1f} ms to first byte")
+    print(f"streamed reply:         {first_chunk * 1000:8.1f} ms to first chunk")
+    print(f"streamed reply total:   {streamed * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
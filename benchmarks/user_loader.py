@@ -0,0 +1,101 @@
+"""
+SQL statements per authenticated request through the Flask app, with the
+user cache off (every request loads the User row) and on.
+
+Fails with an AssertionError unless, for every endpoint, the cache leaves
+only the first request's user SELECT and cuts the statement count by one
+per request. Also checks that a change to the user is seen on the next
+request.
+
+Run from the repository root:
+    python -m benchmarks.user_loader
+"""
+import os
+import re
+import tempfile
+import time
+
+REQUESTS = 200
+
+# The user loader's query; "user" is quoted on databases where it is a reserved word
+USER_SELECT = re.compile(r'^SELECT .*\sFROM "?user"?(\s|$)', re.DOTALL)
+
+
+def login(client, user_id):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ.setdefault("FLASK_SECRET_KEY", "benchmark")
+        os.environ["WRITE_BEHIND"] = "0"
+        os.environ["ADMISSION"] = "0"
+        from sqlalchemy import event
+        from app import app, db, prepare_app
+        from models import User
+        from utils.llm_router import LLMRouter, Provider, set_router
+        from utils.user_cache import user_cache
+        prepare_app(app)
+
+        set_router(LLMRouter([Provider("stub", lambda *args: "That sounds hard. Tell me more.")]))
+
+        with app.app_context():
+            user = User(username="bench", email="bench@example.com")
+            user.set_password("benchmark")
+            db.session.add(user)
+            db.session.commit()
+            user_id = user.id
+            engine = db.engine
+
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        client = app.test_client()
+        login(client, user_id)
+        requests = [
+            ("send_message", lambda: client.post('/api/send_message', json={'message': 'I feel anxious today'})),
+            ("feedback", lambda: client.post('/api/feedback', json={'message_id': 2, 'is_positive': True})),
+            ("mood_history", lambda: client.get('/api/mood-history')),
+        ]
+
+        print(f"{REQUESTS} requests per endpoint")
+        print(f"{'endpoint':<14}{'cache':<7}{'queries/req':>12}{'user SELECTs':>14}{'time (ms/req)':>15}")
+        for name, request in requests:
+            counts = {}
+            for enabled in (False, True):
+                user_cache.enabled = enabled
+                user_cache.clear()
+                del statements[:]
+                start = time.perf_counter()
+                for _ in range(REQUESTS):
+                    assert request().status_code == 200
+                elapsed = (time.perf_counter() - start) * 1000 / REQUESTS
+                user_selects = sum(1 for statement in statements if USER_SELECT.match(statement))
+                counts[enabled] = (len(statements), user_selects)
+                print(f"{name:<14}{'on' if enabled else 'off':<7}{len(statements) / REQUESTS:>12.2f}"
+                      f"{user_selects:>14}{elapsed:>15.2f}")
+
+            (off_total, off_users), (on_total, on_users) = counts[False], counts[True]
+            assert off_users >= REQUESTS, f"{name}: expected a user SELECT per request with the cache off"
+            # Only the cold first request loads the user once the cache is on
+            assert on_users == 1, f"{name}: {on_users} user SELECTs with a warm cache, expected 1"
+            assert on_total <= off_total - (REQUESTS - 1), \
+                f"{name}: {on_total} statements with the cache on versus {off_total} off"
+
+        stats = user_cache.stats()
+        print(f"\nhit rate {stats['hit_rate']:.1%} ({stats['hits']} hits, {stats['misses']} misses)")
+
+        with app.app_context():
+            db.session.get(User, user_id).username = "renamed"
+            db.session.commit()
+        with app.app_context():
+            from models import load_user
+            assert load_user(str(user_id)).username == "renamed", "updates must invalidate the cached user"
+        print(f"update invalidated the cached user ({user_cache.stats()['invalidations']} invalidations)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Chat persistence throughput and request-thread latency with the
+write-behind queue versus the previous two synchronous commits per
+message, with many simulated users writing at once.
+
+Run from the repository root:
+    python -m benchmarks.write_behind
+"""
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from flask import Flask
+
+from extensions import db
+from models import User, ChatMessage, EmotionRecord
+from utils.write_behind import WriteBehindWriter
+
+THREADS = [1, 8, 32]
+MESSAGES_PER_THREAD = 50
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username="bench", email="bench@example.com", password_hash="x"))
+        db.session.commit()
+    return app
+
+
+def synchronous_turn(app, user_id):
+    """The previous send_message persistence: two commits on the request thread"""
+    with app.app_context():
+        db.session.add(ChatMessage(user_id=user_id, content="I feel anxious", is_user=True, emotion="anxious"))
+        db.session.commit()
+        db.session.add(EmotionRecord(user_id=user_id, emotion="anxious", intensity=0.5))
+        db.session.add(ChatMessage(user_id=user_id, content="reply", is_user=False))
+        db.session.commit()
+
+
+def write_behind_turn(writer, user_id):
+    now = datetime.utcnow()
+    user_write = writer.submit(
+        ChatMessage(user_id=user_id, content="I feel anxious", is_user=True, emotion="anxious", created_at=now),
+        EmotionRecord(user_id=user_id, emotion="anxious", intensity=0.5, created_at=now)
+    )
+    ai_write = writer.submit(ChatMessage(user_id=user_id, content="reply", is_user=False, created_at=datetime.utcnow()))
+    user_write.wait()
+    ai_write.wait()
+
+
+def run(turn, threads):
+    latencies = []
+    lock = threading.Lock()
+
+    def user():
+        for _ in range(MESSAGES_PER_THREAD):
+            start = time.perf_counter()
+            turn()
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=user) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.99)] * 1000
+
+
+def main():
+    print(f"{'mode':<14}{'threads':>8}{'turns/s':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for threads in THREADS:
+            sync_app = make_app(os.path.join(tmp, f"sync-{threads}.db"))
+            rate, p50, p99 = run(lambda: synchronous_turn(sync_app, 1), threads)
+            print(f"{'synchronous':<14}{threads:>8}{rate:>10.0f}{p50:>10.2f}{p99:>10.2f}")
+
+            behind_app = make_app(os.path.join(tmp, f"behind-{threads}.db"))
+            writer = WriteBehindWriter(behind_app, db)
+            rate, p50, p99 = run(lambda: write_behind_turn(writer, 1), threads)
+            writer.shutdown()
+            print(f"{'write-behind':<14}{threads:>8}{rate:>10.0f}{p50:>10.2f}{p99:>10.2f}  ({writer.stats()['batches']} transactions)")
+
+
+if __name__ == '__main__':
+    main()
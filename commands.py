@@ -0,0 +1,77 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from extensions import db
+from migrations import upgrade_schema
+from models import DailyEmotionRollup
+from utils.rag import THERAPY_DOCS_PATH, THERAPY_INDEX_PATH
+from utils.retrieval import BM25Index, corpus_digest
+from utils.static_assets import build_static
+from utils.rescore import rescore_messages, RESCORE_CHUNK_SIZE, RESCORE_WORKERS
+import json
+
+@click.command('build-rag-index')
+def build_rag_index():
+    """Rebuild the persisted therapy document retrieval index"""
+    raw_bytes = THERAPY_DOCS_PATH.read_bytes()
+    documents = json.loads(raw_bytes)
+
+    index = BM25Index.build(documents, corpus_digest(raw_bytes))
+    index.save(THERAPY_INDEX_PATH)
+
+    click.echo(f"Indexed {index.num_docs} documents ({len(index.vocabulary)} terms) into {THERAPY_INDEX_PATH}")
+
+@click.command('upgrade-db')
+@with_appcontext
+def upgrade_db():
+    """Create tables and indexes missing from an existing database"""
+    created = upgrade_schema(db)
+
+    if created:
+        click.echo(f"Created {', '.join(created)}")
+    else:
+        click.echo("Database schema is up to date")
+
+@click.command('rebuild-mood-rollup')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user')
+@with_appcontext
+def rebuild_mood_rollup(user_id):
+    """Recompute the daily emotion rollup from every emotion record"""
+    with db.engine.begin() as connection:
+        rows = DailyEmotionRollup.rebuild(connection, user_id)
+
+    click.echo(f"Wrote {rows} daily emotion rollup rows")
+
+@click.command('build-static')
+@with_appcontext
+def build_static_assets():
+    """Write content-hashed, precompressed copies of the static files"""
+    files = build_static(current_app.static_folder)
+    size = sum(entry['size'] for entry in files.values())
+
+    click.echo(f"Built {len(files)} static files ({size} bytes); "
+               f"encodings: {', '.join(sorted({e for entry in files.values() for e in entry['encodings']})) or 'none'}")
+
+@click.command('rescore-messages')
+@click.option('--chunk-size', type=int, default=RESCORE_CHUNK_SIZE, show_default=True, help='Messages per chunk')
+@click.option('--workers', type=int, default=RESCORE_WORKERS, show_default=True, help='Scoring processes, 0 for none')
+@click.option('--checkpoint', default='rescore-checkpoint.json', show_default=True, help='Progress file to resume from')
+@click.option('--restart', is_flag=True, help='Start over instead of resuming from the checkpoint')
+@with_appcontext
+def rescore_chat_messages(chunk_size, workers, checkpoint, restart):
+    """Re-run emotion and crisis detection over stored user messages"""
+    def report(state):
+        done = state['processed'] / state['total'] if state['total'] else 1.0
+        rate = state['processed'] / state['seconds'] if state['seconds'] else 0.0
+        click.echo(f"\r{done:6.1%}  {state['processed']} messages, {state['changed']} changed, "
+                   f"{rate:.0f} messages/s", nl=False)
+
+    state = rescore_messages(db.engine, checkpoint, chunk_size, workers, restart, report)
+    click.echo(f"\nRescored {state['processed']} messages ({state['changed']} changed) "
+               f"in {state['seconds']:.1f}s; daily emotion rollup rebuilt")
+
+def register_commands(app):
+    """Add the CLI commands to an app"""
+    for command in (build_rag_index, upgrade_db, rebuild_mood_rollup, build_static_assets,
+                    rescore_chat_messages):
+        app.cli.add_command(command)
@@ -1,6 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
+from utils.write_behind import WriteBehindWriter
+from utils.metrics import Metrics
+from utils.static_assets import StaticAssets
 
 db = SQLAlchemy()
 login_manager = LoginManager()
-login_manager.login_view = 'login'
\ No newline at end of file
+login_manager.login_view = 'main.login'
+write_behind = WriteBehindWriter()
+metrics = Metrics()
+static_assets = StaticAssets()
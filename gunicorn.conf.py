@@ -0,0 +1,30 @@
+"""
+Gunicorn settings, read automatically from the working directory:
+
+    gunicorn
+
+The app is imported and prepared once in the master (schema upgrade,
+therapy index, prompt cache), then forked, so workers start warm and
+share that memory copy-on-write.
+"""
+import gc
+import os
+
+wsgi_app = "app:app"
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+# Threads per worker; also sizes the LLM client connection pools (utils.llm_clients)
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_class = "gthread"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+
+preload_app = True
+
+
+def on_starting(server):
+    from app import app, prepare_app
+
+    prepare_app(app)
+    # Move everything loaded so far out of the garbage collector's reach, so
+    # collections in the workers do not write to (and so copy) the shared pages
+    gc.freeze()
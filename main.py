@@ -1,5 +1,8 @@
 import os
 
+from app import app, prepare_app
+
 port = int(os.environ.get("PORT", 5000))  # Render sets this PORT env var
 
+prepare_app(app)
 app.run(host="0.0.0.0", port=port, debug=True)
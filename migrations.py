@@ -0,0 +1,113 @@
+import logging
+from sqlalchemy import inspect, text
+
+logger = logging.getLogger(__name__)
+
+
+def missing_indexes(db):
+    """
+    Find model indexes that the database does not have yet
+
+    db.create_all() only creates missing tables, so indexes added to a
+    model after its table exists have to be created separately.
+
+    Args:
+        db: The Flask-SQLAlchemy extension, inside an app context
+
+    Returns:
+        list: sqlalchemy Index objects to create
+    """
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        missing.extend(index for index in table.indexes if index.name not in existing)
+    return missing
+
+
+def missing_columns(db):
+    """
+    Find model columns that existing tables do not have yet
+
+    Only nullable columns without a server default can be added this way;
+    existing rows get NULL.
+
+    Args:
+        db: The Flask-SQLAlchemy extension, inside an app context
+
+    Returns:
+        list: sqlalchemy Column objects to add
+    """
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        missing.extend(column for column in table.columns if column.name not in existing)
+    return missing
+
+
+def add_column(db, column):
+    """Add a nullable column to an existing table with ALTER TABLE"""
+    if not column.nullable or column.server_default is not None:
+        raise ValueError(f"Cannot add {column.table.name}.{column.name}: only nullable columns without a default")
+    dialect = db.engine.dialect
+    preparer = dialect.identifier_preparer
+    with db.engine.begin() as connection:
+        connection.execute(text(
+            f"ALTER TABLE {preparer.format_table(column.table)} "
+            f"ADD COLUMN {preparer.format_column(column)} {column.type.compile(dialect=dialect)}"
+        ))
+
+
+def _backfill_daily_emotion_rollup(connection):
+    from models import DailyEmotionRollup
+    DailyEmotionRollup.rebuild(connection)
+
+
+# Tables derived from existing data, filled in when they are first created
+BACKFILLS = {
+    'daily_emotion_rollup': _backfill_daily_emotion_rollup,
+}
+
+
+def upgrade_schema(db):
+    """
+    Bring an existing database up to date with the models
+
+    Creates missing tables (backfilling derived ones), columns and indexes.
+
+    Args:
+        db: The Flask-SQLAlchemy extension, inside an app context
+
+    Returns:
+        list: Names of the tables, columns and indexes that were created
+    """
+    existing_tables = set(inspect(db.engine).get_table_names())
+    new_tables = [table.name for table in db.metadata.sorted_tables if table.name not in existing_tables]
+    db.create_all()
+
+    if existing_tables:
+        for name in new_tables:
+            if name in BACKFILLS:
+                logger.info(f"Backfilling {name}")
+                with db.engine.begin() as connection:
+                    BACKFILLS[name](connection)
+
+    created = list(new_tables)
+    for column in missing_columns(db):
+        logger.info(f"Adding column {column.name} to {column.table.name}")
+        add_column(db, column)
+        created.append(f"{column.table.name}.{column.name}")
+    for index in missing_indexes(db):
+        logger.info(f"Creating index {index.name} on {index.table.name}")
+        index.create(db.engine, checkfirst=True)
+        created.append(index.name)
+    return created
@@ -1,7 +1,11 @@
 from datetime import datetime
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 from extensions import db, login_manager  # Changed this line
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, object_session
+from utils.user_cache import user_cache, UserSnapshot
+from utils.passwords import hash_password, verify_password
 import json
 
 class User(UserMixin, db.Model):
@@ -15,15 +19,22 @@ class User(UserMixin, db.Model):
     emotion_records = db.relationship('EmotionRecord', backref='user', lazy='dynamic')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        valid, new_hash = verify_password(self.password_hash, password)
+        if new_hash:
+            # Hash parameters changed since this hash was made; saved with the caller's next commit
+            self.password_hash = new_hash
+        return valid
 
     def __repr__(self):
         return f'<User {self.username}>'
 
 class Assessment(db.Model):
+    # Per-user history is always read in created_at order
+    __table_args__ = (db.Index('ix_assessment_user_created', 'user_id', 'created_at'),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     score = db.Column(db.Float, nullable=False)
@@ -40,11 +51,14 @@ class Assessment(db.Model):
         return f'<Assessment {self.id} by User {self.user_id}>'
 
 class ChatMessage(db.Model):
+    __table_args__ = (db.Index('ix_chat_message_user_created', 'user_id', 'created_at'),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     content = db.Column(db.Text, nullable=False)
     is_user = db.Column(db.Boolean, default=True)  # True if from user, False if from AI
     emotion = db.Column(db.String(50), nullable=True)  # Detected emotion if from user
+    crisis_level = db.Column(db.Integer, nullable=True)  # 0-10 from crisis detection if from user
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     feedback = db.Column(db.Boolean, nullable=True)  # True for 👍, False for 👎, None for no feedback
 
@@ -52,6 +66,8 @@ class ChatMessage(db.Model):
         return f'<ChatMessage {self.id} by User {self.user_id}>'
 
 class EmotionRecord(db.Model):
+    __table_args__ = (db.Index('ix_emotion_record_user_created', 'user_id', 'created_at'),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     emotion = db.Column(db.String(50), nullable=False)
@@ -61,7 +77,141 @@ class EmotionRecord(db.Model):
     def __repr__(self):
         return f'<EmotionRecord {self.id} by User {self.user_id}>'
 
+class DailyEmotionRollup(db.Model):
+    """Per-user daily emotion intensity totals, kept in step with EmotionRecord inserts"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)  # UTC day of the records
+    emotion = db.Column(db.String(50), primary_key=True)
+    total_intensity = db.Column(db.Float, nullable=False, default=0.0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    max_intensity = db.Column(db.Float, nullable=False, default=0.0)
+
+    @classmethod
+    def add_records(cls, connection, records):
+        """
+        Fold new emotion records into the rollup
+
+        Args:
+            connection: Connection of the transaction that inserted the records
+            records (list): Dicts with user_id, emotion, intensity and created_at
+        """
+        groups = {}
+        for record in records:
+            key = (record['user_id'], record['created_at'].date(), record['emotion'])
+            total, count, peak = groups.get(key, (0.0, 0, 0.0))
+            groups[key] = (total + record['intensity'], count + 1, max(peak, record['intensity']))
+        if not groups:
+            return
+
+        rows = [
+            {'user_id': user_id, 'day': day, 'emotion': emotion,
+             'total_intensity': total, 'count': count, 'max_intensity': peak}
+            for (user_id, day, emotion), (total, count, peak) in groups.items()
+        ]
+
+        table = cls.__table__
+        dialect = {'sqlite': sqlite, 'postgresql': postgresql}.get(connection.dialect.name)
+        if dialect is not None:
+            statement = dialect.insert(table)
+            connection.execute(statement.on_conflict_do_update(
+                index_elements=[table.c.user_id, table.c.day, table.c.emotion],
+                set_={
+                    'total_intensity': table.c.total_intensity + statement.excluded.total_intensity,
+                    'count': table.c.count + statement.excluded.count,
+                    'max_intensity': db.case(
+                        (statement.excluded.max_intensity > table.c.max_intensity, statement.excluded.max_intensity),
+                        else_=table.c.max_intensity
+                    )
+                }
+            ), rows)
+            return
+
+        # Databases without an upsert: update, then insert the groups that had no row yet
+        for row in rows:
+            key = (table.c.user_id == row['user_id']) & (table.c.day == row['day']) & (table.c.emotion == row['emotion'])
+            updated = connection.execute(table.update().where(key).values(
+                total_intensity=table.c.total_intensity + row['total_intensity'],
+                count=table.c.count + row['count'],
+                max_intensity=db.case(
+                    (table.c.max_intensity < row['max_intensity'], row['max_intensity']),
+                    else_=table.c.max_intensity
+                )
+            ))
+            if updated.rowcount == 0:
+                connection.execute(table.insert(), row)
+
+    @classmethod
+    def rebuild(cls, connection, user_id=None):
+        """
+        Recompute the rollup from every EmotionRecord
+
+        Args:
+            connection: Database connection
+            user_id (int): Only rebuild this user's rows, None for everyone
+
+        Returns:
+            int: Number of rollup rows written
+        """
+        table = cls.__table__
+        records = EmotionRecord.__table__
+        day = db.func.date(records.c.created_at)
+
+        select = db.select(
+            records.c.user_id, day, records.c.emotion,
+            db.func.sum(records.c.intensity), db.func.count(), db.func.max(records.c.intensity)
+        ).group_by(records.c.user_id, day, records.c.emotion)
+        delete = table.delete()
+        if user_id is not None:
+            select = select.where(records.c.user_id == user_id)
+            delete = delete.where(table.c.user_id == user_id)
+
+        connection.execute(delete)
+        result = connection.execute(table.insert().from_select(
+            ['user_id', 'day', 'emotion', 'total_intensity', 'count', 'max_intensity'], select
+        ))
+        return result.rowcount
+
+    def __repr__(self):
+        return f'<DailyEmotionRollup {self.user_id} {self.day} {self.emotion}>'
+
+
+@event.listens_for(Session, 'after_flush')
+def _roll_up_emotion_records(session, flush_context):
+    # session.new still lists the flushed objects here; the rollup is written
+    # in the same transaction, so it commits or rolls back with the records
+    records = [obj for obj in session.new if isinstance(obj, EmotionRecord)]
+    if records:
+        DailyEmotionRollup.add_records(session.connection(), [{
+            'user_id': record.user_id,
+            'emotion': record.emotion,
+            'intensity': record.intensity,
+            'created_at': record.created_at
+        } for record in records])
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_cached_user(mapper, connection, target):
+    # Flushed, not yet committed: a load_user in between would cache the old
+    # row (or, in this session, one that may still roll back), so the user is
+    # dropped again when the transaction ends
+    user_cache.invalidate(target.id)
+    object_session(target).info.setdefault('changed_user_ids', set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _invalidate_changed_users(session):
+    for user_id in session.info.pop('changed_user_ids', ()):
+        user_cache.invalidate(user_id)
+
+
+def _load_user_snapshot(user_id):
+    row = db.session.query(User.id, User.username, User.email, User.created_at).filter(User.id == user_id).first()
+    return UserSnapshot(*row) if row is not None else None
+
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # Authenticated requests get a cached, read-only snapshot instead of a User row
+    return user_cache.get(int(user_id), _load_user_snapshot)
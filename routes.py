@@ -1,53 +1,80 @@
-from flask import render_template, redirect, url_for, request, flash, jsonify, session
+from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify, session, Response, stream_with_context
 from flask_login import login_user, logout_user, current_user, login_required
 from werkzeug.security import check_password_hash
-from app import app, db
+from extensions import db, write_behind, metrics
 from models import User, Assessment, ChatMessage, EmotionRecord
 # Switch from OpenAI to Gemini
-from utils.gemini_helper import get_ai_response
-from utils.emotion_detection import detect_emotion
+from utils.llm_router import get_ai_response, stream_ai_response, is_fallback_response
+from utils.emotion_detection import analyze_emotion
 from utils.rag import get_therapy_resources
 from utils.crisis_detection import detect_crisis
+from utils.response_cache import response_cache
+from utils.admission import admission, AdmissionRejected
+from utils.conversation import conversation_context
+from utils.analytics import daily_emotion_totals, emotion_chart_data, assessment_summary, recent_assessments, window_start
+from utils.mood_io import (
+    validate_mood, insert_moods, export_rows, ndjson_lines, csv_lines,
+    MoodValidationError, MOOD_BULK_MAX_RECORDS
+)
+from utils.passwords import PasswordHasherBusy
+from utils.chat_history import get_chat_page, decode_cursor, serialize_message, CHAT_PAGE_SIZE, CHAT_PAGE_MAX_SIZE
 import json
 from datetime import datetime, timedelta
 
-@app.route('/')
+bp = Blueprint('main', __name__)
+
+@bp.route('/')
 def index():
     if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     return render_template('index.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
     if request.method == 'POST':
         username = request.form.get('username')
         password = request.form.get('password')
         
-        user = User.query.filter_by(username=username).first()
+        # Load the user and when they were last assessed in one query (MAX uses ix_assessment_user_created)
+        last_assessed = db.select(db.func.max(Assessment.created_at)).where(
+            Assessment.user_id == User.id
+        ).scalar_subquery()
+        user, last_assessed_at = db.session.query(User, last_assessed).filter(
+            User.username == username
+        ).first() or (None, None)
+        
+        try:
+            valid = user is not None and user.check_password(password)
+        except PasswordHasherBusy:
+            flash('Too many login attempts right now. Please try again in a moment.', 'warning')
+            return redirect(url_for('main.login'))
         
-        if not user or not user.check_password(password):
+        if not valid:
             flash('Invalid username or password', 'danger')
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
+        
+        # Save a hash upgraded by check_password
+        if db.session.is_modified(user):
+            db.session.commit()
         
         login_user(user, remember=True)
         flash('Login successful!', 'success')
         
         # Check if user needs assessment
-        last_assessment = Assessment.query.filter_by(user_id=user.id).order_by(Assessment.created_at.desc()).first()
-        if not last_assessment or (datetime.utcnow() - last_assessment.created_at) > timedelta(days=7):
-            return redirect(url_for('assessment'))
+        if not last_assessed_at or (datetime.utcnow() - last_assessed_at) > timedelta(days=7):
+            return redirect(url_for('main.assessment'))
         
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
         
     return render_template('login.html')
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
         
     if request.method == 'POST':
         username = request.form.get('username')
@@ -58,79 +85,69 @@ def register():
         # Validate input
         if not username or not email or not password:
             flash('All fields are required', 'danger')
-            return redirect(url_for('register'))
+            return redirect(url_for('main.register'))
             
         if password != confirm_password:
             flash('Passwords must match', 'danger')
-            return redirect(url_for('register'))
+            return redirect(url_for('main.register'))
             
         # Check if username or email already exists
         if User.query.filter_by(username=username).first():
             flash('Username already exists', 'danger')
-            return redirect(url_for('register'))
+            return redirect(url_for('main.register'))
             
         if User.query.filter_by(email=email).first():
             flash('Email already registered', 'danger')
-            return redirect(url_for('register'))
+            return redirect(url_for('main.register'))
         
         # Create new user
         user = User(username=username, email=email)
-        user.set_password(password)
+        try:
+            user.set_password(password)
+        except PasswordHasherBusy:
+            flash('Too many requests right now. Please try again in a moment.', 'warning')
+            return redirect(url_for('main.register'))
         
         db.session.add(user)
         db.session.commit()
         
         flash('Registration successful! Please log in.', 'success')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
         
     return render_template('register.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 @login_required
 def logout():
     logout_user()
     flash('You have been logged out.', 'info')
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
-@app.route('/dashboard')
+@bp.route('/dashboard')
 @login_required
 def dashboard():
-    # Get user's assessment history
-    assessments = Assessment.query.filter_by(user_id=current_user.id).order_by(Assessment.created_at.desc()).all()
-    
-    # Get emotion records for charts
-    emotion_records = EmotionRecord.query.filter_by(user_id=current_user.id).order_by(EmotionRecord.created_at.desc()).limit(30).all()
-    
-    # Get average assessment score
-    avg_score = 0
-    if assessments:
-        avg_score = sum([a.score for a in assessments]) / len(assessments)
+    # Get user's recent assessments and the average over all of them
+    assessments = recent_assessments(current_user.id)
+    summary = assessment_summary(current_user.id)
     
     # Format data for chart.js
     assessment_dates = [a.created_at.strftime('%Y-%m-%d') for a in assessments]
     assessment_scores = [a.score for a in assessments]
     
-    emotion_data = {}
-    for record in emotion_records:
-        date = record.created_at.strftime('%Y-%m-%d')
-        if date not in emotion_data:
-            emotion_data[date] = {}
-        
-        if record.emotion not in emotion_data[date]:
-            emotion_data[date][record.emotion] = 0
-        
-        emotion_data[date][record.emotion] += record.intensity
+    # Emotion intensity per day, aggregated in the database
+    emotion_data = emotion_chart_data(daily_emotion_totals(current_user.id))
 
     return render_template(
         'dashboard.html', 
         assessments=assessments,
-        avg_score=avg_score,
+        assessment_count=summary['count'],
+        avg_score=summary['average'],
         assessment_dates=json.dumps(assessment_dates),
         assessment_scores=json.dumps(assessment_scores),
         emotion_data=json.dumps(emotion_data)
     )
 
-@app.route('/assessment', methods=['GET', 'POST'])
+@bp.route('/assessment', methods=['GET', 'POST'])
 @login_required
 def assessment():
     if request.method == 'POST':
@@ -160,75 +177,195 @@ def assessment():
         db.session.commit()
         
         flash('Assessment completed successfully!', 'success')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
         
     return render_template('assessment.html')
 
-@app.route('/chat')
+@bp.route('/chat')
 @login_required
 def chat():
-    # Get chat history
-    messages = ChatMessage.query.filter_by(user_id=current_user.id).order_by(ChatMessage.created_at).all()
-    return render_template('chat.html', messages=messages)
+    # Get the most recent page of chat history; older pages are fetched by chat.js
+    messages, next_cursor = get_chat_page(current_user.id)
+    return render_template('chat.html', messages=messages, next_cursor=next_cursor)
 
-@app.route('/api/send_message', methods=['POST'])
+@bp.route('/api/chat/history')
 @login_required
-def send_message():
-    data = request.json
-    user_message = data.get('message', '').strip()
+def chat_history():
+    """API endpoint to get a page of older chat messages"""
+    before = decode_cursor(request.args.get('before', ''))
+    if before is None:
+        return jsonify({'error': 'Invalid cursor'}), 400
     
-    if not user_message:
-        return jsonify({'error': 'Message is required'}), 400
+    limit = min(max(request.args.get('limit', CHAT_PAGE_SIZE, type=int), 1), CHAT_PAGE_MAX_SIZE)
+    messages, next_cursor = get_chat_page(current_user.id, before, limit)
     
-    # Detect emotion
-    emotion = detect_emotion(user_message)
+    return jsonify({
+        'messages': [serialize_message(message) for message in messages],
+        'next_cursor': next_cursor
+    })
+
+def _admit_message(user_message):
+    """
+    Check a user message for crisis signals and take it from the user's rate limit
+
+    Returns:
+        tuple: (crisis_detected, crisis_level)
+
+    Raises:
+        AdmissionRejected: If the user is over their rate
+    """
+    # Crisis messages skip the rate limit and wait ahead of everyone else
+    with metrics.stage('crisis'):
+        crisis_detected, crisis_level = detect_crisis(user_message)
     
-    # Check for crisis
-    crisis_detected, crisis_level = detect_crisis(user_message)
+    with metrics.stage('admission'):
+        admission.check_rate(current_user.id, crisis_detected)
+    
+    return crisis_detected, crisis_level
+
+def _acquire_slot(crisis_detected):
+    """
+    Wait for an LLM slot; a message turned away gets its rate-limit token back
+
+    Returns:
+        Slot: Release it once the reply is generated
+
+    Raises:
+        AdmissionRejected: If the LLM queue is full
+    """
+    with metrics.stage('admission'):
+        try:
+            return admission.acquire(crisis_detected)
+        except AdmissionRejected:
+            admission.refund(current_user.id, crisis_detected)
+            raise
+
+def _rejected(error):
+    """Turn a message away with a Retry-After header"""
+    if error.reason == 'rate_limited':
+        message = "You're sending messages faster than I can reply. Please wait a moment and try again."
+    else:
+        message = "A lot of people are talking with me right now. Please try again in a few seconds."
+    response = jsonify({'error': message, 'retry_after': error.retry_after})
+    response.status_code = error.status
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+def _record_user_message(user_message, emotion, intensity, crisis_level):
+    """Queue a user message, with its emotion record, for saving"""
+    # Timestamps are set here because the rows are inserted later by the write-behind worker
+    now = datetime.utcnow()
     
     # Save user message
     user_chat = ChatMessage(
         user_id=current_user.id,
         content=user_message,
         is_user=True,
-        emotion=emotion
+        emotion=emotion,
+        crisis_level=crisis_level,
+        created_at=now
     )
-    db.session.add(user_chat)
-    db.session.commit()
     
     # Record emotion
     emotion_record = EmotionRecord(
         user_id=current_user.id,
         emotion=emotion,
-        intensity=0.8  # Default intensity, could be adjusted based on analysis
+        intensity=intensity,
+        created_at=now
     )
-    db.session.add(emotion_record)
     
-    # Get relevant therapy resources
-    relevant_resources = get_therapy_resources(user_message, emotion)
-    
-    # Get AI response
-    ai_response = get_ai_response(
-        user_message, 
-        emotion, 
-        relevant_resources, 
-        crisis_detected,
-        crisis_level
-    )
+    # Committed in the background while the AI response is generated
+    user_write = write_behind.submit(user_chat, emotion_record)
     
-    # Check if the response indicates an API error
-    api_error = False
-    if "API usage limits" in ai_response or "temporarily unavailable" in ai_response:
-        api_error = True
+    return user_write
+
+def _is_api_error(ai_response):
+    """Check if the response indicates an API error"""
+    return "API usage limits" in ai_response or "temporarily unavailable" in ai_response
+
+def _sse(event, data):
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@bp.route('/api/send_message', methods=['POST'])
+@login_required
+def send_message():
+    data = request.json
+    user_message = data.get('message', '').strip()
     
-    # Save AI response
+    if not user_message:
+        return jsonify({'error': 'Message is required'}), 400
+    
+    try:
+        crisis_detected, crisis_level = _admit_message(user_message)
+    except AdmissionRejected as e:
+        return _rejected(e)
+    
+    # Earlier turns of the conversation, read before this message is saved
+    with metrics.stage('context'):
+        history = conversation_context.get(current_user.id)
+    
+    # Detect emotion
+    with metrics.stage('emotion'):
+        emotion, intensity = analyze_emotion(user_message)
+    
+    # Get relevant therapy resources
+    with metrics.stage('rag'):
+        relevant_resources = get_therapy_resources(user_message, emotion)
+    
+    # Reuse a cached reply to the same (or a near-identical) prompt; cached
+    # replies know nothing of earlier turns, so only for a conversation's first message
+    use_cache = response_cache is not None and history is None
+    ai_response = None
+    if use_cache:
+        with metrics.stage('response_cache'):
+            ai_response = response_cache.get(user_message, emotion, relevant_resources, crisis_detected, crisis_level)
+    
+    # A cached reply needs no LLM slot
+    slot = None
+    if ai_response is None:
+        # Hand the pooled connection back while waiting for a slot and during
+        # the LLM call; otherwise a burst of chat turns holds every connection
+        # and the write-behind worker cannot commit
+        db.session.close()
+        try:
+            slot = _acquire_slot(crisis_detected)
+        except AdmissionRejected as e:
+            return _rejected(e)
+    
+    # Saved only once the message is going to be answered
+    user_write = _record_user_message(user_message, emotion, intensity, crisis_level)
+    
+    if slot is not None:
+        try:
+            # Get AI response
+            with metrics.stage('llm'):
+                ai_response = get_ai_response(
+                    user_message, 
+                    emotion, 
+                    relevant_resources, 
+                    crisis_detected,
+                    crisis_level,
+                    history
+                )
+            if use_cache and not is_fallback_response(ai_response):
+                response_cache.put(user_message, emotion, relevant_resources, ai_response, crisis_detected, crisis_level)
+        finally:
+            slot.release()
+    
+    api_error = _is_api_error(ai_response)
+    
+    # Save AI response; its id is needed for feedback, so wait for the commit
     ai_chat = ChatMessage(
         user_id=current_user.id,
         content=ai_response,
-        is_user=False
+        is_user=False,
+        created_at=datetime.utcnow()
     )
-    db.session.add(ai_chat)
-    db.session.commit()
+    with metrics.stage('db_write'):
+        ai_write = write_behind.submit(ai_chat)
+        user_chat, _ = user_write.wait()
+        ai_write.wait()
     
     response_data = {
         'message': ai_response,
@@ -241,7 +378,104 @@ def send_message():
     
     return jsonify(response_data)
 
-@app.route('/api/feedback', methods=['POST'])
+@bp.route('/api/send_message/stream', methods=['POST'])
+@login_required
+def send_message_stream():
+    """Streaming variant of send_message that forwards the reply as server-sent events"""
+    data = request.json
+    user_message = data.get('message', '').strip()
+    
+    if not user_message:
+        return jsonify({'error': 'Message is required'}), 400
+    
+    try:
+        crisis_detected, crisis_level = _admit_message(user_message)
+    except AdmissionRejected as e:
+        return _rejected(e)
+    
+    # Earlier turns of the conversation, read before this message is saved
+    with metrics.stage('context'):
+        history = conversation_context.get(current_user.id)
+    
+    # Detect emotion
+    with metrics.stage('emotion'):
+        emotion, intensity = analyze_emotion(user_message)
+    
+    # Get relevant therapy resources
+    with metrics.stage('rag'):
+        relevant_resources = get_therapy_resources(user_message, emotion)
+    
+    use_cache = response_cache is not None and history is None
+    cached = None
+    if use_cache:
+        with metrics.stage('response_cache'):
+            cached = response_cache.get(user_message, emotion, relevant_resources, crisis_detected, crisis_level)
+    
+    # A cached reply needs no LLM slot
+    slot = None
+    if cached is None:
+        db.session.close()
+        try:
+            slot = _acquire_slot(crisis_detected)
+        except AdmissionRejected as e:
+            return _rejected(e)
+    
+    # Saved only once the message is going to be answered
+    user_write = _record_user_message(user_message, emotion, intensity, crisis_level)
+    user_id = current_user.id
+    
+    def generate():
+        user_chat, _ = user_write.wait()
+        yield _sse('meta', {
+            'emotion': emotion,
+            'crisis_detected': crisis_detected,
+            'user_message_id': user_chat.id
+        })
+        
+        chunks = []
+        ai_chat = None
+        try:
+            if cached is not None:
+                chunks.append(cached)
+                yield _sse('chunk', {'text': cached})
+            else:
+                for chunk in stream_ai_response(user_message, emotion, relevant_resources, crisis_detected, crisis_level, history):
+                    chunks.append(chunk)
+                    yield _sse('chunk', {'text': chunk})
+                
+                ai_response = "".join(chunks).strip()
+                if use_cache and not is_fallback_response(ai_response):
+                    response_cache.put(user_message, emotion, relevant_resources, ai_response, crisis_detected, crisis_level)
+        finally:
+            if slot is not None:
+                slot.release()
+            # Save the AI response once the stream ends, even if the client went away
+            if chunks:
+                ai_chat = ChatMessage(
+                    user_id=user_id,
+                    content="".join(chunks).strip(),
+                    is_user=False,
+                    created_at=datetime.utcnow()
+                )
+                ai_write = write_behind.submit(ai_chat)
+        
+        if ai_chat is not None:
+            ai_write.wait()
+        yield _sse('done', {
+            'api_error': ai_chat is not None and _is_api_error(ai_chat.content),
+            'ai_message_id': ai_chat.id if ai_chat is not None else None
+        })
+    
+    # The stream outlives this function; do not keep a connection for its whole length
+    db.session.close()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@bp.route('/api/feedback', methods=['POST'])
 @login_required
 def provide_feedback():
     data = request.json
@@ -260,7 +494,7 @@ def provide_feedback():
     
     return jsonify({'success': True})
 
-@app.route('/api/assessment_history')
+@bp.route('/api/assessment_history')
 @login_required
 def assessment_history():
     assessments = Assessment.query.filter_by(user_id=current_user.id).order_by(Assessment.created_at.desc()).all()
@@ -276,24 +510,15 @@ def assessment_history():
     
     return jsonify(history)
 
-@app.route('/mood-tracker')
+@bp.route('/mood-tracker')
 @login_required
 def mood_tracker():
     """Render the mood tracker page"""
-    # Get the user's emotion records for the last 30 days
+    # Get the user's 30 most recent emotion records
     emotion_records = EmotionRecord.query.filter_by(user_id=current_user.id).order_by(EmotionRecord.created_at.desc()).limit(30).all()
     
-    # Group emotions by date for the chart
-    emotion_data = {}
-    for record in emotion_records:
-        date = record.created_at.strftime('%Y-%m-%d')
-        if date not in emotion_data:
-            emotion_data[date] = {}
-        
-        if record.emotion not in emotion_data[date]:
-            emotion_data[date][record.emotion] = 0
-        
-        emotion_data[date][record.emotion] += record.intensity
+    # Emotion intensity per day over the last 30 days, aggregated in the database
+    emotion_data = emotion_chart_data(daily_emotion_totals(current_user.id))
     
     return render_template(
         'mood_tracker.html',
@@ -301,31 +526,23 @@ def mood_tracker():
         emotion_data=json.dumps(emotion_data)
     )
 
-@app.route('/api/mood', methods=['POST'])
+@bp.route('/api/mood', methods=['POST'])
 @login_required
 def record_mood():
     """API endpoint to record the user's mood"""
     data = request.json
-    emotion = data.get('emotion')
-    intensity = data.get('intensity', 1.0)
     notes = data.get('notes', '')
     
-    if not emotion:
-        return jsonify({'error': 'Emotion is required'}), 400
-    
-    # Validate intensity is between 0 and 1
     try:
-        intensity = float(intensity)
-        if intensity < 0 or intensity > 1:
-            return jsonify({'error': 'Intensity must be between 0 and 1'}), 400
-    except ValueError:
-        return jsonify({'error': 'Intensity must be a number'}), 400
+        mood = validate_mood(data)
+    except MoodValidationError as e:
+        return jsonify({'error': str(e)}), 400
     
     # Create a new emotion record
     emotion_record = EmotionRecord(
         user_id=current_user.id,
-        emotion=emotion,
-        intensity=intensity
+        emotion=mood['emotion'],
+        intensity=mood['intensity']
     )
     
     db.session.add(emotion_record)
@@ -338,13 +555,67 @@ def record_mood():
         'created_at': emotion_record.created_at.strftime('%Y-%m-%d %H:%M:%S')
     })
 
-@app.route('/api/mood-history')
+@bp.route('/api/mood/bulk', methods=['POST'])
+@login_required
+def record_moods_bulk():
+    """API endpoint to import many mood records (e.g. an offline log) at once"""
+    data = request.get_json(silent=True)
+    records = data.get('records') if isinstance(data, dict) else data
+    
+    if not isinstance(records, list) or not records:
+        return jsonify({'error': 'A non-empty list of records is required'}), 400
+    if len(records) > MOOD_BULK_MAX_RECORDS:
+        return jsonify({'error': f'At most {MOOD_BULK_MAX_RECORDS} records can be imported at once'}), 400
+    
+    # Validate everything first so a bad record does not leave a partial import
+    moods = []
+    errors = []
+    for index, record in enumerate(records):
+        try:
+            moods.append(validate_mood(record, allow_timestamp=True))
+        except MoodValidationError as e:
+            errors.append({'index': index, 'error': str(e)})
+    
+    if errors:
+        return jsonify({'error': 'Invalid records', 'details': errors[:100]}), 400
+    
+    insert_moods(current_user.id, moods)
+    
+    return jsonify({'inserted': len(moods)})
+
+@bp.route('/api/mood/export')
+@login_required
+def export_moods():
+    """API endpoint to download the user's mood records as NDJSON or CSV"""
+    export_format = request.args.get('format', 'ndjson')
+    days = request.args.get('days', type=int)
+    since = window_start(days) if days else None
+    
+    if export_format == 'csv':
+        lines, mimetype, extension = csv_lines, 'text/csv', 'csv'
+    elif export_format == 'ndjson':
+        lines, mimetype, extension = ndjson_lines, 'application/x-ndjson', 'ndjson'
+    else:
+        return jsonify({'error': 'Format must be ndjson or csv'}), 400
+    
+    # Rows are read and written in batches, so memory does not grow with the history
+    return Response(
+        stream_with_context(lines(export_rows(current_user.id, since))),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=moods.{extension}'}
+    )
+
+@bp.route('/api/mood-history')
 @login_required
 def mood_history():
     """API endpoint to get the user's mood history"""
     # Get query parameters
     days = request.args.get('days', 30, type=int)
     
+    # Daily totals come from the rollup, one row per day and emotion
+    if request.args.get('group') == 'day':
+        return jsonify(daily_emotion_totals(current_user.id, min(max(days, 1), 3660)))
+    
     # Get the user's emotion records
     emotion_records = EmotionRecord.query.filter_by(user_id=current_user.id).order_by(EmotionRecord.created_at.desc()).limit(days).all()
     
@@ -4,9 +4,20 @@ document.addEventListener('DOMContentLoaded', function() {
     const chatHistory = document.getElementById('chat-history');
     const typingIndicator = document.getElementById('typing-indicator');
     
+    // Cursor for the next page of older messages; empty when the whole history is shown
+    let nextCursor = chatHistory.dataset.nextCursor;
+    let loadingOlder = false;
+    
     // Initialize chat history
     loadChatHistory();
     
+    // Load older messages when scrolled near the top
+    chatHistory.addEventListener('scroll', function() {
+        if (chatHistory.scrollTop < 100) {
+            loadOlderMessages();
+        }
+    });
+    
     // Submit message on form submit
     messageForm.addEventListener('submit', function(e) {
         e.preventDefault();
@@ -43,7 +54,114 @@ document.addEventListener('DOMContentLoaded', function() {
         // Show typing indicator
         typingIndicator.style.display = 'block';
         
-        // Send to backend
+        // Stream the reply when the browser supports it
+        if (!window.ReadableStream || !window.TextDecoder) {
+            sendMessageWithoutStreaming(message);
+            return;
+        }
+        
+        fetch('/api/send_message/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ message }),
+        })
+        .then(response => {
+            if (response.status === 429 || response.status === 503) {
+                return showBusyMessage(response);
+            }
+            if (!response.ok || !response.body) {
+                throw new Error('Network response was not ok');
+            }
+            return readEventStream(response.body.getReader());
+        })
+        .catch(error => {
+            console.error('Error sending message:', error);
+            typingIndicator.style.display = 'none';
+            
+            // Show error message
+            addMessageToUI("I'm sorry, I'm having trouble connecting. Please try again in a moment.", false);
+        });
+    }
+    
+    // Function to render server-sent events from the streaming endpoint
+    function readEventStream(reader) {
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let replyText = '';
+        let replyElement = null;
+        
+        function handleEvent(event, data) {
+            if (event === 'meta') {
+                // Check for crisis
+                if (data.crisis_detected) {
+                    showCrisisAlert();
+                }
+            } else if (event === 'chunk') {
+                replyText += data.text;
+                if (!replyElement) {
+                    // Hide typing indicator once the reply starts
+                    typingIndicator.style.display = 'none';
+                    replyElement = addMessageToUI('', false);
+                }
+                replyElement.querySelector('.message-content').innerHTML = formatMessage(replyText);
+                scrollToBottom();
+            } else if (event === 'done') {
+                typingIndicator.style.display = 'none';
+                if (replyElement) {
+                    replyElement.remove();
+                }
+                addMessageToUI(replyText.trim(), false, null, data.ai_message_id);
+                
+                // Show API error notification if needed
+                if (data.api_error) {
+                    showApiErrorAlert();
+                }
+            }
+        }
+        
+        function pump() {
+            return reader.read().then(({ done, value }) => {
+                if (done) {
+                    return;
+                }
+                buffer += decoder.decode(value, { stream: true });
+                
+                // Events are separated by a blank line
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const rawEvent = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+                    
+                    let event = 'message';
+                    let data = '';
+                    rawEvent.split('\n').forEach(line => {
+                        if (line.startsWith('event: ')) {
+                            event = line.slice(7);
+                        } else if (line.startsWith('data: ')) {
+                            data += line.slice(6);
+                        }
+                    });
+                    handleEvent(event, JSON.parse(data));
+                }
+                return pump();
+            });
+        }
+        
+        return pump();
+    }
+    
+    // Function to show why the server turned a message away (rate limited or busy)
+    function showBusyMessage(response) {
+        return response.json().then(data => {
+            typingIndicator.style.display = 'none';
+            addMessageToUI(data.error, false);
+        });
+    }
+    
+    // Function to send message to the non-streaming endpoint
+    function sendMessageWithoutStreaming(message) {
         fetch('/api/send_message', {
             method: 'POST',
             headers: {
@@ -52,12 +170,19 @@ document.addEventListener('DOMContentLoaded', function() {
             body: JSON.stringify({ message }),
         })
         .then(response => {
+            if (response.status === 429 || response.status === 503) {
+                return showBusyMessage(response);
+            }
             if (!response.ok) {
                 throw new Error('Network response was not ok');
             }
             return response.json();
         })
         .then(data => {
+            if (!data) {
+                return;
+            }
+            
             // Hide typing indicator
             typingIndicator.style.display = 'none';
             
@@ -83,8 +208,8 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
-    // Function to add message to UI
-    function addMessageToUI(message, isUser, emotion = null, messageId = null) {
+    // Function to build a message element
+    function createMessageElement(message, isUser, emotion = null, messageId = null, feedback = null) {
         const messageElement = document.createElement('div');
         messageElement.className = isUser ? 'message user-message' : 'message ai-message';
         
@@ -98,20 +223,21 @@ document.addEventListener('DOMContentLoaded', function() {
         
         // Add feedback buttons for AI messages
         if (!isUser && messageId) {
+            const given = feedback !== null && feedback !== undefined;
             messageContent += `
                 <div class="feedback-buttons" data-message-id="${messageId}">
-                    <button class="btn btn-sm btn-outline-success feedback-button" data-feedback="positive">
+                    <button class="btn btn-sm ${feedback === true ? 'btn-success' : 'btn-outline-success'} feedback-button" data-feedback="positive" ${given ? 'disabled' : ''}>
                         <i class="fas fa-thumbs-up"></i>
                     </button>
-                    <button class="btn btn-sm btn-outline-danger feedback-button" data-feedback="negative">
+                    <button class="btn btn-sm ${feedback === false ? 'btn-danger' : 'btn-outline-danger'} feedback-button" data-feedback="negative" ${given ? 'disabled' : ''}>
                         <i class="fas fa-thumbs-down"></i>
                     </button>
+                    ${given ? '<span class="feedback-thanks">Thanks for your feedback!</span>' : ''}
                 </div>
             `;
         }
         
         messageElement.innerHTML = messageContent;
-        chatHistory.appendChild(messageElement);
         
         // Add feedback handlers for new message
         if (!isUser && messageId) {
@@ -121,8 +247,53 @@ document.addEventListener('DOMContentLoaded', function() {
             });
         }
         
+        return messageElement;
+    }
+    
+    // Function to add message to UI
+    function addMessageToUI(message, isUser, emotion = null, messageId = null) {
+        const messageElement = createMessageElement(message, isUser, emotion, messageId);
+        chatHistory.appendChild(messageElement);
+        
         // Scroll to bottom
         scrollToBottom();
+        
+        return messageElement;
+    }
+    
+    // Function to load the page of history before the oldest message shown
+    function loadOlderMessages() {
+        if (loadingOlder || !nextCursor) {
+            return;
+        }
+        loadingOlder = true;
+        
+        fetch(`/api/chat/history?before=${encodeURIComponent(nextCursor)}`)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Network response was not ok');
+            }
+            return response.json();
+        })
+        .then(data => {
+            // Keep the messages in view where they are while older ones are inserted above
+            const previousHeight = chatHistory.scrollHeight;
+            const fragment = document.createDocumentFragment();
+            data.messages.forEach(message => {
+                fragment.appendChild(createMessageElement(
+                    message.content, message.is_user, message.emotion, message.id, message.feedback
+                ));
+            });
+            chatHistory.insertBefore(fragment, chatHistory.firstChild);
+            chatHistory.scrollTop += chatHistory.scrollHeight - previousHeight;
+            
+            nextCursor = data.next_cursor;
+            loadingOlder = false;
+        })
+        .catch(error => {
+            console.error('Error loading chat history:', error);
+            loadingOlder = false;
+        });
     }
     
     // Function to format message (convert links, line breaks, etc.)
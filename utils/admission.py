@@ -0,0 +1,507 @@
+import os
+import math
+import time
+import uuid
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+from flask import g, has_request_context
+
+from extensions import metrics
+
+# Set ADMISSION=0 to admit every chat message without limits
+ADMISSION_ENABLED = os.environ.get("ADMISSION", "1") != "0"
+# "memory" keeps limiter state per process; "sqlite" shares it between gunicorn workers
+ADMISSION_STORE = os.environ.get("ADMISSION_STORE", "memory").lower()
+ADMISSION_STORE_PATH = os.environ.get(
+    "ADMISSION_STORE_PATH",
+    str(Path(__file__).parent.parent / "instance" / "admission.db")
+)
+# Per-user token bucket: sustained messages per second and burst size; a rate of 0 turns it off
+ADMISSION_USER_RATE = float(os.environ.get("ADMISSION_USER_RATE", 0.5))
+ADMISSION_USER_BURST = float(os.environ.get("ADMISSION_USER_BURST", 10))
+# LLM calls in flight at once (per store) and messages allowed to wait for one
+ADMISSION_MAX_IN_FLIGHT = int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", 16))
+ADMISSION_QUEUE = int(os.environ.get("ADMISSION_QUEUE", 32))
+# Seconds a message waits for a slot before it is turned away
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", 10))
+# Slots beyond ADMISSION_MAX_IN_FLIGHT that only crisis messages may use
+ADMISSION_CRISIS_SLOTS = int(os.environ.get("ADMISSION_CRISIS_SLOTS", 4))
+# Slots held longer than this are assumed to belong to a dead worker and are freed
+ADMISSION_SLOT_TTL = float(os.environ.get("ADMISSION_SLOT_TTL", 300))
+
+# How often a waiting message checks for a free slot (seconds)
+POLL_INTERVAL = 0.02
+# Retry-After bounds (seconds)
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 60
+# Drop token buckets that have refilled once every this many rate checks
+PRUNE_EVERY = 1000
+
+CRISIS = "crisis"
+NORMAL = "normal"
+
+
+class AdmissionRejected(Exception):
+    """A chat message was turned away; retry_after is in whole seconds"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason  # "rate_limited" or "overloaded"
+        self.retry_after = retry_after
+
+    @property
+    def status(self):
+        return 429 if self.reason == "rate_limited" else 503
+
+
+class MemoryStore:
+    """Limiter state for this process only"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}           # user id -> (tokens, updated_at)
+        self._slots = {}             # slot id -> (lane, acquired_at)
+        self._waiters = OrderedDict()  # waiter id -> (lane, enqueued_at), oldest first
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            yield self
+
+    def get_bucket(self, user_id):
+        return self._buckets.get(user_id)
+
+    def peek_bucket(self, user_id):
+        return self._buckets.get(user_id)
+
+    def set_bucket(self, user_id, tokens, now):
+        self._buckets[user_id] = (tokens, now)
+
+    def prune_buckets(self, before):
+        for user_id in [u for u, (_, updated_at) in self._buckets.items() if updated_at < before]:
+            del self._buckets[user_id]
+
+    def count_slots(self):
+        return len(self._slots)
+
+    def add_slot(self, slot_id, lane, now):
+        self._slots[slot_id] = (lane, now)
+
+    def remove_slot(self, slot_id):
+        self._slots.pop(slot_id, None)
+
+    def waiters(self):
+        # Crisis messages first, then in arrival order
+        return sorted(((waiter_id, lane) for waiter_id, (lane, _) in self._waiters.items()),
+                      key=lambda waiter: waiter[1] != CRISIS)
+
+    def add_waiter(self, waiter_id, lane, now):
+        self._waiters[waiter_id] = (lane, now)
+
+    def remove_waiter(self, waiter_id):
+        self._waiters.pop(waiter_id, None)
+
+    def purge(self, slots_before, waiters_before):
+        for slot_id in [s for s, (_, acquired_at) in self._slots.items() if acquired_at < slots_before]:
+            del self._slots[slot_id]
+        for waiter_id in [w for w, (_, enqueued_at) in self._waiters.items() if enqueued_at < waiters_before]:
+            del self._waiters[waiter_id]
+
+
+class SQLiteStore:
+    """Limiter state in a local SQLite file, so every gunicorn worker shares the limits"""
+
+    def __init__(self, path=ADMISSION_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS admission_bucket (
+                user_id INTEGER PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS admission_slot (
+                id TEXT PRIMARY KEY,
+                lane TEXT NOT NULL,
+                acquired_at REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS admission_waiter (
+                id TEXT PRIMARY KEY,
+                lane TEXT NOT NULL,
+                enqueued_at REAL NOT NULL
+            )
+        """)
+
+    def _connection(self):
+        # Connections are per thread and per process (never reused after fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self._connection()
+        # Take the write lock up front so decisions are made on current state
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def get_bucket(self, user_id):
+        return self._local.conn.execute(
+            "SELECT tokens, updated_at FROM admission_bucket WHERE user_id = ?", (user_id,)
+        ).fetchone()
+
+    def peek_bucket(self, user_id):
+        # Outside a transaction: reads the last committed state without taking the write lock
+        return self._connection().execute(
+            "SELECT tokens, updated_at FROM admission_bucket WHERE user_id = ?", (user_id,)
+        ).fetchone()
+
+    def set_bucket(self, user_id, tokens, now):
+        self._local.conn.execute(
+            "INSERT OR REPLACE INTO admission_bucket (user_id, tokens, updated_at) VALUES (?, ?, ?)",
+            (user_id, tokens, now)
+        )
+
+    def prune_buckets(self, before):
+        self._local.conn.execute("DELETE FROM admission_bucket WHERE updated_at < ?", (before,))
+
+    def count_slots(self):
+        return self._local.conn.execute("SELECT COUNT(*) FROM admission_slot").fetchone()[0]
+
+    def add_slot(self, slot_id, lane, now):
+        self._local.conn.execute("INSERT INTO admission_slot (id, lane, acquired_at) VALUES (?, ?, ?)",
+                                 (slot_id, lane, now))
+
+    def remove_slot(self, slot_id):
+        self._local.conn.execute("DELETE FROM admission_slot WHERE id = ?", (slot_id,))
+
+    def waiters(self):
+        return self._local.conn.execute(
+            "SELECT id, lane FROM admission_waiter ORDER BY lane != ?, rowid", (CRISIS,)
+        ).fetchall()
+
+    def add_waiter(self, waiter_id, lane, now):
+        self._local.conn.execute("INSERT INTO admission_waiter (id, lane, enqueued_at) VALUES (?, ?, ?)",
+                                 (waiter_id, lane, now))
+
+    def remove_waiter(self, waiter_id):
+        self._local.conn.execute("DELETE FROM admission_waiter WHERE id = ?", (waiter_id,))
+
+    def purge(self, slots_before, waiters_before):
+        self._local.conn.execute("DELETE FROM admission_slot WHERE acquired_at < ?", (slots_before,))
+        self._local.conn.execute("DELETE FROM admission_waiter WHERE enqueued_at < ?", (waiters_before,))
+
+
+def create_store(kind=ADMISSION_STORE):
+    """
+    Create the limiter store selected by configuration
+
+    Args:
+        kind (str): "memory" or "sqlite"
+
+    Returns:
+        MemoryStore or SQLiteStore
+    """
+    if kind == "sqlite":
+        return SQLiteStore()
+    return MemoryStore()
+
+
+class Slot:
+    """Permission for one LLM call; release it when the reply is done"""
+
+    __slots__ = ("controller", "slot_id", "started")
+
+    def __init__(self, controller, slot_id):
+        self.controller = controller
+        self.slot_id = slot_id
+        self.started = time.monotonic()
+
+    def release(self):
+        if self.slot_id is not None:
+            self.controller._release(self)
+            self.slot_id = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+        return False
+
+
+class _NoSlot:
+    __slots__ = ()
+
+    def release(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_SLOT = _NoSlot()
+
+
+class AdmissionController:
+    """
+    Admission control for chat messages
+
+    Each user has a token bucket (ADMISSION_USER_RATE messages per second,
+    bursts of ADMISSION_USER_BURST). LLM calls are limited to
+    ADMISSION_MAX_IN_FLIGHT at once, with up to ADMISSION_QUEUE messages
+    waiting, oldest first. A message over its user's rate, or arriving to
+    a full queue, or still waiting after ADMISSION_QUEUE_TIMEOUT, is
+    rejected with a Retry-After.
+
+    Crisis messages are never rejected: they skip the rate limit, wait
+    ahead of other messages, may use ADMISSION_CRISIS_SLOTS extra slots,
+    and go ahead over the limit if they still find none in time.
+    """
+
+    def __init__(self, app=None, store=None):
+        self.enabled = ADMISSION_ENABLED
+        self.store = store
+        self.user_rate = ADMISSION_USER_RATE
+        self.user_burst = ADMISSION_USER_BURST
+        self.max_in_flight = ADMISSION_MAX_IN_FLIGHT
+        self.queue = ADMISSION_QUEUE
+        self.queue_timeout = ADMISSION_QUEUE_TIMEOUT
+        self.crisis_slots = ADMISSION_CRISIS_SLOTS
+
+        self.admitted = 0
+        self.queued = 0
+        self.crisis = 0
+        self.rate_limited = 0
+        self.overloaded = 0
+        self._checks = 0
+        # Smoothed time a slot is held, for Retry-After estimates
+        self._hold_seconds = None
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Set up the store and release slots left over at the end of each request"""
+        self.enabled = app.config.get("ADMISSION_ENABLED", self.enabled)
+        if not self.enabled:
+            return
+        if self.store is None:
+            self.store = create_store()
+        app.teardown_request(self._release_request_slot)
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def check_rate(self, user_id, crisis=False):
+        """
+        Take one message from a user's token bucket
+
+        Args:
+            user_id (int): The sender
+            crisis (bool): Crisis messages are always allowed and take no token
+
+        Raises:
+            AdmissionRejected: "rate_limited" if the bucket is empty
+        """
+        if not self.enabled or crisis or self.user_rate <= 0:
+            return
+
+        now = time.time()
+        # Other workers only take tokens (a refund gives back one just taken),
+        # so an empty bucket seen without the lock is really empty; a flooding
+        # client is turned away cheaply
+        tokens = self._tokens(self.store.peek_bucket(user_id), now)
+        if tokens >= 1:
+            with self._lock:
+                self._checks += 1
+                prune = self._checks % PRUNE_EVERY == 0
+            with self.store.transaction() as state:
+                tokens = self._tokens(state.get_bucket(user_id), now)
+                if tokens >= 1:
+                    state.set_bucket(user_id, tokens - 1, now)
+                if prune:
+                    # Buckets untouched this long are full again, the same as no bucket
+                    state.prune_buckets(now - self.user_burst / self.user_rate)
+
+        if tokens < 1:
+            self._count("rate_limited")
+            metrics.observe_admission(NORMAL, "rate_limited", 0.0)
+            raise AdmissionRejected("rate_limited", self._whole_seconds((1 - tokens) / self.user_rate))
+
+    def refund(self, user_id, crisis=False):
+        """
+        Give back the token check_rate took for a message that was then turned away
+
+        Args:
+            user_id (int): The sender
+            crisis (bool): Crisis messages took no token, so nothing is given back
+        """
+        if not self.enabled or crisis or self.user_rate <= 0:
+            return
+
+        now = time.time()
+        with self.store.transaction() as state:
+            bucket = state.get_bucket(user_id)
+            if bucket is not None:
+                state.set_bucket(user_id, min(self.user_burst, self._tokens(bucket, now) + 1), now)
+
+    def _tokens(self, bucket, now):
+        if bucket is None:
+            return self.user_burst
+        tokens, updated_at = bucket
+        return min(self.user_burst, tokens + (now - updated_at) * self.user_rate)
+
+    def acquire(self, crisis=False):
+        """
+        Get a slot for one LLM call, waiting in the queue if all are taken
+
+        Inside a request the slot is also released when the request ends.
+
+        Args:
+            crisis (bool): Use the crisis lane
+
+        Returns:
+            Slot: Release it once the reply has been generated
+
+        Raises:
+            AdmissionRejected: "overloaded" if the queue is full or the wait timed out
+        """
+        if not self.enabled:
+            return _NO_SLOT
+
+        lane = CRISIS if crisis else NORMAL
+        slot_id = uuid.uuid4().hex
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+
+        with self.store.transaction() as state:
+            self._purge(state)
+            if self._try_take(state, slot_id, lane):
+                return self._admitted(slot_id, lane, started, queued=False)
+            waiting = sum(1 for _, other_lane in state.waiters() if other_lane == NORMAL)
+            if lane == NORMAL and waiting >= self.queue:
+                full = True
+            else:
+                full = False
+                state.add_waiter(slot_id, lane, time.time())
+        if full:
+            raise self._overloaded(lane, started, waiting)
+
+        try:
+            while True:
+                time.sleep(POLL_INTERVAL)
+                with self.store.transaction() as state:
+                    if self._try_take(state, slot_id, lane):
+                        state.remove_waiter(slot_id)
+                        return self._admitted(slot_id, lane, started, queued=True)
+                    if time.monotonic() >= deadline:
+                        state.remove_waiter(slot_id)
+                        if lane == CRISIS:
+                            # Never turn a crisis message away; go ahead over the limit
+                            state.add_slot(slot_id, lane, time.time())
+                            return self._admitted(slot_id, lane, started, queued=True)
+                        waiting = sum(1 for _, other_lane in state.waiters() if other_lane == NORMAL)
+                        break
+        except BaseException:
+            # Leave the queue if the request is abandoned while waiting
+            with self.store.transaction() as state:
+                state.remove_waiter(slot_id)
+            raise
+        raise self._overloaded(lane, started, waiting)
+
+    def _try_take(self, state, slot_id, lane):
+        limit = self.max_in_flight + (self.crisis_slots if lane == CRISIS else 0)
+        if state.count_slots() >= limit:
+            return False
+        # Messages already waiting go first: crisis before normal, then oldest first
+        for other_id, other_lane in state.waiters():
+            if other_id == slot_id:
+                break
+            if other_lane == CRISIS or lane == NORMAL:
+                return False
+        state.add_slot(slot_id, lane, time.time())
+        return True
+
+    def _purge(self, state):
+        now = time.time()
+        # Waiters give up after queue_timeout, so older rows belong to dead workers
+        state.purge(now - ADMISSION_SLOT_TTL, now - self.queue_timeout - ADMISSION_SLOT_TTL / 10)
+
+    def _admitted(self, slot_id, lane, started, queued):
+        self._count("crisis" if lane == CRISIS else "admitted")
+        if queued:
+            self._count("queued")
+        metrics.observe_admission(lane, "admitted", time.monotonic() - started)
+        slot = Slot(self, slot_id)
+        if has_request_context():
+            g.setdefault("admission_slots", []).append(slot)
+        return slot
+
+    def _overloaded(self, lane, started, waiting):
+        self._count("overloaded")
+        metrics.observe_admission(lane, "overloaded", time.monotonic() - started)
+        # Time for the messages ahead to drain through the slots
+        hold = self._hold_seconds if self._hold_seconds is not None else self.queue_timeout
+        return AdmissionRejected("overloaded", self._whole_seconds(hold * (waiting + 1) / max(1, self.max_in_flight)))
+
+    def _release(self, slot):
+        with self.store.transaction() as state:
+            state.remove_slot(slot.slot_id)
+        held = time.monotonic() - slot.started
+        with self._lock:
+            self._hold_seconds = held if self._hold_seconds is None else 0.9 * self._hold_seconds + 0.1 * held
+
+    def _release_request_slot(self, exc=None):
+        for slot in g.pop("admission_slots", ()):
+            slot.release()
+
+    @staticmethod
+    def _whole_seconds(seconds):
+        return min(MAX_RETRY_AFTER, max(MIN_RETRY_AFTER, math.ceil(seconds)))
+
+    def stats(self):
+        """
+        Get admission counters for this process
+
+        Returns:
+            dict: Admission statistics
+        """
+        with self._lock:
+            return {
+                "store": type(self.store).__name__ if self.store is not None else None,
+                "admitted": self.admitted,
+                "crisis": self.crisis,
+                "queued": self.queued,
+                "rate_limited": self.rate_limited,
+                "overloaded": self.overloaded,
+            }
+
+
+admission = AdmissionController()
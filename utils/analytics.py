@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import Assessment, DailyEmotionRollup
+
+# Days of history shown on the dashboard and mood tracker charts
+DEFAULT_WINDOW_DAYS = 30
+# Assessments listed and charted on the dashboard
+RECENT_ASSESSMENTS = 50
+
+
+def window_start(days, now=None):
+    """
+    Get the start of a date window covering today and the days before it
+
+    Args:
+        days (int): Number of calendar days in the window, including today
+        now (datetime): Current UTC time, defaults to now
+
+    Returns:
+        datetime: Midnight (UTC) of the first day in the window
+    """
+    now = now or datetime.utcnow()
+    first_day = now.date() - timedelta(days=max(days, 1) - 1)
+    return datetime.combine(first_day, datetime.min.time())
+
+
+def daily_emotion_totals(user_id, days=DEFAULT_WINDOW_DAYS, now=None):
+    """
+    Read a user's per-day, per-emotion totals from the daily rollup
+
+    Reads one row per (day, emotion), however many records the user has.
+
+    Args:
+        user_id (int): User to aggregate
+        days (int): Number of calendar days to include, ending today
+        now (datetime): Current UTC time, defaults to now
+
+    Returns:
+        dict: Parallel columns "date", "emotion", "total", "count",
+            "average" and "max", ordered by date then emotion
+    """
+    rows = db.session.query(
+        DailyEmotionRollup.day,
+        DailyEmotionRollup.emotion,
+        DailyEmotionRollup.total_intensity,
+        DailyEmotionRollup.count,
+        DailyEmotionRollup.max_intensity
+    ).filter(
+        DailyEmotionRollup.user_id == user_id,
+        DailyEmotionRollup.day >= window_start(days, now).date()
+    ).order_by(DailyEmotionRollup.day, DailyEmotionRollup.emotion).all()
+
+    columns = {"date": [], "emotion": [], "total": [], "count": [], "average": [], "max": []}
+    for day, emotion, total, count, peak in rows:
+        columns["date"].append(day.isoformat())
+        columns["emotion"].append(emotion)
+        columns["total"].append(total)
+        columns["count"].append(count)
+        columns["average"].append(total / count)
+        columns["max"].append(peak)
+    return columns
+
+
+def emotion_chart_data(totals):
+    """
+    Pivot daily totals into the {date: {emotion: total intensity}} mapping the charts read
+
+    Args:
+        totals (dict): Columns from daily_emotion_totals
+
+    Returns:
+        dict: Total intensity per emotion, keyed by "YYYY-MM-DD"
+    """
+    chart = {}
+    for date, emotion, total in zip(totals["date"], totals["emotion"], totals["total"]):
+        chart.setdefault(date, {})[emotion] = total
+    return chart
+
+
+def assessment_summary(user_id):
+    """
+    Count and average a user's assessment scores in SQL
+
+    Args:
+        user_id (int): User to summarize
+
+    Returns:
+        dict: "count" and "average" (0 when there are no assessments)
+    """
+    count, average = db.session.query(
+        db.func.count(Assessment.id),
+        db.func.avg(Assessment.score)
+    ).filter(Assessment.user_id == user_id).one()
+    return {"count": count, "average": average or 0}
+
+
+def recent_assessments(user_id, limit=RECENT_ASSESSMENTS):
+    """Get a user's most recent assessments, newest first"""
+    return Assessment.query.filter_by(user_id=user_id).order_by(Assessment.created_at.desc()).limit(limit).all()
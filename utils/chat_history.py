@@ -0,0 +1,81 @@
+import os
+from datetime import datetime
+
+from sqlalchemy import or_
+
+from models import ChatMessage
+
+# Messages rendered with /chat and returned per page of older history
+CHAT_PAGE_SIZE = int(os.environ.get("CHAT_PAGE_SIZE", 50))
+CHAT_PAGE_MAX_SIZE = 200
+
+
+def encode_cursor(message):
+    """Cursor pointing just before a message, as "<created_at ISO>_<id>" """
+    return f"{message.created_at.isoformat()}_{message.id}"
+
+
+def decode_cursor(cursor):
+    """
+    Parse a cursor made by encode_cursor
+
+    Args:
+        cursor (str): Cursor string
+
+    Returns:
+        tuple: (created_at, id), or None if the cursor is malformed
+    """
+    try:
+        created_at, message_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(created_at), int(message_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def chat_page_query(user_id, before=None, limit=CHAT_PAGE_SIZE):
+    """Query for up to limit + 1 messages before a (created_at, id) keyset, newest first"""
+    query = ChatMessage.query.filter(ChatMessage.user_id == user_id)
+    if before is not None:
+        created_at, message_id = before
+        # The plain upper bound on created_at lets the index seek straight to
+        # the cursor; the OR only breaks ties between equal timestamps
+        query = query.filter(
+            ChatMessage.created_at <= created_at,
+            or_(ChatMessage.created_at < created_at, ChatMessage.id < message_id)
+        )
+
+    # One extra row tells whether an older page exists
+    return query.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(limit + 1)
+
+
+def get_chat_page(user_id, before=None, limit=CHAT_PAGE_SIZE):
+    """
+    Get a page of a user's chat history by keyset on (created_at, id)
+
+    Args:
+        user_id (int): Owner of the messages
+        before (tuple): (created_at, id) of the oldest message already shown, None for the latest page
+        limit (int): Maximum number of messages
+
+    Returns:
+        tuple: (messages oldest first, cursor for the next older page or None)
+    """
+    rows = chat_page_query(user_id, before, limit).all()
+    has_more = len(rows) > limit
+    messages = rows[:limit]
+    messages.reverse()
+
+    next_cursor = encode_cursor(messages[0]) if has_more else None
+    return messages, next_cursor
+
+
+def serialize_message(message):
+    """Format a chat message for the history API"""
+    return {
+        'id': message.id,
+        'content': message.content,
+        'is_user': message.is_user,
+        'emotion': message.emotion,
+        'feedback': message.feedback,
+        'created_at': message.created_at.strftime('%Y-%m-%d %H:%M:%S')
+    }
@@ -0,0 +1,216 @@
+import os
+import re
+import time
+import threading
+from collections import namedtuple, OrderedDict
+
+from extensions import db
+from models import ChatMessage
+from utils.gemini_helper import is_fallback_response
+
+# Estimated tokens of history (summary plus recent turns) sent with each message; 0 sends none
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", 1500))
+# Most recent messages kept word for word; older ones are folded into the summary
+CONTEXT_RECENT_MESSAGES = int(os.environ.get("CONTEXT_RECENT_MESSAGES", 12))
+# New messages collected before the summary is refreshed
+CONTEXT_SUMMARY_EVERY = int(os.environ.get("CONTEXT_SUMMARY_EVERY", 10))
+CONTEXT_SUMMARY_TOKENS = int(os.environ.get("CONTEXT_SUMMARY_TOKENS", 300))
+# Messages read when a user's context is not cached
+CONTEXT_LOAD_MESSAGES = int(os.environ.get("CONTEXT_LOAD_MESSAGES", 50))
+# Seconds an idle user's context stays cached
+CONTEXT_CACHE_TTL = float(os.environ.get("CONTEXT_CACHE_TTL", 1800))
+CONTEXT_CACHE_MAX_USERS = int(os.environ.get("CONTEXT_CACHE_MAX_USERS", 1000))
+
+SUMMARY_LINE_CHARS = 200
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+# What the prompt builders receive: summary text and (role, text) turns, oldest first
+ConversationHistory = namedtuple("ConversationHistory", ["summary", "turns"])
+
+
+def estimate_tokens(text):
+    """Estimate a text's token count without a tokenizer (about four characters per token)"""
+    return len(text) // 4 + 1
+
+
+def summarize_turns(summary, turns, max_tokens=CONTEXT_SUMMARY_TOKENS):
+    """
+    Fold turns into a rolling summary without calling a model
+
+    Keeps the opening sentence of each user message; when over budget the
+    oldest lines are dropped first.
+
+    Args:
+        summary (str): Current summary, "" if none
+        turns (list): (role, text) pairs, oldest first
+        max_tokens (int): Estimated token limit for the summary
+
+    Returns:
+        str: Updated summary
+    """
+    lines = summary.splitlines() if summary else []
+    for role, text in turns:
+        if role == "user":
+            sentence = SENTENCE_END.split(text.strip(), 1)[0]
+            lines.append("- " + sentence[:SUMMARY_LINE_CHARS])
+
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class _UserContext:
+    __slots__ = ("summary", "turns", "unsummarized", "last_created_at", "last_ids", "used_at")
+
+    def __init__(self):
+        self.summary = ""
+        self.turns = []  # (role, text, tokens)
+        self.unsummarized = 0
+        self.last_created_at = None
+        self.last_ids = set()  # ids of the messages stored at last_created_at
+        self.used_at = time.monotonic()
+
+
+class ConversationContext:
+    """
+    Per-process cache of each user's conversation context
+
+    The first message from a user loads their recent history; after that
+    only messages newer than the last one seen are read and appended.
+    """
+
+    def __init__(self, token_budget=CONTEXT_TOKEN_BUDGET, recent_messages=CONTEXT_RECENT_MESSAGES,
+                 summary_every=CONTEXT_SUMMARY_EVERY, load_messages=CONTEXT_LOAD_MESSAGES,
+                 ttl=CONTEXT_CACHE_TTL, max_users=CONTEXT_CACHE_MAX_USERS, summarize=summarize_turns):
+        self.token_budget = token_budget
+        self.recent_messages = recent_messages
+        self.summary_every = summary_every
+        self.load_messages = load_messages
+        self.ttl = ttl
+        self.max_users = max_users
+        self.summarize = summarize
+
+        self._contexts = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.loads = 0
+        self.summaries = 0
+
+    def _fetch(self, user_id, since=None):
+        """Read up to load_messages of a user's messages, oldest first, from the (user_id, created_at) index"""
+        query = db.session.query(ChatMessage.id, ChatMessage.created_at, ChatMessage.is_user, ChatMessage.content).filter(
+            ChatMessage.user_id == user_id
+        )
+        if since is not None:
+            query = query.filter(ChatMessage.created_at >= since)
+        rows = query.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(self.load_messages).all()
+        rows.reverse()
+        return rows
+
+    def _append(self, context, rows):
+        for message_id, created_at, is_user, content in rows:
+            if context.last_created_at is not None:
+                if created_at < context.last_created_at or message_id in context.last_ids:
+                    continue
+            if created_at != context.last_created_at:
+                context.last_created_at = created_at
+                context.last_ids = set()
+            context.last_ids.add(message_id)
+
+            # Canned error replies say nothing about the conversation
+            if not is_user and is_fallback_response(content):
+                continue
+            context.turns.append(("user" if is_user else "assistant", content, estimate_tokens(content)))
+            context.unsummarized += 1
+
+        if context.unsummarized >= self.summary_every and len(context.turns) > self.recent_messages:
+            folded = context.turns[:-self.recent_messages]
+            context.turns = context.turns[-self.recent_messages:]
+            context.summary = self.summarize(context.summary, [(role, text) for role, text, _ in folded])
+            context.unsummarized = 0
+            self.summaries += 1
+
+    def get(self, user_id):
+        """
+        Get a user's conversation so far, trimmed to the token budget
+
+        Call before the user's new message is saved, so it is not included.
+
+        Args:
+            user_id (int): User id
+
+        Returns:
+            ConversationHistory: Summary and recent turns, or None if there is no history
+        """
+        if self.token_budget <= 0:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            context = self._contexts.get(user_id)
+            if context is not None and now - context.used_at > self.ttl:
+                context = None
+            since = context.last_created_at if context is not None else None
+
+        rows = self._fetch(user_id, since)
+
+        with self._lock:
+            if context is None or len(rows) >= self.load_messages:
+                # Not cached, or too much was written elsewhere to append it
+                context = _UserContext()
+                self.loads += 1
+            else:
+                self.hits += 1
+            self._append(context, rows)
+            context.used_at = now
+            self._contexts[user_id] = context
+            self._contexts.move_to_end(user_id)
+            while len(self._contexts) > self.max_users:
+                self._contexts.popitem(last=False)
+            return self._trim(context)
+
+    def _trim(self, context):
+        budget = self.token_budget
+        summary = context.summary
+        if summary:
+            budget -= estimate_tokens(summary)
+
+        turns = []
+        for role, text, tokens in reversed(context.turns):
+            if tokens > budget:
+                break
+            budget -= tokens
+            turns.append((role, text))
+        turns.reverse()
+
+        if not summary and not turns:
+            return None
+        return ConversationHistory(summary, tuple(turns))
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._contexts.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._contexts.clear()
+
+    def stats(self):
+        """
+        Get cache counters for this process
+
+        Returns:
+            dict: Context cache statistics
+        """
+        with self._lock:
+            return {
+                "users": len(self._contexts),
+                "hits": self.hits,
+                "loads": self.loads,
+                "summaries": self.summaries
+            }
+
+
+conversation_context = ConversationContext()
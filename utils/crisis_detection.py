@@ -1,4 +1,6 @@
 import re
+from bisect import bisect_right
+from collections import namedtuple
 
 # Crisis keywords - high sensitivity, specific phrases that indicate potential self-harm or suicidal ideation
 CRISIS_KEYWORDS = [
@@ -21,33 +23,78 @@ MEDIUM_RISK_PHRASES = [
     "trapped", "burden to others", "no way out", "everything is pointless"
 ]
 
-def detect_crisis(text):
+
+# Time indicators that might increase urgency
+TIME_INDICATORS = ["tonight", "soon", "right now", "today", "immediately"]
+
+CrisisSignals = namedtuple('CrisisSignals', ['crisis', 'medium_risk', 'time_indicators'])
+
+# Phrase -> (category, position in its list)
+_PHRASES = {}
+for _category, _phrases in (("time", TIME_INDICATORS), ("medium", MEDIUM_RISK_PHRASES), ("crisis", CRISIS_KEYWORDS)):
+    for _rank, _phrase in enumerate(_phrases):
+        _PHRASES[_phrase] = (_category, _rank)
+
+# One alternation over every phrase, longest first, wrapped in a lookahead so a
+# match is attempted at every word start and overlapping phrases are all seen.
+# The leading character class rejects most word starts before the alternation runs.
+_SIGNAL_PATTERN = re.compile(
+    r'\b(?=[' + ''.join(sorted({re.escape(p[0]) for p in _PHRASES})) + r'])'
+    r'(?=(' + '|'.join(re.escape(p) for p in sorted(_PHRASES, key=len, reverse=True)) + r')\b)'
+)
+
+# Only the longest phrase is reported at a given position, so record the
+# shorter phrases each one contains (e.g. "suicide" inside "suicide plan")
+_CONTAINED = {
+    phrase: tuple(
+        other for other in _PHRASES
+        if other != phrase and re.search(r'\b' + re.escape(other) + r'\b', phrase)
+    )
+    for phrase in _PHRASES
+}
+
+
+def _collect_signals(hits):
+    found = set()
+    for phrase in hits:
+        found.add(phrase)
+        found.update(_CONTAINED[phrase])
+
+    signals = CrisisSignals([], [], [])
+    for phrase in found:
+        category, _ = _PHRASES[phrase]
+        if category == "crisis":
+            signals.crisis.append(phrase)
+        elif category == "medium":
+            signals.medium_risk.append(phrase)
+        else:
+            signals.time_indicators.append(phrase)
+    for phrases in signals:
+        phrases.sort(key=lambda p: _PHRASES[p][1])
+    return signals
+
+
+def find_crisis_signals(text):
     """
-    Detect potential crisis signals in user messages
-    
+    Find every crisis keyword, medium-risk phrase and time indicator in one pass
+
     Args:
         text (str): User message text
-        
+
     Returns:
-        tuple: (crisis_detected, crisis_level)
-            crisis_detected (bool): Whether a crisis was detected
-            crisis_level (int): Level of crisis (0-10)
+        CrisisSignals: Matched phrases per category, in list order
     """
-    text = text.lower()
-    
-    # Check for high-risk crisis keywords (direct mentions of suicide/self-harm)
-    for keyword in CRISIS_KEYWORDS:
-        if re.search(r'\b' + re.escape(keyword) + r'\b', text):
-            # High crisis level (8-10)
-            severity = min(10, 8 + text.count(keyword))
-            return True, severity
-    
-    # Check for medium-risk phrases
-    medium_risk_count = 0
-    for phrase in MEDIUM_RISK_PHRASES:
-        if re.search(r'\b' + re.escape(phrase) + r'\b', text):
-            medium_risk_count += 1
-    
+    return _collect_signals(_SIGNAL_PATTERN.findall(text.lower()))
+
+
+def _crisis_level(text, signals):
+    if signals.crisis:
+        # High crisis level (8-10)
+        keyword = signals.crisis[0]
+        severity = min(10, 8 + text.count(keyword))
+        return True, severity
+
+    medium_risk_count = len(signals.medium_risk)
     if medium_risk_count >= 2:
         # Medium crisis level (5-7)
         severity = min(7, 5 + medium_risk_count - 2)
@@ -55,12 +102,51 @@ def detect_crisis(text):
     elif medium_risk_count == 1:
         # Low crisis level (3-4)
         return True, 4
-        
-    # Look for time indicators that might increase urgency
-    time_indicators = ["tonight", "soon", "right now", "today", "immediately"]
-    for indicator in time_indicators:
-        if indicator in text and medium_risk_count > 0:
-            return True, 6
-    
+
     # No crisis detected
     return False, 0
+
+
+def detect_crisis(text):
+    """
+    Detect potential crisis signals in user messages
+    
+    Args:
+        text (str): User message text
+        
+    Returns:
+        tuple: (crisis_detected, crisis_level)
+            crisis_detected (bool): Whether a crisis was detected
+            crisis_level (int): Level of crisis (0-10)
+    """
+    text = text.lower()
+    return _crisis_level(text, _collect_signals(_SIGNAL_PATTERN.findall(text)))
+
+
+def detect_crisis_batch(texts):
+    """
+    Detect crisis signals in many messages with a single scan
+
+    Args:
+        texts (list): User message texts
+
+    Returns:
+        list: (crisis_detected, crisis_level) per message, as detect_crisis
+    """
+    if not texts:
+        return []
+
+    lowered = [text.lower() for text in texts]
+    # No phrase spans a newline, so matches never cross message boundaries
+    joined = "\n".join(lowered)
+    starts = []
+    offset = 0
+    for text in lowered:
+        starts.append(offset)
+        offset += len(text) + 1
+
+    hits = [[] for _ in texts]
+    for match in _SIGNAL_PATTERN.finditer(joined):
+        hits[bisect_right(starts, match.start()) - 1].append(match.group(1))
+
+    return [_crisis_level(text, _collect_signals(message_hits)) for text, message_hits in zip(lowered, hits)]
@@ -0,0 +1,93 @@
+import os
+
+from sqlalchemy import event
+
+DEFAULT_DATABASE_URI = "sqlite:///mental_well.db"
+
+# Connection pool settings (PostgreSQL and other server databases)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+# Seconds after which a pooled connection is replaced, below typical server/proxy idle timeouts
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "1") != "0"
+
+# SQLite pragmas applied to every new connection of the app's engine
+SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT = int(os.environ.get("SQLITE_BUSY_TIMEOUT", 5000))  # milliseconds
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))  # bytes, 0 disables
+
+
+def database_uri():
+    """
+    Get the database URI from the environment
+
+    Uses SQLALCHEMY_DATABASE_URI, then DATABASE_URL (as set by hosting
+    providers), then a local SQLite file.
+
+    Returns:
+        str: SQLAlchemy database URI
+    """
+    uri = os.environ.get("SQLALCHEMY_DATABASE_URI") or os.environ.get("DATABASE_URL") or DEFAULT_DATABASE_URI
+    # Heroku-style URLs use a scheme SQLAlchemy no longer accepts
+    if uri.startswith("postgres://"):
+        uri = "postgresql://" + uri[len("postgres://"):]
+    return uri
+
+
+def engine_options(uri):
+    """
+    Get SQLAlchemy engine options for a database URI
+
+    Args:
+        uri (str): SQLAlchemy database URI
+
+    Returns:
+        dict: Keyword arguments for create_engine
+    """
+    if uri.startswith("sqlite"):
+        # SQLite has no server to keep connections to; the pragmas below do the tuning
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def configure_database(app):
+    """Set the database URI and engine options on a Flask app from the environment"""
+    uri = database_uri()
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(uri)
+
+
+def configure_engine(app, db):
+    """
+    Apply the SQLite pragmas to new connections of an app's engine
+
+    Only the app's own engine is configured; other engines in the process
+    (e.g. ones a script or benchmark creates) keep SQLite's defaults.
+
+    Args:
+        app (Flask): The application, after db.init_app
+        db (SQLAlchemy): The Flask-SQLAlchemy extension
+    """
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith("sqlite"):
+        return
+    with app.app_context():
+        event.listen(db.engine, "connect", _set_sqlite_pragmas)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers run alongside the single writer; NORMAL is safe under WAL
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    # Wait for a competing writer instead of failing with "database is locked"
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
@@ -1,48 +1,194 @@
-import os
+import string
 
 # Emotion categories
 EMOTIONS = [
-    "angry", "anxious", "depressed", "fearful", "happy", 
+    "angry", "anxious", "depressed", "fearful", "happy",
     "sad", "stressed", "calm", "hopeful", "neutral"
 ]
 
+EMOTION_KEYWORDS = {
+    "angry": ["angry", "anger", "mad", "furious", "rage", "hate", "frustrated"],
+    "anxious": ["anxious", "anxiety", "worry", "worried", "nervous", "uneasy", "panic"],
+    "depressed": ["depressed", "depression", "hopeless", "worthless", "empty", "numb"],
+    "fearful": ["afraid", "scared", "terrified", "fear", "frightened", "terror"],
+    "happy": ["happy", "joy", "glad", "pleased", "delighted", "excited", "grateful"],
+    "sad": ["sad", "unhappy", "miserable", "down", "blue", "upset", "heartbroken"],
+    "stressed": ["stressed", "overwhelmed", "pressure", "burden", "overloaded"],
+    "calm": ["calm", "peaceful", "relaxed", "serene", "tranquil", "composed"],
+    "hopeful": ["hopeful", "optimistic", "looking forward", "positive", "better"]
+}
+
+# Keywords that signal a stronger feeling than a plain mention (default weight 1.0)
+KEYWORD_WEIGHTS = {
+    "furious": 1.5, "rage": 1.5, "hate": 1.25,
+    "panic": 1.25,
+    "hopeless": 1.5, "worthless": 1.5,
+    "terrified": 1.5, "terror": 1.5,
+    "delighted": 1.25,
+    "miserable": 1.25, "heartbroken": 1.5,
+    "overwhelmed": 1.25, "overloaded": 1.25
+}
+
+# Words that strengthen the keyword that follows them
+INTENSIFIERS = {
+    "very": 1.5, "so": 1.5, "really": 1.5, "extremely": 2.0, "incredibly": 2.0,
+    "super": 1.5, "totally": 1.5, "completely": 1.5, "deeply": 1.5
+}
+
+# Words that cancel the keyword that follows them ("not happy")
+NEGATIONS = {"not", "no", "never", "isn't", "wasn't", "don't", "doesn't", "didn't", "aren't", "weren't"}
+
+# Intensity reported when no emotion keywords are found
+NEUTRAL_INTENSITY = 0.5
+
+# Lowercased text -> space-separated words: str.translate and str.split stay in C,
+# where a regex tokenizer costs more than the old substring scan on long messages.
+# Apostrophes are dropped ("isn't" -> "isnt", "'sad'" -> "sad"); everything else
+# that is not a letter separates words. NUL is kept to separate batched messages.
+_TOKEN_TABLE = str.maketrans({
+    **{chr(c): " " for c in range(1, 128) if chr(c) not in string.ascii_lowercase},
+    **{c: " " for c in "\u00a0\u2013\u2014\u2026\u201c\u201d\u00ab\u00bb"},
+    "'": None, "\u2018": None, "\u2019": None,
+})
+_BATCH_SEPARATOR = "\x00"
+
+# NEGATIONS as they appear once tokenized
+_NEGATION_TOKENS = frozenset(word.replace("'", "") for word in NEGATIONS)
+
+
+def _inflections(word):
+    """Common inflected forms of a keyword ("worry" -> "worrying", "hate" -> "hated")"""
+    forms = {word, word + "s", word + "ing", word + "ed"}
+    if word.endswith("e"):
+        forms.update({word + "d", word[:-1] + "ing"})
+    if word.endswith("y"):
+        forms.update({word[:-1] + "ies", word[:-1] + "ied"})
+    if word.endswith("c"):
+        forms.update({word + "ked", word + "king"})
+    return forms
+
+
+def _build_keyword_index():
+    words = {}
+    phrases = {}
+    for emotion, keywords in EMOTION_KEYWORDS.items():
+        for keyword in keywords:
+            weight = KEYWORD_WEIGHTS.get(keyword, 1.0)
+            parts = tuple(keyword.split())
+            if len(parts) == 1:
+                for form in _inflections(keyword):
+                    words.setdefault(form, (emotion, weight))
+            else:
+                phrases.setdefault(parts[0], []).append((parts, (emotion, weight)))
+    return words, phrases
+
+
+# Token -> (emotion, weight), and first token -> [(word tuple, (emotion, weight))] for phrases
+_WORD_INDEX, _PHRASE_INDEX = _build_keyword_index()
+
+# Any token that can start a keyword match
+_TRIGGERS = frozenset(_WORD_INDEX) | frozenset(_PHRASE_INDEX)
+
+
+def _modifier(tokens, i):
+    """Weight multiplier from the words preceding tokens[i]; 0.0 if negated"""
+    multiplier = 1.0
+    j = i - 1
+    if j >= 0 and tokens[j] in INTENSIFIERS:
+        multiplier = INTENSIFIERS[tokens[j]]
+        j -= 1
+    if j >= 0 and tokens[j] in _NEGATION_TOKENS:
+        return 0.0
+    return multiplier
+
+
+def _match(tokens, i):
+    token = tokens[i]
+    for parts, match in _PHRASE_INDEX.get(token, ()):
+        if tuple(tokens[i:i + len(parts)]) == parts:
+            return match
+    return _WORD_INDEX.get(token)
+
+
+def _tokenize(text):
+    return text.lower().translate(_TOKEN_TABLE).split()
+
+
+def _score(tokens):
+    scores = {}
+
+    # Set intersection and list.index keep the scan in C; only keyword
+    # occurrences are visited in Python
+    for trigger in _TRIGGERS.intersection(tokens):
+        i = -1
+        for _ in range(tokens.count(trigger)):
+            i = tokens.index(trigger, i + 1)
+            match = _match(tokens, i)
+            if match is None:
+                continue
+
+            emotion, weight = match
+            weight *= _modifier(tokens, i)
+            if weight:
+                scores[emotion] = scores.get(emotion, 0.0) + weight
+
+    return scores
+
+
+def _label(scores):
+    if not scores:
+        return "neutral", NEUTRAL_INTENSITY
+
+    # Ties go to the emotion listed first in EMOTION_KEYWORDS
+    best = max(scores.values())
+    emotion = next(e for e in EMOTION_KEYWORDS if scores.get(e) == best)
+
+    # Each unit of keyword weight closes half the remaining distance to 1.0
+    return emotion, round(1.0 - 0.5 ** best, 2)
+
+
+def analyze_emotion(text):
+    """
+    Keyword-based emotion detection with an intensity estimate
+
+    Args:
+        text (str): The text to analyze
+
+    Returns:
+        tuple: (emotion, intensity)
+            emotion (str): Detected emotion
+            intensity (float): Strength of the emotion (0.0-1.0)
+    """
+    return _label(_score(_tokenize(text)))
+
+
+def detect_emotions_batch(texts):
+    """
+    Detect emotions for many messages, e.g. when backfilling history
+
+    Args:
+        texts (list): The texts to analyze
+
+    Returns:
+        list: (emotion, intensity) per text, as analyze_emotion
+    """
+    # One lower/translate pass over the whole batch instead of one per message
+    joined = _BATCH_SEPARATOR.join(texts).lower().translate(_TOKEN_TABLE).split(_BATCH_SEPARATOR)
+    if len(joined) != len(texts):
+        # A message contained the separator
+        return [analyze_emotion(text) for text in texts]
+    return [_label(_score(part.split())) for part in joined]
+
+
 # Using simple keyword-based emotion detection
 def detect_emotion(text):
     """
     Simple keyword-based emotion detection
-    
+
     Args:
         text (str): The text to analyze
-        
+
     Returns:
         str: Detected emotion
     """
-    text = text.lower()
-    
-    emotion_keywords = {
-        "angry": ["angry", "anger", "mad", "furious", "rage", "hate", "frustrated"],
-        "anxious": ["anxious", "anxiety", "worry", "worried", "nervous", "uneasy", "panic"],
-        "depressed": ["depressed", "depression", "hopeless", "worthless", "empty", "numb"],
-        "fearful": ["afraid", "scared", "terrified", "fear", "frightened", "terror"],
-        "happy": ["happy", "joy", "glad", "pleased", "delighted", "excited", "grateful"],
-        "sad": ["sad", "unhappy", "miserable", "down", "blue", "upset", "heartbroken"],
-        "stressed": ["stressed", "overwhelmed", "pressure", "burden", "overloaded"],
-        "calm": ["calm", "peaceful", "relaxed", "serene", "tranquil", "composed"],
-        "hopeful": ["hopeful", "optimistic", "looking forward", "positive", "better"]
-    }
-    
-    emotion_counts = {emotion: 0 for emotion in emotion_keywords}
-    
-    for emotion, keywords in emotion_keywords.items():
-        for keyword in keywords:
-            if keyword in text:
-                emotion_counts[emotion] += 1
-    
-    # Find emotion with most keyword matches
-    max_count = max(emotion_counts.values())
-    if max_count > 0:
-        max_emotions = [e for e, c in emotion_counts.items() if c == max_count]
-        return max_emotions[0]  # Return first if multiple have same count
-    
-    # Default if no keywords found
-    return "neutral"
+    return analyze_emotion(text)[0]
@@ -1,91 +1,127 @@
 import os
-import google.generativeai as genai
+from utils.llm_clients import register_client, LLM_READ_TIMEOUT
+from utils.prompts import build_prompt
 
 # Set up the Gemini API
 GEMINI_API_KEY = os.environ.get("GOOGLE_GEMINI_API_KEY", "")
 MODEL = "gemini-1.5-pro"
 
-# Configure the Gemini API
-if GEMINI_API_KEY:
+
+# Replies used when the model cannot produce a response
+MISSING_KEY_RESPONSE = "I apologize, but I need a Google AI API key to function properly. Please ask the administrator to provide a valid Gemini API key."
+QUOTA_RESPONSE = "I apologize, but the AI service is currently unavailable due to API usage limits. Please contact the administrator to update the API quota."
+RATE_LIMIT_RESPONSE = "The AI service is temporarily unavailable due to high demand. Please try again in a few moments."
+FALLBACK_RESPONSES = {
+    "sad": "I notice you might be feeling down. While we're experiencing some technical difficulties, remember that it's okay to reach out to friends, family, or professional support when needed. Deep breathing exercises and gentle physical activity can sometimes help lift your mood.",
+    "anxious": "I sense you might be feeling anxious. While our systems are currently experiencing technical issues, a quick grounding exercise might help: try naming 5 things you can see, 4 things you can touch, 3 things you can hear, 2 things you can smell, and 1 thing you can taste.",
+    "angry": "I can understand feeling frustrated, especially when technology isn't working as expected. Taking a short break, some deep breaths, or a brief walk might help provide some perspective.",
+    "default": "I apologize for the technical difficulties we're experiencing. While I work to resolve this issue, is there something specific you'd like to discuss or any particular coping strategies you've found helpful in the past?"
+}
+
+def _create_model():
+    # The SDK takes about half a second to import, so it is loaded with the first request that needs it
+    import google.generativeai as genai
+
     genai.configure(api_key=GEMINI_API_KEY)
+    return genai.GenerativeModel(MODEL)
+
+# One model per process; the SDK keeps its transport open between calls
+gemini_client = register_client("gemini", _create_model)
+
+# Per-request deadline so a stuck upstream call cannot pin a worker
+REQUEST_OPTIONS = {"timeout": LLM_READ_TIMEOUT}
+
+def get_model():
+    """Get the shared Gemini model used for chat responses"""
+    if not GEMINI_API_KEY:
+        raise ValueError("Missing Gemini API key")
+
+    return gemini_client.get()
+
+def error_response(error_message, emotion):
+    """
+    Map a Gemini error to the reply shown to the user
+
+    Args:
+        error_message (str): The error raised by the API call
+        emotion (str): Detected emotion in the message
+
+    Returns:
+        str: Reply text
+    """
+    if "API key not available" in error_message or "Missing Gemini API key" in error_message:
+        return MISSING_KEY_RESPONSE
+    elif "quota" in error_message.lower():
+        return QUOTA_RESPONSE
+    elif "429" in error_message:
+        return RATE_LIMIT_RESPONSE
+    else:
+        # Provide a meaningful fallback response based on the detected emotion
+        if emotion in ["sad", "depressed", "down"]:
+            return FALLBACK_RESPONSES["sad"]
+        elif emotion in ["anxious", "worried", "stressed"]:
+            return FALLBACK_RESPONSES["anxious"]
+        elif emotion in ["angry", "frustrated", "upset"]:
+            return FALLBACK_RESPONSES["angry"]
+        else:
+            return FALLBACK_RESPONSES["default"]
+
+def is_fallback_response(text):
+    """Check if a reply is one of the canned error/fallback replies"""
+    return text in (MISSING_KEY_RESPONSE, QUOTA_RESPONSE, RATE_LIMIT_RESPONSE) or text in FALLBACK_RESPONSES.values()
 
-def get_ai_response(user_message, emotion, relevant_resources, crisis_detected=False, crisis_level=0):
+def generate_response(user_message, emotion, relevant_resources, crisis_detected=False, crisis_level=0, history=None):
     """
-    Generate an AI response to a user message using Gemini
-    
+    Generate a Gemini response, raising on any API error
+
     Args:
         user_message (str): The user's message
         emotion (str): Detected emotion in the message
         relevant_resources (list): List of relevant therapy resources
         crisis_detected (bool): Whether a crisis was detected
         crisis_level (int): Level of crisis (0-10)
-        
+        history (ConversationHistory): Earlier conversation, or None
+
     Returns:
         str: AI response
     """
-    # Construct system prompt with therapy approach
-    system_prompt = """
-    You are an AI-powered mental health assistant designed to provide supportive conversations and coping strategies.
-    You are not a replacement for a licensed therapist but can offer evidence-based techniques and empathetic responses.
-    Always prioritize user safety and well-being. Be empathetic, warm, and conversational in your tone.
-    
-    When responding:
-    1. Acknowledge the user's emotions with empathy
-    2. Provide evidence-based coping strategies when appropriate
-    3. Encourage healthy behaviors and thought patterns
-    4. Never diagnose medical conditions or prescribe medications
-    5. If a user appears to be in crisis, provide crisis resources and encourage professional help
-    
-    The user's detected emotion in this message is: {emotion}
+    full_prompt = build_prompt(user_message, emotion, relevant_resources, crisis_detected, crisis_level, history)
+    model = get_model()
+
+    # Generate response
+    with gemini_client.track():
+        response = model.generate_content(full_prompt, request_options=REQUEST_OPTIONS)
+
+    return response.text.strip()
+
+def stream_response(user_message, emotion, relevant_resources, crisis_detected=False, crisis_level=0, history=None, model=None):
     """
-    
-    # Add crisis handling instructions if detected
-    if crisis_detected:
-        system_prompt += f"""
-        IMPORTANT: Crisis detected (level: {crisis_level}/10).
-        Prioritize safety and provide appropriate crisis resources.
-        Be direct yet compassionate about the importance of seeking immediate help.
-        Include the National Suicide Prevention Lifeline (988) and Crisis Text Line (text HOME to 741741).
-        """
-    
-    # Add relevant resources as context
-    resources_context = ""
-    if relevant_resources:
-        resources_context = "Here are some relevant therapeutic approaches that might help:\n"
-        for resource in relevant_resources:
-            resources_context += f"- {resource['title']}: {resource['summary']}\n"
-    
-    # Combine all context
-    full_prompt = system_prompt.format(emotion=emotion) + "\n\n" + resources_context + "\n\nUser message: " + user_message
-    
-    try:
-        if not GEMINI_API_KEY:
-            raise ValueError("Missing Gemini API key")
-            
-        # Create a generative model instance
-        model = genai.GenerativeModel(MODEL)
-        
-        # Generate response
-        response = model.generate_content(full_prompt)
-        
-        return response.text.strip()
-    except Exception as e:
-        error_message = str(e)
-        print(f"Error getting AI response from Gemini: {error_message}")
-        
-        if "API key not available" in error_message or "Missing Gemini API key" in error_message:
-            return "I apologize, but I need a Google AI API key to function properly. Please ask the administrator to provide a valid Gemini API key."
-        elif "quota" in error_message.lower():
-            return "I apologize, but the AI service is currently unavailable due to API usage limits. Please contact the administrator to update the API quota."
-        elif "429" in error_message:
-            return "The AI service is temporarily unavailable due to high demand. Please try again in a few moments."
-        else:
-            # Provide a meaningful fallback response based on the detected emotion
-            if emotion in ["sad", "depressed", "down"]:
-                return "I notice you might be feeling down. While we're experiencing some technical difficulties, remember that it's okay to reach out to friends, family, or professional support when needed. Deep breathing exercises and gentle physical activity can sometimes help lift your mood."
-            elif emotion in ["anxious", "worried", "stressed"]:
-                return "I sense you might be feeling anxious. While our systems are currently experiencing technical issues, a quick grounding exercise might help: try naming 5 things you can see, 4 things you can touch, 3 things you can hear, 2 things you can smell, and 1 thing you can taste."
-            elif emotion in ["angry", "frustrated", "upset"]:
-                return "I can understand feeling frustrated, especially when technology isn't working as expected. Taking a short break, some deep breaths, or a brief walk might help provide some perspective."
-            else:
-                return "I apologize for the technical difficulties we're experiencing. While I work to resolve this issue, is there something specific you'd like to discuss or any particular coping strategies you've found helpful in the past?"
\ No newline at end of file
+    Stream a Gemini response, raising on any API error or an empty reply
+
+    Args:
+        user_message (str): The user's message
+        emotion (str): Detected emotion in the message
+        relevant_resources (list): List of relevant therapy resources
+        crisis_detected (bool): Whether a crisis was detected
+        crisis_level (int): Level of crisis (0-10)
+        history (ConversationHistory): Earlier conversation, or None
+        model: Object with a Gemini-style generate_content(prompt, stream=True);
+            defaults to get_model()
+
+    Yields:
+        str: Response text chunks
+    """
+    full_prompt = build_prompt(user_message, emotion, relevant_resources, crisis_detected, crisis_level, history)
+    if model is None:
+        model = get_model()
+
+    produced = False
+    with gemini_client.track():
+        for chunk in model.generate_content(full_prompt, stream=True, request_options=REQUEST_OPTIONS):
+            text = chunk.text
+            if text:
+                produced = True
+                yield text
+
+    if not produced:
+        raise ValueError("Empty response from Gemini")
@@ -0,0 +1,145 @@
+import os
+import threading
+from contextlib import contextmanager
+
+# Connection pool and timeout settings shared by the LLM provider clients.
+# The pool defaults to one connection per gunicorn worker thread.
+LLM_POOL_SIZE = int(os.environ.get("LLM_POOL_SIZE", os.environ.get("GUNICORN_THREADS", 4)))
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", 5))
+LLM_READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", 30))
+LLM_KEEPALIVE_EXPIRY = float(os.environ.get("LLM_KEEPALIVE_EXPIRY", 60))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 2))
+
+
+class ProviderClient:
+    """
+    A provider SDK client created once per process and shared by all requests
+
+    The client is rebuilt if the process forks, since pooled connections
+    (and gRPC channels) must not be shared between parent and child.
+    """
+
+    def __init__(self, name, factory, pool_stats=None):
+        self.name = name
+        self._factory = factory
+        self._pool_stats = pool_stats
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+        self.created = 0
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+
+    def get(self):
+        """Get the shared client, creating it on first use in this process"""
+        pid = os.getpid()
+        if self._client is not None and self._pid == pid:
+            return self._client
+
+        with self._lock:
+            if self._client is None or self._pid != pid:
+                self._client = self._factory()
+                self._pid = pid
+                self.created += 1
+            return self._client
+
+    def reset(self):
+        """Drop the shared client so the next get() builds a new one"""
+        with self._lock:
+            self._client = None
+            self._pid = None
+
+    @contextmanager
+    def track(self):
+        """Count a request against this client for the duration of the block"""
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+        try:
+            yield
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def stats(self):
+        """
+        Get request counters and, where the SDK exposes them, pool counters
+
+        Returns:
+            dict: Client statistics
+        """
+        stats = {
+            "clients_created": self.created,
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "pool_size": LLM_POOL_SIZE
+        }
+        if self._pool_stats is not None and self._client is not None:
+            try:
+                stats.update(self._pool_stats(self._client))
+            except Exception:
+                pass
+        return stats
+
+
+_clients = {}
+
+
+def register_client(name, factory, pool_stats=None):
+    """
+    Register a provider client factory
+
+    Args:
+        name (str): Provider name
+        factory (callable): Builds the SDK client
+        pool_stats (callable): Optional, returns connection pool counters for a client
+
+    Returns:
+        ProviderClient: The shared client wrapper
+    """
+    client = ProviderClient(name, factory, pool_stats)
+    _clients[name] = client
+    return client
+
+
+def get_client(name):
+    """Get a registered provider client"""
+    return _clients[name]
+
+
+def pool_stats():
+    """
+    Get statistics for every registered provider client
+
+    Returns:
+        dict: Provider name -> statistics
+    """
+    return {name: client.stats() for name, client in _clients.items()}
+
+
+def httpx_client():
+    """Build an httpx client with the shared keep-alive pool and timeouts"""
+    import httpx
+
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=LLM_POOL_SIZE,
+            max_keepalive_connections=LLM_POOL_SIZE,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+    )
+
+
+def httpx_pool_stats(http_client):
+    """Connection counts of an httpx client's pool"""
+    connections = http_client._transport._pool.connections
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return {"connections": len(connections), "idle_connections": idle}
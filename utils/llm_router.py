@@ -0,0 +1,406 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from extensions import metrics
+from utils.gemini_helper import (
+    error_response, is_fallback_response, RATE_LIMIT_RESPONSE
+)
+
+logger = logging.getLogger(__name__)
+
+# Providers in order of preference; only those with an API key configured are used
+LLM_PROVIDERS = [name.strip() for name in os.environ.get("LLM_PROVIDERS", "gemini,openai").split(",") if name.strip()]
+# Fire a second request at the next provider when the first runs past its p95 latency
+LLM_HEDGE_ENABLED = os.environ.get("LLM_HEDGE", "0") == "1"
+# Latency samples needed before a provider's p95 is trusted for hedging
+LLM_HEDGE_MIN_SAMPLES = int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", 20))
+# Calls remembered per provider for latency and error-rate tracking
+LLM_ROUTER_WINDOW = int(os.environ.get("LLM_ROUTER_WINDOW", 100))
+# Consecutive quota/429 errors that open a provider's circuit
+LLM_CIRCUIT_THRESHOLD = int(os.environ.get("LLM_CIRCUIT_THRESHOLD", 3))
+# Seconds an open circuit waits before letting a trial request through
+LLM_CIRCUIT_COOLDOWN = float(os.environ.get("LLM_CIRCUIT_COOLDOWN", 30))
+LLM_ROUTER_MAX_WORKERS = int(os.environ.get("LLM_ROUTER_MAX_WORKERS", 16))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class NoProviderAvailable(Exception):
+    """Every provider's circuit is open"""
+
+
+def is_rate_limit_error(error):
+    """
+    Check if an exception is a quota or rate-limit (HTTP 429) error
+
+    Args:
+        error (Exception): Error raised by a provider SDK
+
+    Returns:
+        bool: Whether the provider is throttling us
+    """
+    for attribute in ("status_code", "code"):
+        if getattr(error, attribute, None) == 429:
+            return True
+    if type(error).__name__ in ("RateLimitError", "ResourceExhausted", "TooManyRequests"):
+        return True
+    message = str(error)
+    return "429" in message or "quota" in message.lower()
+
+
+def _outcome(error):
+    """Label an LLM call failure for metrics"""
+    return "rate_limited" if is_rate_limit_error(error) else "error"
+
+
+class Provider:
+    """
+    An LLM backend with rolling latency/error statistics and a circuit breaker
+
+    Args:
+        name (str): Provider name
+        generate (callable): generate(user_message, emotion, resources, crisis_detected, crisis_level) -> str,
+            raising on failure
+        stream (callable): Optional streaming counterpart yielding text chunks
+    """
+
+    def __init__(self, name, generate, stream=None, window=LLM_ROUTER_WINDOW,
+                 circuit_threshold=LLM_CIRCUIT_THRESHOLD, circuit_cooldown=LLM_CIRCUIT_COOLDOWN):
+        self.name = name
+        self.generate = generate
+        self.stream = stream
+        self.circuit_threshold = circuit_threshold
+        self.circuit_cooldown = circuit_cooldown
+
+        self._latencies = deque(maxlen=window)
+        self._outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.consecutive_rate_limits = 0
+        self._trial_in_flight = False
+
+    def allow_request(self, now=None):
+        """Check the circuit, moving an open circuit to half-open after its cooldown"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and now - self.opened_at >= self.circuit_cooldown:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                # Let a single trial request through
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self, latency=None):
+        with self._lock:
+            if latency is not None:
+                self._latencies.append(latency)
+            self._outcomes.append(True)
+            self.consecutive_rate_limits = 0
+            # Calls that started before the circuit opened do not close it;
+            # only the half-open trial does
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+            self._trial_in_flight = False
+
+    def record_failure(self, error):
+        with self._lock:
+            self._outcomes.append(False)
+            self._trial_in_flight = False
+            if self.state == OPEN:
+                return
+            if is_rate_limit_error(error):
+                self.consecutive_rate_limits += 1
+                if self.state == HALF_OPEN or self.consecutive_rate_limits >= self.circuit_threshold:
+                    self.state = OPEN
+                    self.opened_at = time.monotonic()
+            elif self.state == HALF_OPEN:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """Give back a half-open trial slot without recording an outcome"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def p95_latency(self, min_samples=LLM_HEDGE_MIN_SAMPLES):
+        """95th percentile of recent successful call latencies, None with too few samples"""
+        with self._lock:
+            if len(self._latencies) < min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+    def error_rate(self):
+        with self._lock:
+            if not self._outcomes:
+                return 0.0
+            return self._outcomes.count(False) / len(self._outcomes)
+
+    def stats(self):
+        p95 = self.p95_latency(min_samples=1)
+        return {
+            "state": self.state,
+            "calls": len(self._outcomes),
+            "error_rate": self.error_rate(),
+            "p95_latency": p95,
+            "consecutive_rate_limits": self.consecutive_rate_limits
+        }
+
+
+class LLMRouter:
+    """
+    Routes chat completions across interchangeable providers
+
+    Providers are tried in order, skipping those whose circuit is open.
+    A failed call fails over to the next provider. With hedging enabled,
+    a second request is sent to the next provider once the first has run
+    longer than its p95 latency, and whichever succeeds first is used.
+    """
+
+    def __init__(self, providers, hedge=LLM_HEDGE_ENABLED, hedge_min_samples=LLM_HEDGE_MIN_SAMPLES,
+                 max_workers=LLM_ROUTER_MAX_WORKERS):
+        self.providers = list(providers)
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.max_workers = max_workers
+        self.hedged_requests = 0
+        self.hedge_wins = 0
+
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _get_executor(self):
+        # Worker threads do not survive a fork, so build a pool per process
+        pid = os.getpid()
+        with self._lock:
+            if self._executor is None or self._pid != pid:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm")
+                self._pid = pid
+            return self._executor
+
+    def _call(self, provider, args):
+        start = time.perf_counter()
+        try:
+            result = provider.generate(*args)
+        except Exception as e:
+            provider.record_failure(e)
+            metrics.observe_llm(provider.name, _outcome(e), time.perf_counter() - start)
+            raise
+        elapsed = time.perf_counter() - start
+        provider.record_success(elapsed)
+        metrics.observe_llm(provider.name, "success", elapsed)
+        return result
+
+    def generate(self, *args):
+        """
+        Generate a response from the first provider that succeeds
+
+        Args:
+            *args: Arguments for the providers' generate functions
+
+        Returns:
+            tuple: (response text, provider name)
+        """
+        # Circuits are checked only when a provider is about to be called, so
+        # a half-open trial slot is never claimed without being used
+        candidates = iter(self.providers)
+
+        def next_available():
+            for provider in candidates:
+                if provider.allow_request():
+                    return provider
+            return None
+
+        executor = self._get_executor()
+        last_error = None
+        primary = next_available()
+        while primary is not None:
+            futures = {executor.submit(self._call, primary, args): primary}
+
+            hedge_after = primary.p95_latency(self.hedge_min_samples) if self.hedge else None
+            if hedge_after is not None:
+                done, _ = wait(futures, timeout=hedge_after)
+                if not done:
+                    secondary = next_available()
+                    if secondary is not None:
+                        futures[executor.submit(self._call, secondary, args)] = secondary
+                        self._count("hedged_requests")
+
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        last_error = e
+                        continue
+                    if futures[future] is not primary:
+                        self._count("hedge_wins")
+                    return result, futures[future].name
+
+            primary = next_available()
+
+        raise last_error or NoProviderAvailable("All LLM providers are unavailable")
+
+    def stream(self, *args):
+        """
+        Stream a response, failing over only until the first chunk is produced
+
+        Args:
+            *args: Arguments for the providers' stream functions
+
+        Yields:
+            str: Response text chunks
+        """
+        last_error = None
+        for provider in self.providers:
+            if provider.stream is None or not provider.allow_request():
+                continue
+            produced = False
+            start = time.perf_counter()
+            try:
+                for chunk in provider.stream(*args):
+                    produced = True
+                    yield chunk
+            except GeneratorExit:
+                # Client went away mid-stream; free a half-open trial slot
+                provider.release()
+                raise
+            except Exception as e:
+                provider.record_failure(e)
+                metrics.observe_llm(provider.name, _outcome(e), time.perf_counter() - start)
+                if produced:
+                    raise
+                last_error = e
+                continue
+            # Streaming latency is not comparable with full generations, so only the outcome is recorded
+            provider.record_success()
+            metrics.observe_llm(provider.name, "success", time.perf_counter() - start)
+            return
+
+        raise last_error or NoProviderAvailable("All LLM providers are unavailable")
+
+    def stats(self):
+        """
+        Get per-provider statistics and hedging counters
+
+        Returns:
+            dict: Router statistics
+        """
+        return {
+            "providers": {provider.name: provider.stats() for provider in self.providers},
+            "hedged_requests": self.hedged_requests,
+            "hedge_wins": self.hedge_wins
+        }
+
+
+def _configured_providers():
+    providers = []
+    for name in LLM_PROVIDERS:
+        if name == "gemini":
+            from utils import gemini_helper
+            if gemini_helper.GEMINI_API_KEY:
+                providers.append(Provider("gemini", gemini_helper.generate_response, gemini_helper.stream_response))
+        elif name == "openai":
+            from utils import openai_helper
+            if openai_helper.OPENAI_API_KEY:
+                providers.append(Provider("openai", openai_helper.generate_response, openai_helper.stream_response))
+
+    if not providers:
+        # Nothing configured: keep Gemini so the missing-key reply is shown
+        from utils import gemini_helper
+        providers.append(Provider("gemini", gemini_helper.generate_response, gemini_helper.stream_response))
+    return providers
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """Get the process-wide router built from configuration"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = LLMRouter(_configured_providers())
+    return _router
+
+
+def set_router(router):
+    """Replace the process-wide router (e.g. with stub providers)"""
+    global _router
+    _router = router
+
+
+def _failure_response(error, emotion):
+    if isinstance(error, NoProviderAvailable):
+        return RATE_LIMIT_RESPONSE
+    return error_response(str(error), emotion)
+
+
+def get_ai_response(user_message, emotion, relevant_resources, crisis_detected=False, crisis_level=0, history=None):
+    """
+    Generate an AI response through the provider router
+
+    Args:
+        user_message (str): The user's message
+        emotion (str): Detected emotion in the message
+        relevant_resources (list): List of relevant therapy resources
+        crisis_detected (bool): Whether a crisis was detected
+        crisis_level (int): Level of crisis (0-10)
+        history (ConversationHistory): Earlier conversation, or None
+
+    Returns:
+        str: AI response
+    """
+    try:
+        response, _ = get_router().generate(user_message, emotion, relevant_resources, crisis_detected, crisis_level, history)
+        return response
+    except Exception as e:
+        logger.exception("Error getting AI response")
+        return _failure_response(e, emotion)
+
+
+def stream_ai_response(user_message, emotion, relevant_resources, crisis_detected=False, crisis_level=0, history=None):
+    """
+    Generate an AI response through the provider router, yielding text as it is produced
+
+    Args:
+        user_message (str): The user's message
+        emotion (str): Detected emotion in the message
+        relevant_resources (list): List of relevant therapy resources
+        crisis_detected (bool): Whether a crisis was detected
+        crisis_level (int): Level of crisis (0-10)
+        history (ConversationHistory): Earlier conversation, or None
+
+    Yields:
+        str: Response text chunks
+    """
+    produced = False
+    try:
+        for chunk in get_router().stream(user_message, emotion, relevant_resources, crisis_detected, crisis_level, history):
+            produced = True
+            yield chunk
+    except Exception as e:
+        logger.exception("Error streaming AI response")
+        # A reply that already started streaming is kept as is
+        if not produced:
+            yield _failure_response(e, emotion)
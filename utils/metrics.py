@@ -0,0 +1,201 @@
+import os
+import time
+import threading
+from bisect import bisect_left
+from contextlib import nullcontext
+
+from flask import request, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Set METRICS=0 to turn instrumentation off; no hooks are installed and /metrics is not served
+METRICS_ENABLED = os.environ.get("METRICS", "1") != "0"
+
+# Upper bounds (seconds) for latency histograms
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Upper bounds for SQL statements per request
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_NO_STAGE = nullcontext()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+class Histogram:
+    """A Prometheus histogram with a fixed set of labels"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._series = {}  # label values -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, (list(counts), total, count)) for labels, (counts, total, count) in self._series.items())
+        for labels, (counts, total, count) in series:
+            label_text = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels))
+            prefix = label_text + "," if label_text else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{_format_bound(bound)}"}} {cumulative}')
+            suffix = f"{{{label_text}}}" if label_text else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return "\n".join(lines)
+
+
+class Metrics:
+    """
+    Request, chat stage, SQL and LLM timings, served in Prometheus text format at /metrics
+
+    Histograms are kept per process; with several gunicorn workers each
+    scrape sees the worker that answered it.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = METRICS_ENABLED
+
+        self.request_seconds = Histogram(
+            "http_request_duration_seconds", "Time to handle a request", ("endpoint", "method", "status"))
+        self.stage_seconds = Histogram(
+            "chat_stage_duration_seconds", "Time spent in each stage of a chat turn", ("stage",))
+        self.query_seconds = Histogram(
+            "db_query_duration_seconds", "Time to execute one SQL statement")
+        self.request_queries = Histogram(
+            "db_queries_per_request", "SQL statements executed while handling a request", ("endpoint",),
+            buckets=QUERY_COUNT_BUCKETS)
+        self.request_query_seconds = Histogram(
+            "db_query_seconds_per_request", "Total SQL time while handling a request", ("endpoint",))
+        self.llm_seconds = Histogram(
+            "llm_request_duration_seconds", "Time for one LLM provider call", ("provider", "outcome"))
+        self.admission_seconds = Histogram(
+            "chat_admission_wait_seconds", "Time a chat message waited to be admitted or turned away",
+            ("lane", "outcome"))
+        self.histograms = [
+            self.request_seconds, self.stage_seconds, self.query_seconds,
+            self.request_queries, self.request_query_seconds, self.llm_seconds, self.admission_seconds
+        ]
+
+        # Per-thread counters for the request being handled; statements run
+        # inside a nested app context (e.g. a synchronous write-behind commit) still count
+        self._request = threading.local()
+        self._listening = False
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get("METRICS_ENABLED", self.enabled)
+        if not self.enabled:
+            return
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule("/metrics", "metrics", self._serve)
+        # The listeners apply to every engine, so they are added once however many apps are created
+        if not self._listening:
+            event.listen(Engine, "before_cursor_execute", self._start_query)
+            event.listen(Engine, "after_cursor_execute", self._finish_query)
+            self._listening = True
+
+    def stage(self, name):
+        """
+        Time a stage of a chat turn
+
+        Args:
+            name (str): Stage name, used as the "stage" label
+
+        Returns:
+            Context manager timing the block, or a shared no-op one when disabled
+        """
+        if not self.enabled:
+            return _NO_STAGE
+        return _Stage(self.stage_seconds, name)
+
+    def observe_llm(self, provider, outcome, seconds):
+        """Record one LLM call by provider and outcome ("success", "error" or "rate_limited")"""
+        if self.enabled:
+            self.llm_seconds.observe(seconds, provider, outcome)
+
+    def observe_admission(self, lane, outcome, seconds):
+        """Record one admission decision by lane and outcome ("admitted", "rate_limited" or "overloaded")"""
+        if self.enabled:
+            self.admission_seconds.observe(seconds, lane, outcome)
+
+    def render(self):
+        return "\n".join(histogram.render() for histogram in self.histograms) + "\n"
+
+    def _serve(self):
+        return Response(self.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+    def _start_request(self):
+        current = self._request
+        current.start = time.perf_counter()
+        current.queries = 0
+        current.query_seconds = 0.0
+
+    def _finish_request(self, response):
+        current = self._request
+        start = getattr(current, "start", None)
+        if start is not None:
+            current.start = None
+            # Unmatched URLs share one label so scanners cannot grow the series without bound
+            endpoint = request.endpoint or "unmatched"
+            self.request_seconds.observe(time.perf_counter() - start, endpoint, request.method, response.status_code)
+            self.request_queries.observe(current.queries, endpoint)
+            self.request_query_seconds.observe(current.query_seconds, endpoint)
+        return response
+
+    def _start_query(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    def _finish_query(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        self.query_seconds.observe(elapsed)
+        # Statements run by background threads (e.g. the write-behind worker) have no request to charge
+        current = self._request
+        if getattr(current, "start", None) is not None:
+            current.queries += 1
+            current.query_seconds += elapsed
+
+
+class _Stage:
+    __slots__ = ("histogram", "name", "start")
+
+    def __init__(self, histogram, name):
+        self.histogram = histogram
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, self.name)
+        return False
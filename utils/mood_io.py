@@ -0,0 +1,149 @@
+import os
+import csv
+import io
+import json
+import math
+from datetime import datetime, timezone
+
+from extensions import db
+from models import EmotionRecord, DailyEmotionRollup
+
+# Largest number of records accepted by one bulk import request
+MOOD_BULK_MAX_RECORDS = int(os.environ.get("MOOD_BULK_MAX_RECORDS", 5000))
+# Rows fetched from the database cursor at a time while exporting
+MOOD_EXPORT_BATCH_SIZE = 1000
+
+EXPORT_COLUMNS = ["id", "emotion", "intensity", "created_at"]
+
+
+class MoodValidationError(ValueError):
+    """A mood record failed validation; the message is shown to the client"""
+
+
+def validate_mood(data, allow_timestamp=False):
+    """
+    Validate one mood record from a request body
+
+    Args:
+        data (dict): Record with "emotion", optional "intensity" (0-1, default 1.0)
+            and, when allow_timestamp is set, optional ISO 8601 "created_at"
+        allow_timestamp (bool): Accept a client-supplied created_at (offline logs)
+
+    Returns:
+        dict: Column values for an EmotionRecord, without user_id
+
+    Raises:
+        MoodValidationError: If the record is invalid
+    """
+    if not isinstance(data, dict):
+        raise MoodValidationError('Record must be an object')
+
+    emotion = data.get('emotion')
+    if not emotion or not isinstance(emotion, str):
+        raise MoodValidationError('Emotion is required')
+    if len(emotion) > 50:
+        raise MoodValidationError('Emotion must be at most 50 characters')
+
+    # Validate intensity is between 0 and 1
+    try:
+        intensity = float(data.get('intensity', 1.0))
+    except (TypeError, ValueError):
+        raise MoodValidationError('Intensity must be a number')
+    # NaN compares false against both bounds, so it is rejected explicitly
+    if not math.isfinite(intensity):
+        raise MoodValidationError('Intensity must be a number')
+    if intensity < 0 or intensity > 1:
+        raise MoodValidationError('Intensity must be between 0 and 1')
+
+    created_at = datetime.utcnow()
+    if allow_timestamp and data.get('created_at') is not None:
+        try:
+            created_at = datetime.fromisoformat(str(data['created_at']).replace('Z', '+00:00'))
+        except ValueError:
+            raise MoodValidationError('created_at must be an ISO 8601 timestamp')
+        # Stored timestamps are naive UTC
+        if created_at.tzinfo is not None:
+            created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+    return {'emotion': emotion, 'intensity': intensity, 'created_at': created_at}
+
+
+def insert_moods(user_id, records):
+    """
+    Insert many validated mood records in one transaction
+
+    Rows go through a single executemany INSERT rather than the ORM, so
+    the daily rollup is updated here in the same transaction.
+
+    Args:
+        user_id (int): Owner of the records
+        records (list): Values returned by validate_mood
+    """
+    rows = [dict(record, user_id=user_id) for record in records]
+    try:
+        connection = db.session.connection()
+        connection.execute(EmotionRecord.__table__.insert(), rows)
+        DailyEmotionRollup.add_records(connection, rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def export_rows(user_id, since=None):
+    """
+    Stream a user's emotion records, oldest first, without loading them all
+
+    Uses a server-side cursor where the database supports one.
+
+    Args:
+        user_id (int): Owner of the records
+        since (datetime): Only records created at or after this time
+
+    Yields:
+        tuple: (id, emotion, intensity, created_at)
+    """
+    table = EmotionRecord.__table__
+    query = db.select(table.c.id, table.c.emotion, table.c.intensity, table.c.created_at).where(
+        table.c.user_id == user_id
+    )
+    if since is not None:
+        query = query.where(table.c.created_at >= since)
+    query = query.order_by(table.c.created_at, table.c.id)
+
+    with db.engine.connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=MOOD_EXPORT_BATCH_SIZE).execute(query)
+        for partition in result.partitions():
+            yield from partition
+
+
+def ndjson_lines(rows):
+    """Format exported rows as newline-delimited JSON, one batch of lines per chunk"""
+    lines = []
+    for record_id, emotion, intensity, created_at in rows:
+        lines.append(json.dumps({
+            'id': record_id,
+            'emotion': emotion,
+            'intensity': intensity,
+            'created_at': created_at.isoformat()
+        }) + '\n')
+        if len(lines) >= MOOD_EXPORT_BATCH_SIZE:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def csv_lines(rows):
+    """Format exported rows as CSV with a header, one batch of lines per chunk"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for count, (record_id, emotion, intensity, created_at) in enumerate(rows, start=1):
+        writer.writerow([record_id, emotion, intensity, created_at.isoformat()])
+        if count % MOOD_EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,112 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Werkzeug hash method for new hashes, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000".
+# Existing hashes made with other parameters are upgraded at the user's next login.
+PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+PASSWORD_SALT_LENGTH = int(os.environ.get("PASSWORD_SALT_LENGTH", 16))
+# Threads per process that hash passwords; 0 hashes on the request thread.
+# hashlib releases the GIL, so this caps the CPU logins can take from other requests.
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+# Hashes allowed to wait for a free worker before further logins are turned away
+PASSWORD_HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", 32))
+
+
+class PasswordHasherBusy(Exception):
+    """Too many password hashes are already queued in this process"""
+
+
+_executor = None
+_slots = None
+_pid = None
+_lock = threading.Lock()
+
+
+def _get_pool():
+    global _executor, _slots, _pid
+    # Worker threads do not survive a fork, so build a pool per process
+    pid = os.getpid()
+    with _lock:
+        if _executor is None or _pid != pid:
+            _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password")
+            _slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE)
+            _pid = pid
+        return _executor, _slots
+
+
+def _run(function, *args):
+    if PASSWORD_HASH_WORKERS <= 0:
+        return function(*args)
+
+    executor, slots = _get_pool()
+    if not slots.acquire(blocking=False):
+        raise PasswordHasherBusy()
+    try:
+        future = executor.submit(function, *args)
+    except Exception:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future.result()
+
+
+@lru_cache(maxsize=1)
+def _current_prefix():
+    # Werkzeug fills in default parameters ("pbkdf2:sha256" becomes "pbkdf2:sha256:1000000"),
+    # so take the prefix from a real hash rather than the configured string
+    return generate_password_hash("", PASSWORD_HASH_METHOD, 1).split("$", 1)[0]
+
+
+def needs_rehash(pwhash):
+    """Check if a stored hash was made with parameters other than the configured ones"""
+    return pwhash.split("$", 1)[0] != _current_prefix()
+
+
+def _generate(password):
+    return generate_password_hash(password, PASSWORD_HASH_METHOD, PASSWORD_SALT_LENGTH)
+
+
+def _verify(pwhash, password):
+    if not check_password_hash(pwhash, password):
+        return False, None
+    if needs_rehash(pwhash):
+        return True, _generate(password)
+    return True, None
+
+
+def hash_password(password):
+    """
+    Hash a password with the configured method on the hashing pool
+
+    Args:
+        password (str): Plain-text password
+
+    Returns:
+        str: Werkzeug password hash
+
+    Raises:
+        PasswordHasherBusy: If the hashing pool's queue is full
+    """
+    return _run(_generate, password)
+
+
+def verify_password(pwhash, password):
+    """
+    Check a password on the hashing pool, rehashing it if the parameters changed
+
+    Args:
+        pwhash (str): Stored werkzeug password hash
+        password (str): Plain-text password to check
+
+    Returns:
+        tuple: (valid, new_hash) where new_hash is a replacement hash to
+            store, or None if the stored one is current or the password is wrong
+
+    Raises:
+        PasswordHasherBusy: If the hashing pool's queue is full
+    """
+    return _run(_verify, pwhash, password)
@@ -0,0 +1,141 @@
+from functools import lru_cache
+
+from utils.emotion_detection import EMOTIONS
+
+# Static instructions shared by every request. Kept first and byte-identical
+# so provider-side prompt caching can reuse the prefix across users.
+SYSTEM_PROMPT = """
+    You are an AI-powered mental health assistant designed to provide supportive conversations and coping strategies.
+    You are not a replacement for a licensed therapist but can offer evidence-based techniques and empathetic responses.
+    Always prioritize user safety and well-being. Be empathetic, warm, and conversational in your tone.
+
+    When responding:
+    1. Acknowledge the user's emotions with empathy
+    2. Provide evidence-based coping strategies when appropriate
+    3. Encourage healthy behaviors and thought patterns
+    4. Never diagnose medical conditions or prescribe medications
+    5. If a user appears to be in crisis, provide crisis resources and encourage professional help
+
+    The user's detected emotion in this message is: """
+
+CRISIS_INSTRUCTIONS = """
+        IMPORTANT: Crisis detected (level: {crisis_level}/10).
+        Prioritize safety and provide appropriate crisis resources.
+        Be direct yet compassionate about the importance of seeking immediate help.
+        Include the National Suicide Prevention Lifeline (988) and Crisis Text Line (text HOME to 741741).
+        """
+
+RESOURCES_HEADER = "Here are some relevant therapeutic approaches that might help:\n"
+SUMMARY_HEADER = "Summary of the earlier conversation:\n"
+HISTORY_HEADER = "Recent conversation:\n"
+ROLE_LABELS = {"user": "User", "assistant": "Assistant"}
+
+# Crisis levels detect_crisis can report; 0 means no crisis
+CRISIS_LEVELS = range(0, 11)
+
+
+@lru_cache(maxsize=512)
+def system_prompt(emotion, crisis_level=0):
+    """
+    Get the system prompt for an (emotion, crisis level) pair, built once
+
+    Args:
+        emotion (str): Detected emotion in the message
+        crisis_level (int): Level of crisis (0-10), 0 if none was detected
+
+    Returns:
+        str: System prompt text
+    """
+    parts = [SYSTEM_PROMPT, str(emotion), "\n    "]
+    if crisis_level:
+        parts.append(CRISIS_INSTRUCTIONS.format(crisis_level=crisis_level))
+    return "".join(parts)
+
+
+def warm_prompt_cache():
+    """Precompute the system prompt for every detectable emotion and crisis level"""
+    for emotion in EMOTIONS:
+        for crisis_level in CRISIS_LEVELS:
+            system_prompt(emotion, crisis_level)
+
+
+def resources_context(relevant_resources):
+    """Format therapy resources as prompt context"""
+    if not relevant_resources:
+        return ""
+    return RESOURCES_HEADER + "".join(
+        [f"- {resource['title']}: {resource['summary']}\n" for resource in relevant_resources]
+    )
+
+
+def summary_context(history):
+    """Format a conversation summary as prompt context"""
+    if history is None or not history.summary:
+        return ""
+    return SUMMARY_HEADER + history.summary + "\n"
+
+
+def history_context(history):
+    """Format a conversation summary and recent turns as a single prompt block"""
+    if history is None:
+        return ""
+    parts = [summary_context(history)]
+    if history.turns:
+        parts.append(HISTORY_HEADER)
+        parts.extend([f"{ROLE_LABELS[role]}: {text}\n" for role, text in history.turns])
+    return "".join(parts)
+
+
+def _crisis_tier(crisis_detected, crisis_level):
+    return crisis_level if crisis_detected else 0
+
+
+def build_prompt(user_message, emotion, relevant_resources, crisis_detected=False, crisis_level=0, history=None):
+    """
+    Build a single-string prompt (Gemini)
+
+    Args:
+        user_message (str): The user's message
+        emotion (str): Detected emotion in the message
+        relevant_resources (list): List of relevant therapy resources
+        crisis_detected (bool): Whether a crisis was detected
+        crisis_level (int): Level of crisis (0-10)
+        history (ConversationHistory): Earlier conversation, or None
+
+    Returns:
+        str: Prompt text
+    """
+    return "".join([
+        system_prompt(emotion, _crisis_tier(crisis_detected, crisis_level)),
+        "\n\n",
+        resources_context(relevant_resources),
+        "\n\n",
+        history_context(history),
+        "User message: ",
+        user_message
+    ])
+
+
+def build_messages(user_message, emotion, relevant_resources, crisis_detected=False, crisis_level=0, history=None):
+    """
+    Build a chat-completions message list (OpenAI)
+
+    Args:
+        user_message (str): The user's message
+        emotion (str): Detected emotion in the message
+        relevant_resources (list): List of relevant therapy resources
+        crisis_detected (bool): Whether a crisis was detected
+        crisis_level (int): Level of crisis (0-10)
+        history (ConversationHistory): Earlier conversation, or None
+
+    Returns:
+        list: Chat messages
+    """
+    messages = [{"role": "system", "content": system_prompt(emotion, _crisis_tier(crisis_detected, crisis_level))}]
+    if history is not None:
+        if history.summary:
+            messages.append({"role": "system", "content": summary_context(history)})
+        messages.extend({"role": role, "content": text} for role, text in history.turns)
+    messages.append({"role": "user", "content": user_message})
+    messages.append({"role": "system", "content": resources_context(relevant_resources)})
+    return messages
@@ -1,124 +1,250 @@
 import os
 import json
+import logging
+import threading
 from pathlib import Path
 
+from utils.emotion_detection import EMOTIONS
+from utils.retrieval import load_or_build_index
+
+logger = logging.getLogger(__name__)
+
+THERAPY_DOCS_PATH = Path(__file__).parent.parent / "data" / "therapy_documents.json"
+THERAPY_INDEX_PATH = Path(__file__).parent.parent / "data" / "therapy_index.npz"
+
+# Corpus vocabulary for each detected emotion, added to the retrieval query
+EMOTION_QUERY_TERMS = {
+    "angry": "anger",
+    "anxious": "anxiety worry",
+    "depressed": "depression",
+    "fearful": "fear anxiety",
+    "happy": "happiness well-being",
+    "sad": "sadness grief",
+    "stressed": "stress",
+    "calm": "relaxation mindfulness",
+    "hopeful": "hope optimism"
+}
+
+# Fallback resources by emotion
+FALLBACK_RESOURCES = {
+    "anxious": [
+        {
+            "title": "Deep Breathing Exercise",
+            "summary": "Breathe in slowly for 4 counts, hold for 2, exhale for 6. Repeat 5-10 times to activate the parasympathetic nervous system."
+        },
+        {
+            "title": "Grounding Technique",
+            "summary": "Use the 5-4-3-2-1 technique: identify 5 things you see, 4 things you can touch, 3 things you hear, 2 things you smell, and 1 thing you taste."
+        }
+    ],
+    "sad": [
+        {
+            "title": "Behavioral Activation",
+            "summary": "Schedule small, achievable positive activities throughout your day, even when you don't feel motivated."
+        },
+        {
+            "title": "Self-Compassion Practice",
+            "summary": "Speak to yourself as you would to a good friend who is going through a difficult time."
+        }
+    ],
+    "angry": [
+        {
+            "title": "Time-Out Strategy",
+            "summary": "When feeling overwhelmed with anger, take a break for 10-20 minutes before responding."
+        },
+        {
+            "title": "Cognitive Reframing",
+            "summary": "Challenge thoughts like 'they always' or 'they never' with more balanced perspectives."
+        }
+    ],
+    "depressed": [
+        {
+            "title": "Small Goals Approach",
+            "summary": "Break tasks into the smallest possible steps and celebrate completing each one."
+        },
+        {
+            "title": "Thought Record",
+            "summary": "Write down negative thoughts, identify the cognitive distortion, and create a more balanced thought."
+        }
+    ],
+    "stressed": [
+        {
+            "title": "Progressive Muscle Relaxation",
+            "summary": "Tense and then release each muscle group from toes to head to reduce physical tension."
+        },
+        {
+            "title": "Mindful Focus Exercise",
+            "summary": "Focus completely on one simple task like washing dishes, bringing attention back whenever your mind wanders."
+        }
+    ],
+    "fearful": [
+        {
+            "title": "Exposure Hierarchy",
+            "summary": "Create a ladder of feared situations from least to most anxiety-provoking, and gradually expose yourself to each level."
+        },
+        {
+            "title": "Worry Time",
+            "summary": "Schedule 15-30 minutes daily to focus on worries, postponing worry thoughts outside of this time."
+        }
+    ]
+}
+
+# Default resources for other emotions
+DEFAULT_RESOURCES = [
+    {
+        "title": "Mindfulness Meditation",
+        "summary": "Focus on your breath for 5 minutes, gently returning attention whenever your mind wanders."
+    },
+    {
+        "title": "Gratitude Practice",
+        "summary": "Write down three things you're grateful for each day to shift focus toward positive aspects of life."
+    }
+]
+
+
+class TherapyDocumentIndex:
+    """
+    In-memory view of therapy_documents.json with an inverted index
+    from emotion and keyword terms to document positions
+    """
+
+    def __init__(self, documents, mtime=None, retriever=None):
+        self.mtime = mtime
+        self.retriever = retriever
+        self.resources = []
+        self._search_text = []
+        self.postings = {}
+
+        for position, doc in enumerate(documents):
+            self.resources.append({
+                "title": doc.get("title", ""),
+                "summary": doc.get("summary", "")
+            })
+            self._search_text.append((doc.get("title", "").lower(), doc.get("content", "").lower()))
+
+            for keyword in doc.get("keywords", []):
+                term_postings = self.postings.setdefault(keyword.lower(), [])
+                if not term_postings or term_postings[-1] != position:
+                    term_postings.append(position)
+
+        # Emotion terms match anywhere in the title or content, so resolve them up front
+        for emotion in EMOTIONS:
+            self.postings[emotion] = self._scan(emotion)
+
+    def _scan(self, term):
+        return [
+            position for position, (title, content) in enumerate(self._search_text)
+            if term in title or term in content
+        ]
+
+    def lookup(self, term, limit=3):
+        """
+        Get the resources indexed under a term
+
+        Args:
+            term (str): Emotion or keyword term
+            limit (int): Maximum number of resources to return
+
+        Returns:
+            list: Matching resources in document order
+        """
+        term = term.lower()
+        positions = self.postings.get(term)
+        if positions is None:
+            # Unseen terms are resolved once and then served from the index
+            positions = self._scan(term)
+            self.postings[term] = positions
+
+        return [self.resources[position] for position in positions[:limit]]
+
+    def search(self, query, top_k=3):
+        """
+        Rank resources against free text with the BM25 retriever
+
+        Args:
+            query (str): Query text
+            top_k (int): Number of resources to return
+
+        Returns:
+            list: Best matching resources, empty if nothing matched
+        """
+        if self.retriever is None:
+            return []
+        return [self.resources[position] for position in self.retriever.search(query, top_k)]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_document_index():
+    """
+    Get the therapy document index, loading it on first use and
+    reloading only when the documents file changes on disk
+
+    Returns:
+        TherapyDocumentIndex: The current index, or None if the file is missing
+    """
+    global _index
+
+    try:
+        mtime = os.stat(THERAPY_DOCS_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    index = _index
+    if index is not None and index.mtime == mtime:
+        return index
+
+    with _index_lock:
+        if _index is None or _index.mtime != mtime:
+            raw_bytes = THERAPY_DOCS_PATH.read_bytes()
+            documents = json.loads(raw_bytes)
+            retriever = load_or_build_index(documents, raw_bytes, THERAPY_INDEX_PATH)
+            _index = TherapyDocumentIndex(documents, mtime, retriever)
+        return _index
+
+
 def get_therapy_resources(text, emotion, top_k=3):
     """
-    Get relevant therapy resources based on emotion
-    
+    Get relevant therapy resources based on the message text and emotion
+
     Args:
         text (str): User query text
         emotion (str): Detected emotion
         top_k (int): Number of resources to return
-        
+
     Returns:
         list: List of relevant therapy resources
     """
-    return fallback_resources(emotion)
+    try:
+        index = get_document_index()
+
+        if index is not None:
+            query = f"{text} {emotion or ''} {EMOTION_QUERY_TERMS.get(emotion, '')}"
+            resources = index.search(query, top_k)
+            if resources:
+                return resources
+    except Exception:
+        logger.exception("Error searching therapy documents")
+
+    return fallback_resources(emotion)[:top_k]
 
 def fallback_resources(emotion):
     """Return resources based on emotion"""
-    # First try to load from therapy_documents.json if it exists
+    # First try the therapy_documents.json index if it exists
     try:
-        therapy_docs_path = Path(__file__).parent.parent / "data" / "therapy_documents.json"
-        
-        if therapy_docs_path.exists():
-            with open(therapy_docs_path, 'r') as f:
-                all_docs = json.load(f)
-                
-            # Simple keyword matching for demo
-            if emotion:
-                emotion_docs = []
-                for doc in all_docs:
-                    if emotion.lower() in doc.get("title", "").lower() or emotion.lower() in doc.get("content", "").lower():
-                        emotion_docs.append({
-                            "title": doc.get("title", ""),
-                            "summary": doc.get("summary", "")
-                        })
-                        if len(emotion_docs) >= 3:
-                            break
-                
-                if emotion_docs:
-                    return emotion_docs
-    except Exception as e:
-        print(f"Error loading therapy documents: {e}")
-    
-    # Fallback resources by emotion
-    resources_by_emotion = {
-        "anxious": [
-            {
-                "title": "Deep Breathing Exercise",
-                "summary": "Breathe in slowly for 4 counts, hold for 2, exhale for 6. Repeat 5-10 times to activate the parasympathetic nervous system."
-            },
-            {
-                "title": "Grounding Technique",
-                "summary": "Use the 5-4-3-2-1 technique: identify 5 things you see, 4 things you can touch, 3 things you hear, 2 things you smell, and 1 thing you taste."
-            }
-        ],
-        "sad": [
-            {
-                "title": "Behavioral Activation",
-                "summary": "Schedule small, achievable positive activities throughout your day, even when you don't feel motivated."
-            },
-            {
-                "title": "Self-Compassion Practice",
-                "summary": "Speak to yourself as you would to a good friend who is going through a difficult time."
-            }
-        ],
-        "angry": [
-            {
-                "title": "Time-Out Strategy",
-                "summary": "When feeling overwhelmed with anger, take a break for 10-20 minutes before responding."
-            },
-            {
-                "title": "Cognitive Reframing",
-                "summary": "Challenge thoughts like 'they always' or 'they never' with more balanced perspectives."
-            }
-        ],
-        "depressed": [
-            {
-                "title": "Small Goals Approach",
-                "summary": "Break tasks into the smallest possible steps and celebrate completing each one."
-            },
-            {
-                "title": "Thought Record",
-                "summary": "Write down negative thoughts, identify the cognitive distortion, and create a more balanced thought."
-            }
-        ],
-        "stressed": [
-            {
-                "title": "Progressive Muscle Relaxation",
-                "summary": "Tense and then release each muscle group from toes to head to reduce physical tension."
-            },
-            {
-                "title": "Mindful Focus Exercise",
-                "summary": "Focus completely on one simple task like washing dishes, bringing attention back whenever your mind wanders."
-            }
-        ],
-        "fearful": [
-            {
-                "title": "Exposure Hierarchy",
-                "summary": "Create a ladder of feared situations from least to most anxiety-provoking, and gradually expose yourself to each level."
-            },
-            {
-                "title": "Worry Time",
-                "summary": "Schedule 15-30 minutes daily to focus on worries, postponing worry thoughts outside of this time."
-            }
-        ]
-    }
-    
+        index = get_document_index()
+
+        if index is not None and emotion:
+            emotion_docs = index.lookup(emotion, limit=3)
+            if emotion_docs:
+                return emotion_docs
+    except Exception:
+        logger.exception("Error loading therapy documents")
+
     # Return emotion-specific resources or general ones
-    if emotion in resources_by_emotion:
-        return resources_by_emotion[emotion]
+    if emotion in FALLBACK_RESOURCES:
+        return FALLBACK_RESOURCES[emotion]
     else:
-        # Default resources for other emotions
-        return [
-            {
-                "title": "Mindfulness Meditation",
-                "summary": "Focus on your breath for 5 minutes, gently returning attention whenever your mind wanders."
-            },
-            {
-                "title": "Gratitude Practice",
-                "summary": "Write down three things you're grateful for each day to shift focus toward positive aspects of life."
-            }
-        ]
+        return DEFAULT_RESOURCES
@@ -0,0 +1,227 @@
+import os
+import json
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import and_, bindparam, func, or_, select
+
+from utils.crisis_detection import detect_crisis_batch
+from utils.emotion_detection import detect_emotions_batch
+
+# User messages read, scored and written back per chunk
+RESCORE_CHUNK_SIZE = int(os.environ.get("RESCORE_CHUNK_SIZE", 5000))
+# Scoring processes; 0 scores in the command's own process
+RESCORE_WORKERS = int(os.environ.get("RESCORE_WORKERS", os.cpu_count() or 1))
+# Chunks handed to the pool ahead of the one being written, per worker
+RESCORE_PREFETCH = 2
+
+
+def score_messages(texts):
+    """
+    Run the emotion and crisis detectors over a chunk of messages
+
+    Args:
+        texts (list): Message contents
+
+    Returns:
+        list: (emotion, intensity, crisis_level) per message
+    """
+    return [
+        (emotion, intensity, crisis_level)
+        for (emotion, intensity), (_, crisis_level) in zip(detect_emotions_batch(texts), detect_crisis_batch(texts))
+    ]
+
+
+def _load_checkpoint(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _save_checkpoint(path, state):
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f)
+    os.replace(path + ".tmp", path)
+
+
+def _match_records(connection, rows, next_message, record_window):
+    """
+    Pair each message in a chunk with the EmotionRecord saved for it
+
+    Messages stored before chat turns were written together carry their
+    own timestamp, with the record a little later (it was committed with
+    the reply), so timestamps are not matched exactly: a message takes the
+    earliest unclaimed record of the same user from its own created_at up
+    to that user's next message.
+
+    Returns:
+        dict: Message id -> EmotionRecord id, for the messages that have one
+    """
+    by_user = defaultdict(list)
+    for row in rows:
+        by_user[row.user_id].append(row)
+
+    matches = {}
+    for user_id, user_rows in by_user.items():
+        user_rows.sort(key=lambda row: (row.created_at, row.id))
+        last_at = user_rows[-1].created_at
+        end = connection.execute(next_message, {"user_id": user_id, "after_at": last_at}).scalar()
+        found = connection.execute(record_window, {
+            "user_id": user_id, "lo": user_rows[0].created_at, "hi": end or datetime.max
+        }).all()
+
+        position = 0
+        for index, row in enumerate(user_rows):
+            # The window closes at the next message with a later timestamp
+            window_end = next((later.created_at for later in user_rows[index + 1:]
+                               if later.created_at > row.created_at), end)
+            while position < len(found) and found[position].created_at < row.created_at:
+                position += 1
+            if position < len(found) and (window_end is None or found[position].created_at < window_end):
+                matches[row.id] = found[position].id
+                position += 1
+    return matches
+
+
+def rescore_messages(engine, checkpoint_path, chunk_size=RESCORE_CHUNK_SIZE, workers=RESCORE_WORKERS,
+                     restart=False, on_progress=None):
+    """
+    Recompute emotion and crisis level for every stored user message
+
+    Messages are read in id order, one chunk at a time, and scored in a
+    process pool while earlier chunks are written back. Each chunk is
+    committed with executemany UPDATEs of the ChatMessage rows that
+    changed and of the EmotionRecord saved with each message (see
+    _match_records), then the last id is written to the checkpoint file.
+    An interrupted run continues from there; messages sent after the
+    first run started were scored by the current detectors and are
+    skipped. Memory is bounded by the chunks in flight.
+
+    The daily emotion rollup is rebuilt and the checkpoint removed once
+    every chunk is done.
+
+    Args:
+        engine: SQLAlchemy engine
+        checkpoint_path (str): JSON file recording progress
+        chunk_size (int): Messages per chunk
+        workers (int): Scoring processes, 0 to score inline
+        restart (bool): Ignore an existing checkpoint
+        on_progress (callable): Called with the checkpoint state after each chunk
+
+    Returns:
+        dict: Final state with last_id, max_id, total, processed, changed and seconds
+    """
+    from models import ChatMessage, EmotionRecord, DailyEmotionRollup
+
+    messages = ChatMessage.__table__
+    records = EmotionRecord.__table__
+
+    state = None if restart else _load_checkpoint(checkpoint_path)
+    if state is None:
+        with engine.connect() as connection:
+            max_id = connection.execute(select(func.max(messages.c.id))).scalar() or 0
+            total = connection.execute(
+                select(func.count()).where(messages.c.is_user.is_(True), messages.c.id <= max_id)
+            ).scalar()
+        state = {"last_id": 0, "max_id": max_id, "total": total, "processed": 0, "changed": 0, "seconds": 0.0}
+        _save_checkpoint(checkpoint_path, state)
+
+    read_chunk = (
+        select(messages.c.id, messages.c.user_id, messages.c.created_at, messages.c.content,
+               messages.c.emotion, messages.c.crisis_level)
+        .where(messages.c.is_user.is_(True), messages.c.id > bindparam("after"), messages.c.id <= state["max_id"])
+        .order_by(messages.c.id)
+        .limit(chunk_size)
+    )
+    update_message = (
+        messages.update()
+        .where(messages.c.id == bindparam("b_id"))
+        .values(emotion=bindparam("b_emotion"), crisis_level=bindparam("b_crisis_level"))
+    )
+    next_message = (
+        select(messages.c.created_at)
+        .where(messages.c.user_id == bindparam("user_id"), messages.c.is_user.is_(True),
+               messages.c.created_at > bindparam("after_at"))
+        .order_by(messages.c.created_at)
+        .limit(1)
+    )
+    record_window = (
+        select(records.c.id, records.c.created_at)
+        .where(records.c.user_id == bindparam("user_id"), records.c.created_at >= bindparam("lo"),
+               records.c.created_at < bindparam("hi"))
+        .order_by(records.c.created_at, records.c.id)
+    )
+    # Rows already holding the new values are matched but not rewritten
+    update_record = (
+        records.update()
+        .where(and_(
+            records.c.id == bindparam("b_record_id"),
+            or_(records.c.emotion != bindparam("b_emotion"), records.c.intensity != bindparam("b_intensity")),
+        ))
+        .values(emotion=bindparam("b_emotion"), intensity=bindparam("b_intensity"))
+    )
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+    in_flight = deque()  # (rows, future) in id order
+    after = state["last_id"]
+    exhausted = False
+    started = time.perf_counter() - state["seconds"]
+    try:
+        with engine.connect() as connection:
+            while True:
+                # Keep the pool busy: read ahead until enough chunks are queued
+                while not exhausted and len(in_flight) < max(1, workers) * RESCORE_PREFETCH:
+                    rows = connection.execute(read_chunk, {"after": after}).all()
+                    connection.commit()
+                    if not rows:
+                        exhausted = True
+                        break
+                    after = rows[-1].id
+                    texts = [row.content for row in rows]
+                    if executor is not None:
+                        future = executor.submit(score_messages, texts)
+                    else:
+                        future = Future()
+                        future.set_result(score_messages(texts))
+                    in_flight.append((rows, future))
+                if not in_flight:
+                    break
+
+                rows, future = in_flight.popleft()
+                scores = future.result()
+                changed = [
+                    {"b_id": row.id, "b_emotion": emotion, "b_crisis_level": crisis_level}
+                    for row, (emotion, _, crisis_level) in zip(rows, scores)
+                    if (row.emotion, row.crisis_level) != (emotion, crisis_level)
+                ]
+                with connection.begin():
+                    if changed:
+                        connection.execute(update_message, changed)
+                    matches = _match_records(connection, rows, next_message, record_window)
+                    record_updates = [
+                        {"b_record_id": matches[row.id], "b_emotion": emotion, "b_intensity": intensity}
+                        for row, (emotion, intensity, _) in zip(rows, scores)
+                        if row.id in matches
+                    ]
+                    if record_updates:
+                        connection.execute(update_record, record_updates)
+
+                state["last_id"] = rows[-1].id
+                state["processed"] += len(rows)
+                state["changed"] += len(changed)
+                state["seconds"] = time.perf_counter() - started
+                _save_checkpoint(checkpoint_path, state)
+                if on_progress is not None:
+                    on_progress(state)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    with engine.begin() as connection:
+        DailyEmotionRollup.rebuild(connection)
+    os.remove(checkpoint_path)
+    return state
@@ -0,0 +1,298 @@
+import os
+import re
+import time
+import json
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+# Opt-in: set RESPONSE_CACHE to "memory" (per process) or "sqlite" (shared by workers)
+RESPONSE_CACHE = os.environ.get("RESPONSE_CACHE", "").lower()
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", 3600))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", 1000))
+# Token-set similarity (0-1) at which a cached prompt counts as a near duplicate; 1.0 = exact only
+RESPONSE_CACHE_SIMILARITY = float(os.environ.get("RESPONSE_CACHE_SIMILARITY", 0.85))
+RESPONSE_CACHE_PATH = os.environ.get(
+    "RESPONSE_CACHE_PATH",
+    str(Path(__file__).parent.parent / "instance" / "response_cache.db")
+)
+
+# How many recent entries of a bucket are compared when looking for a near duplicate
+NEAR_DUPLICATE_CANDIDATES = 200
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def normalize_message(message):
+    """Lowercase a message and reduce it to its word tokens"""
+    return " ".join(TOKEN_PATTERN.findall(message.lower()))
+
+
+def similarity(tokens_a, tokens_b):
+    """Jaccard similarity of two token sets"""
+    if not tokens_a and not tokens_b:
+        return 1.0
+    return len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+
+
+class MemoryBackend:
+    """In-process LRU store"""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, min_created):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry["created_at"] < min_created:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry["response"]
+
+    def candidates(self, bucket, min_created, limit):
+        with self._lock:
+            keys = list(self._buckets.get(bucket, ()))[-limit:]
+            results = []
+            for key in reversed(keys):
+                entry = self._entries[key]
+                if entry["created_at"] >= min_created:
+                    results.append((key, entry["tokens"], entry["response"]))
+            return results
+
+    def touch(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+
+    def put(self, key, bucket, tokens, response, now):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {"bucket": bucket, "tokens": tokens, "response": response, "created_at": now}
+            self._buckets.setdefault(bucket, OrderedDict())[key] = None
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        bucket = self._buckets[entry["bucket"]]
+        bucket.pop(key, None)
+        if not bucket:
+            del self._buckets[entry["bucket"]]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """Store in a local SQLite table so every gunicorn worker shares hits"""
+
+    # Trim the table to max_entries once every this many writes
+    EVICT_EVERY = 50
+
+    def __init__(self, path=RESPONSE_CACHE_PATH, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    key TEXT PRIMARY KEY,
+                    bucket TEXT NOT NULL,
+                    tokens TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_response_cache_bucket ON response_cache (bucket, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_response_cache_last_used ON response_cache (last_used)")
+
+    def _connection(self):
+        # Connections are per thread and per process (never reused after fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key, min_created):
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT response FROM response_cache WHERE key = ? AND created_at >= ?",
+            (key, min_created)
+        ).fetchone()
+        if row is None:
+            return None
+        self.touch(key)
+        return row[0]
+
+    def candidates(self, bucket, min_created, limit):
+        rows = self._connection().execute(
+            "SELECT key, tokens, response FROM response_cache "
+            "WHERE bucket = ? AND created_at >= ? ORDER BY created_at DESC LIMIT ?",
+            (bucket, min_created, limit)
+        ).fetchall()
+        return [(key, frozenset(json.loads(tokens)), response) for key, tokens, response in rows]
+
+    def touch(self, key):
+        self._connection().execute("UPDATE response_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+
+    def put(self, key, bucket, tokens, response, now):
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO response_cache (key, bucket, tokens, response, created_at, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, bucket, json.dumps(sorted(tokens)), response, now, now)
+        )
+
+        self._writes += 1
+        if self._writes % self.EVICT_EVERY == 0:
+            conn.execute(
+                "DELETE FROM response_cache WHERE key IN ("
+                "SELECT key FROM response_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+
+class ResponseCache:
+    """
+    Cache of AI responses keyed on a normalized (message, emotion,
+    resource set, crisis level) fingerprint
+
+    Exact repeats are found by key; near duplicates are found by comparing
+    token sets against recent entries with the same emotion, resources and
+    crisis level. Nothing is read or written when a crisis is detected.
+    """
+
+    def __init__(self, backend, ttl=RESPONSE_CACHE_TTL, similarity_threshold=RESPONSE_CACHE_SIMILARITY):
+        self.backend = backend
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        self._lock = threading.Lock()
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    @staticmethod
+    def _fingerprint(message, emotion, resources, crisis_level):
+        normalized = normalize_message(message)
+        titles = "|".join(sorted(resource.get("title", "") for resource in resources or []))
+        bucket = hashlib.sha1(f"{emotion}\x00{titles}\x00{crisis_level}".encode()).hexdigest()
+        key = hashlib.sha1(f"{bucket}\x00{normalized}".encode()).hexdigest()
+        return key, bucket, frozenset(normalized.split())
+
+    def get(self, message, emotion, resources, crisis_detected=False, crisis_level=0):
+        """
+        Look up a cached response
+
+        Args:
+            message (str): The user's message
+            emotion (str): Detected emotion
+            resources (list): Therapy resources the response would be based on
+            crisis_detected (bool): Whether a crisis was detected
+            crisis_level (int): Level of crisis (0-10)
+
+        Returns:
+            str: Cached response, or None
+        """
+        if crisis_detected or crisis_level:
+            self._count("bypassed")
+            return None
+
+        key, bucket, tokens = self._fingerprint(message, emotion, resources, crisis_level)
+        min_created = time.time() - self.ttl
+
+        response = self.backend.get(key, min_created)
+        if response is not None:
+            self._count("hits")
+            return response
+
+        if self.similarity_threshold < 1.0:
+            best_key, best_response, best_score = None, None, self.similarity_threshold
+            for candidate_key, candidate_tokens, candidate_response in self.backend.candidates(
+                bucket, min_created, NEAR_DUPLICATE_CANDIDATES
+            ):
+                score = similarity(tokens, candidate_tokens)
+                if score >= best_score:
+                    best_key, best_response, best_score = candidate_key, candidate_response, score
+            if best_response is not None:
+                self.backend.touch(best_key)
+                self._count("near_hits")
+                return best_response
+
+        self._count("misses")
+        return None
+
+    def put(self, message, emotion, resources, response, crisis_detected=False, crisis_level=0):
+        """Store a response; responses to crisis messages are never cached"""
+        if crisis_detected or crisis_level:
+            return
+
+        key, bucket, tokens = self._fingerprint(message, emotion, resources, crisis_level)
+        self.backend.put(key, bucket, tokens, response, time.time())
+        self._count("stores")
+
+    def stats(self):
+        """
+        Get hit/miss counters for this process
+
+        Returns:
+            dict: Cache statistics
+        """
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                "backend": type(self.backend).__name__,
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "stores": self.stores,
+                "hit_rate": (self.hits + self.near_hits) / lookups if lookups else 0.0
+            }
+
+
+def create_response_cache(backend=RESPONSE_CACHE):
+    """
+    Create the response cache selected by configuration
+
+    Args:
+        backend (str): "memory", "sqlite", or "" to disable caching
+
+    Returns:
+        ResponseCache: The cache, or None when disabled
+    """
+    if backend == "memory":
+        return ResponseCache(MemoryBackend())
+    if backend == "sqlite":
+        return ResponseCache(SQLiteBackend())
+    return None
+
+
+response_cache = create_response_cache()
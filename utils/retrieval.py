@@ -0,0 +1,246 @@
+import os
+import re
+import hashlib
+import logging
+import tempfile
+from collections import Counter
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Bump when tokenization or weighting changes so stale index files are rebuilt
+INDEX_VERSION = 1
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Keywords are curated, so count each one as if it appeared this many times
+KEYWORD_BOOST = 2
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+STOPWORDS = frozenset("""
+a about after all also am an and any are as at be because been but by can
+could did do does doing for from had has have having he her here him his how
+i if in into is it its just me more most my no not now of on or our out over
+she so some such than that the their them then there these they this those
+through to too under up very was we were what when where which while who why
+will with would you your
+""".split())
+
+
+def tokenize(text):
+    """
+    Split text into lowercase index terms
+
+    Args:
+        text (str): Text to tokenize
+
+    Returns:
+        list: Terms with stopwords removed
+    """
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def document_terms(doc):
+    """Count the indexed terms of a therapy document"""
+    counts = Counter(tokenize(doc.get("summary", "")))
+    counts.update(tokenize(doc.get("content", "")))
+    for keyword in doc.get("keywords", []):
+        for term in tokenize(keyword):
+            counts[term] += KEYWORD_BOOST
+    return counts
+
+
+def corpus_digest(raw_bytes):
+    """Fingerprint the source corpus an index was built from"""
+    digest = hashlib.sha256(raw_bytes)
+    digest.update(f"v{INDEX_VERSION}".encode())
+    return digest.hexdigest()
+
+
+class BM25Index:
+    """
+    BM25 weights stored term-major (one posting list per term), so scoring
+    a query is a sparse matrix-vector product over the query's postings only
+    """
+
+    def __init__(self, vocabulary, indptr, doc_indices, weights, num_docs, digest=""):
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.doc_indices = doc_indices
+        self.weights = weights
+        self.num_docs = num_docs
+        self.digest = digest
+
+    @classmethod
+    def build(cls, documents, digest=""):
+        """
+        Build an index over the summary, content and keywords of each document
+
+        Args:
+            documents (list): Therapy documents in corpus order
+            digest (str): Fingerprint of the source corpus
+
+        Returns:
+            BM25Index: The built index
+        """
+        doc_terms = [document_terms(doc) for doc in documents]
+        num_docs = len(doc_terms)
+        lengths = np.array([sum(counts.values()) for counts in doc_terms], dtype=np.float64)
+        avg_length = lengths.mean() if num_docs else 0.0
+
+        postings = {}
+        for position, counts in enumerate(doc_terms):
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((position, tf))
+
+        vocabulary = {}
+        indptr = [0]
+        doc_indices = []
+        weights = []
+        for term in sorted(postings):
+            entries = postings[term]
+            vocabulary[term] = len(vocabulary)
+
+            positions = np.array([position for position, _ in entries], dtype=np.int32)
+            tf = np.array([tf for _, tf in entries], dtype=np.float64)
+            idf = np.log(1.0 + (num_docs - len(entries) + 0.5) / (len(entries) + 0.5))
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * lengths[positions] / avg_length)
+
+            doc_indices.append(positions)
+            weights.append(idf * tf * (BM25_K1 + 1.0) / (tf + norm))
+            indptr.append(indptr[-1] + len(entries))
+
+        return cls(
+            vocabulary,
+            np.array(indptr, dtype=np.int64),
+            np.concatenate(doc_indices) if doc_indices else np.zeros(0, dtype=np.int32),
+            np.concatenate(weights).astype(np.float32) if weights else np.zeros(0, dtype=np.float32),
+            num_docs,
+            digest
+        )
+
+    def save(self, path):
+        """
+        Persist the index as an .npz file
+
+        The file is written under a temporary name in the same directory and
+        renamed into place, so a worker loading it never sees a partial file.
+        """
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.fspath(path)) or ".", suffix=".tmp")
+        try:
+            # mkstemp creates the file private to this user; keep the usual mode
+            os.fchmod(fd, 0o644)
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(
+                    f,
+                    version=np.array(INDEX_VERSION),
+                    digest=np.array(self.digest),
+                    num_docs=np.array(self.num_docs),
+                    terms=np.array(terms, dtype=str),
+                    indptr=self.indptr,
+                    doc_indices=self.doc_indices,
+                    weights=self.weights
+                )
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load an index saved with save()
+
+        Returns:
+            BM25Index: The loaded index, or None if it was written by another INDEX_VERSION
+        """
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["version"]) != INDEX_VERSION:
+                return None
+            terms = data["terms"].tolist()
+            return cls(
+                {term: i for i, term in enumerate(terms)},
+                data["indptr"],
+                data["doc_indices"],
+                data["weights"],
+                int(data["num_docs"]),
+                str(data["digest"])
+            )
+
+    def score(self, query):
+        """
+        Score every document against a query
+
+        Args:
+            query (str): Query text
+
+        Returns:
+            numpy.ndarray: BM25 score per document
+        """
+        term_ids = [self.vocabulary[term] for term in tokenize(query) if term in self.vocabulary]
+        if not term_ids:
+            return np.zeros(self.num_docs, dtype=np.float64)
+
+        slices = [slice(self.indptr[i], self.indptr[i + 1]) for i in term_ids]
+        return np.bincount(
+            np.concatenate([self.doc_indices[s] for s in slices]),
+            weights=np.concatenate([self.weights[s] for s in slices]),
+            minlength=self.num_docs
+        )
+
+    def search(self, query, top_k=3):
+        """
+        Find the best matching documents for a query
+
+        Args:
+            query (str): Query text
+            top_k (int): Number of documents to return
+
+        Returns:
+            list: Document positions, best match first, excluding non-matches
+        """
+        scores = self.score(query)
+        if top_k <= 0 or not scores.any():
+            return []
+
+        if top_k < self.num_docs:
+            candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            candidates = np.arange(self.num_docs)
+        ranked = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [int(position) for position in ranked if scores[position] > 0]
+
+
+def load_or_build_index(documents, raw_bytes, index_path):
+    """
+    Load the persisted index for a corpus, rebuilding (and re-saving) it when
+    the file is missing or was built from different documents
+
+    Args:
+        documents (list): Parsed therapy documents
+        raw_bytes (bytes): Raw contents of the documents file
+        index_path (Path): Location of the persisted index
+
+    Returns:
+        BM25Index: An index matching the documents
+    """
+    digest = corpus_digest(raw_bytes)
+
+    if index_path.exists():
+        try:
+            index = BM25Index.load(index_path)
+            if index is not None and index.digest == digest:
+                return index
+        except Exception:
+            logger.exception("Could not load retrieval index %s; rebuilding it", index_path)
+
+    index = BM25Index.build(documents, digest)
+    try:
+        index.save(index_path)
+    except OSError:
+        logger.exception("Could not persist retrieval index %s", index_path)
+    return index
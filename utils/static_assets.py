@@ -0,0 +1,233 @@
+import os
+import gzip
+import json
+import hashlib
+import logging
+import mimetypes
+import posixpath
+from io import BytesIO
+
+from flask import current_app, request, send_from_directory
+
+logger = logging.getLogger(__name__)
+
+# Set STATIC_ASSETS=0 to serve the files in static/ as they are, ignoring any build
+STATIC_ASSETS_ENABLED = os.environ.get("STATIC_ASSETS", "1") != "0"
+# Where `flask build-static` writes hashed files; defaults to static/dist
+STATIC_BUILD_DIR = os.environ.get("STATIC_BUILD_DIR")
+# Hashed URLs never change content, so clients may keep them for a year without revalidating
+STATIC_MAX_AGE = int(os.environ.get("STATIC_MAX_AGE", 365 * 24 * 3600))
+
+MANIFEST_NAME = "manifest.json"
+HASH_LENGTH = 12
+# Files smaller than this gain nothing from compression once headers are counted
+COMPRESS_MIN_SIZE = 256
+# Formats that are already compressed
+COMPRESSED_SUFFIXES = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".woff", ".woff2", ".gz", ".br", ".zip"}
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg"}
+# Content-Encoding -> suffix of the precompressed file, in order of preference
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _compressors():
+    """Available (encoding, compress) pairs, best first; brotli is used when the package is installed"""
+    compressors = [("gzip", lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    try:
+        import brotli
+    except ImportError:
+        return compressors
+    return [("br", lambda data: brotli.compress(data, quality=11))] + compressors
+
+
+def _optimize_image(data):
+    """
+    Re-encode an image losslessly and make a WebP variant, when Pillow is installed
+
+    Returns:
+        tuple: (image bytes, WebP bytes or None); each is only used if smaller
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return data, None
+
+    with Image.open(BytesIO(data)) as image:
+        optimized = BytesIO()
+        image.save(optimized, format=image.format, optimize=True)
+        webp = BytesIO()
+        image.save(webp, format="WEBP", quality=85, method=6)
+
+    optimized = optimized.getvalue()
+    webp = webp.getvalue()
+    return (optimized if len(optimized) < len(data) else data), (webp if len(webp) < len(data) else None)
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def build_static(source_dir, build_dir=None):
+    """
+    Write content-hashed, precompressed copies of every static file and a manifest
+
+    Each file gets a name with its content hash (css/style.css ->
+    css/style.<hash>.css), plus .gz and .br copies for compressible files
+    and, with Pillow, an optimized image and a .webp variant. Files from
+    earlier builds are kept so pages rendered before a deploy still load.
+
+    Args:
+        source_dir (str): The static folder
+        build_dir (str): Output folder, by default the configured build folder
+
+    Returns:
+        dict: Manifest entries by file name relative to source_dir
+    """
+    build_dir = build_dir or STATIC_BUILD_DIR or os.path.join(source_dir, "dist")
+    skip = os.path.abspath(build_dir)
+    compressors = _compressors()
+
+    files = {}
+    for root, dirs, names in os.walk(source_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.abspath(os.path.join(root, d)) != skip)
+        for file_name in sorted(names):
+            source = os.path.join(root, file_name)
+            name = os.path.relpath(source, source_dir).replace(os.sep, "/")
+            with open(source, "rb") as f:
+                data = f.read()
+
+            digest = _digest(data)
+            stem, suffix = posixpath.splitext(name)
+            hashed = f"{stem}.{digest[:HASH_LENGTH]}{suffix}"
+            entry = {"digest": digest, "path": hashed, "size": len(data), "encodings": [], "webp": None}
+
+            if suffix.lower() in IMAGE_SUFFIXES:
+                data, webp = _optimize_image(data)
+                if webp is not None:
+                    entry["webp"] = f"{stem}.{digest[:HASH_LENGTH]}.webp"
+                    _write(os.path.join(build_dir, entry["webp"]), webp)
+            _write(os.path.join(build_dir, hashed), data)
+
+            if suffix.lower() not in COMPRESSED_SUFFIXES and len(data) >= COMPRESS_MIN_SIZE:
+                for encoding, compress in compressors:
+                    compressed = compress(data)
+                    if len(compressed) < len(data):
+                        _write(os.path.join(build_dir, hashed + ENCODING_SUFFIXES[encoding]), compressed)
+                        entry["encodings"].append(encoding)
+            files[name] = entry
+
+    # Hashed names from earlier builds stay servable as long as their files exist
+    manifest_path = os.path.join(build_dir, MANIFEST_NAME)
+    paths = {}
+    try:
+        with open(manifest_path) as f:
+            paths = {path: entry for path, entry in json.load(f)["paths"].items()
+                     if os.path.exists(os.path.join(build_dir, path))}
+    except (FileNotFoundError, KeyError, ValueError):
+        pass
+    paths.update((entry["path"], entry) for entry in files.values())
+
+    # Replace the manifest in one step so a running server never reads half of it
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump({"files": files, "paths": paths}, f, indent=1, sort_keys=True)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return files
+
+
+class StaticAssets:
+    """
+    Serve the output of `flask build-static`
+
+    url_for('static', filename=...) is rewritten to the hashed name, which
+    is served with an immutable Cache-Control header and the best
+    precompressed variant the client accepts. Files missing from the
+    build, or changed since it, keep their plain URL and Flask's default
+    handling.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = STATIC_ASSETS_ENABLED
+        self.build_dir = None
+        self.files = {}    # source name -> manifest entry
+        self.by_path = {}  # hashed name -> manifest entry
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get("STATIC_ASSETS_ENABLED", self.enabled)
+        if not self.enabled or not app.has_static_folder:
+            return
+
+        self.build_dir = STATIC_BUILD_DIR or os.path.join(app.static_folder, "dist")
+        self.load(app.static_folder)
+        app.url_defaults(self._hashed_url)
+        app.view_functions["static"] = self.send
+
+    def load(self, static_folder):
+        """Read the manifest, keeping only entries whose source file is unchanged"""
+        self.files = {}
+        self.by_path = {}
+        try:
+            with open(os.path.join(self.build_dir, MANIFEST_NAME)) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return
+
+        stale = []
+        for name, entry in manifest["files"].items():
+            try:
+                with open(os.path.join(static_folder, name), "rb") as f:
+                    current = _digest(f.read())
+            except OSError:
+                continue
+            if current != entry["digest"]:
+                stale.append(name)
+                continue
+            self.files[name] = entry
+        # Hashed names are content addresses, so older builds are served too
+        self.by_path = manifest["paths"]
+
+        if stale:
+            logger.warning("Static build is out of date for %s; run `flask build-static`", ", ".join(stale))
+
+    def _hashed_url(self, endpoint, values):
+        if endpoint == "static":
+            entry = self.files.get(values.get("filename"))
+            if entry is not None:
+                values["filename"] = entry["path"]
+
+    def send(self, filename):
+        entry = self.by_path.get(filename)
+        if entry is None:
+            return current_app.send_static_file(filename)
+
+        path = entry["path"]
+        vary = []
+        content_encoding = None
+        if entry["webp"]:
+            vary.append("Accept")
+            # Only clients that name WebP get it; */* alone is not enough
+            if dict(request.accept_mimetypes).get("image/webp", 0) > 0:
+                path = entry["webp"]
+        mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if entry["encodings"]:
+            vary.append("Accept-Encoding")
+            for encoding in entry["encodings"]:
+                if request.accept_encodings[encoding]:
+                    content_encoding = encoding
+                    path += ENCODING_SUFFIXES[encoding]
+                    break
+
+        response = send_from_directory(self.build_dir, path, mimetype=mimetype, max_age=STATIC_MAX_AGE)
+        response.headers["Cache-Control"] = f"public, max-age={STATIC_MAX_AGE}, immutable"
+        if content_encoding:
+            response.headers["Content-Encoding"] = content_encoding
+        for header in vary:
+            response.vary.add(header)
+        return response
@@ -0,0 +1,101 @@
+import os
+import time
+import threading
+from collections import namedtuple, OrderedDict
+
+from flask_login import UserMixin
+
+# Set USER_CACHE=0 to load the user from the database on every request
+USER_CACHE_ENABLED = os.environ.get("USER_CACHE", "1") != "0"
+# Seconds a cached user is trusted; changes made by other processes show up after this
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 60))
+USER_CACHE_MAX_ENTRIES = int(os.environ.get("USER_CACHE_MAX_ENTRIES", 10000))
+
+
+class UserSnapshot(namedtuple("UserSnapshot", ["id", "username", "email", "created_at"]), UserMixin):
+    """Immutable copy of a User row, safe to share between requests and threads"""
+    __slots__ = ()
+
+
+class UserCache:
+    """
+    Per-process cache of UserSnapshots keyed on user id
+
+    Entries expire after a TTL and are dropped explicitly when this process
+    updates or deletes the user.
+    """
+
+    def __init__(self, ttl=USER_CACHE_TTL, max_entries=USER_CACHE_MAX_ENTRIES, enabled=USER_CACHE_ENABLED):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id, load):
+        """
+        Get a user's snapshot, loading it on a miss
+
+        Args:
+            user_id (int): User id
+            load (callable): load(user_id) -> UserSnapshot or None
+
+        Returns:
+            UserSnapshot: The user, or None if they do not exist
+        """
+        if not self.enabled:
+            return load(user_id)
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        snapshot = load(user_id)
+        # Unknown ids are not cached, so a new account is found straight away
+        if snapshot is not None:
+            with self._lock:
+                self._entries[user_id] = (snapshot, now + self.ttl)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, user_id):
+        """Drop a user's cached snapshot, e.g. after a profile or password change"""
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Get hit/miss counters for this process
+
+        Returns:
+            dict: Cache statistics
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+user_cache = UserCache()
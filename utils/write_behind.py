@@ -0,0 +1,217 @@
+import os
+import queue
+import atexit
+import logging
+import threading
+
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Set WRITE_BEHIND=0 to write synchronously in the request thread
+WRITE_BEHIND_ENABLED = os.environ.get("WRITE_BEHIND", "1") != "0"
+WRITE_BEHIND_MAX_BACKLOG = int(os.environ.get("WRITE_BEHIND_MAX_BACKLOG", 1000))
+WRITE_BEHIND_BATCH_SIZE = int(os.environ.get("WRITE_BEHIND_BATCH_SIZE", 200))
+WRITE_BEHIND_SHUTDOWN_TIMEOUT = float(os.environ.get("WRITE_BEHIND_SHUTDOWN_TIMEOUT", 10))
+
+_STOP = object()
+
+
+class PendingWrite:
+    """Handle for a group of model instances queued for insertion"""
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.error = None
+        self._done = threading.Event()
+
+    def _finish(self, error=None):
+        self.error = error
+        self._done.set()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Block until the objects are committed
+
+        Args:
+            timeout (float): Seconds to wait, None for no limit
+
+        Returns:
+            tuple: The committed objects, with primary keys populated
+        """
+        if not self._done.wait(timeout):
+            raise TimeoutError("Write-behind commit did not finish in time")
+        if self.error is not None:
+            raise self.error
+        return self.objects
+
+
+class WriteBehindWriter:
+    """
+    Queue of pending inserts committed by a background thread
+
+    Inserts queued by concurrent requests are committed together in grouped
+    transactions. When the backlog is full, or write-behind is disabled,
+    submit() commits in the calling thread instead.
+    """
+
+    def __init__(self, app=None, db=None):
+        self.app = None
+        self.db = None
+        self.enabled = WRITE_BEHIND_ENABLED
+        self.max_backlog = WRITE_BEHIND_MAX_BACKLOG
+        self.batch_size = WRITE_BEHIND_BATCH_SIZE
+
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+        self.batches = 0
+        self.written = 0
+        self.sync_writes = 0
+        self.failures = 0
+
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.app = app
+        self.db = db
+        self.enabled = app.config.get("WRITE_BEHIND_ENABLED", self.enabled)
+        self.max_backlog = app.config.get("WRITE_BEHIND_MAX_BACKLOG", self.max_backlog)
+        self.batch_size = app.config.get("WRITE_BEHIND_BATCH_SIZE", self.batch_size)
+        atexit.register(self.shutdown)
+
+    def _ensure_worker(self):
+        # The worker is started lazily, and again in a forked child
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread is None or self._pid != pid or not self._thread.is_alive():
+                self._queue = queue.Queue(maxsize=self.max_backlog)
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._pid = pid
+                self._thread.start()
+
+    def submit(self, *objects):
+        """
+        Queue new model instances for insertion in one transaction
+
+        Args:
+            *objects: Transient model instances
+
+        Returns:
+            PendingWrite: Handle to wait on when primary keys are needed
+        """
+        pending = PendingWrite(objects)
+
+        if self.enabled:
+            self._ensure_worker()
+            try:
+                self._queue.put_nowait(pending)
+                return pending
+            except queue.Full:
+                logger.warning("Write-behind backlog full, writing synchronously")
+
+        self.sync_writes += 1
+        self._commit([pending])
+        return pending
+
+    def _commit(self, batch):
+        with self.app.app_context():
+            with Session(bind=self.db.engine, expire_on_commit=False) as session:
+                try:
+                    for pending in batch:
+                        session.add_all(pending.objects)
+                    session.commit()
+                except Exception:
+                    session.rollback()
+                    if len(batch) == 1:
+                        self.failures += 1
+                        logger.exception("Write-behind commit failed")
+                        batch[0]._finish(error=RuntimeError("Write-behind commit failed"))
+                        return
+                    # Retry one by one so a bad write does not fail its neighbours
+                    for pending in batch:
+                        self._commit([pending])
+                    return
+
+        self.batches += 1
+        self.written += sum(len(pending.objects) for pending in batch)
+        for pending in batch:
+            pending._finish()
+
+    def _run(self):
+        work = self._queue
+        while True:
+            item = work.get()
+            if item is _STOP:
+                work.task_done()
+                return
+
+            # Group whatever else is already waiting into the same transaction
+            batch = [item]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = work.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            try:
+                self._commit(batch)
+            except Exception:
+                logger.exception("Write-behind worker failed to commit a batch")
+                for pending in batch:
+                    if not pending.done:
+                        pending._finish(error=RuntimeError("Write-behind commit failed"))
+            finally:
+                for _ in range(len(batch) + stop):
+                    work.task_done()
+
+            if stop:
+                return
+
+    def flush(self):
+        """Block until every queued write has been committed"""
+        if self._queue is not None and self._pid == os.getpid():
+            self._queue.join()
+
+    def shutdown(self):
+        """Commit the backlog and stop the worker thread"""
+        thread = self._thread
+        if thread is None or self._pid != os.getpid() or not thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=WRITE_BEHIND_SHUTDOWN_TIMEOUT)
+        except queue.Full:
+            logger.error("Write-behind backlog did not drain before shutdown")
+            return
+        thread.join(WRITE_BEHIND_SHUTDOWN_TIMEOUT)
+
+    def stats(self):
+        """
+        Get queue and commit counters for this process
+
+        Returns:
+            dict: Writer statistics
+        """
+        return {
+            "enabled": self.enabled,
+            "backlog": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "written": self.written,
+            "sync_writes": self.sync_writes,
+            "failures": self.failures
+        }